@@ -1,10 +1,13 @@
 from django.urls import path
-from .api_views import (predict_weather_view, CenterCongestionRiskView, AnalyticsStatsView, AffectedPopulationReportView)
+from .api_views import (predict_weather_view, CenterCongestionRiskView, CongestionRiskListView, AnalyticsStatsView, DashboardSummaryView, AffectedPopulationReportView, AffectedPopulationSeriesView)
 
 urlpatterns = [
     path('weather/predict/', predict_weather_view, name='predict_weather'),
     path("centers/<int:center_id>/congestion-risk/", CenterCongestionRiskView.as_view()),
+    path("congestion-risk/", CongestionRiskListView.as_view(), name="congestion_risk_list"),
     path('stats/', AnalyticsStatsView.as_view(), name='analytics_stats'),
+    path("dashboard-summary/", DashboardSummaryView.as_view(), name="dashboard_summary"),
     path("reports/affected-population/", AffectedPopulationReportView.as_view(), name="affected_population_report"),
+    path("reports/affected-population/series/", AffectedPopulationSeriesView.as_view(), name="affected_population_series"),
     # Other URLs...
 ]
\ No newline at end of file
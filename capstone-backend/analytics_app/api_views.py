@@ -1,194 +1,119 @@
 # analytics_app/api_views.py
-from django.http import JsonResponse
-import tensorflow as tf
-import joblib
-import requests
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from django.http import JsonResponse, FileResponse
+import re
+import json
+from datetime import timedelta
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
-from pathlib import Path
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Max
-from .services.affected_population_report import build_affected_population_report
-from .permissions import IsProvincialAdmin
-
-from evac_app.models import EvacuationCenter, EvacuationLog
-from .services.congestion import compute_congestion_risk, CongestionParams
-
-# Global variables to load model and scalers once
-model = None
-scaler_X = None
-scaler_Y = None
-
-# Constants from your script
-SAVE_DIR = "./models_kaggle_only/"  # Adjust to your path
-INPUT_HOURS = 168
-OUTPUT_HOURS = 72
-TARGET_COLUMNS = ["temperature_2m", "wind_speed_10m", "wind_direction_10m",
-                  "precipitation", "relative_humidity_2m", "pressure_msl", "cloud_cover"]
-rename_map = {
-    "temperature_2m": "TAVG",
-    "relative_humidity_2m": "RH",
-    "wind_speed_10m": "WDSP",
-    "wind_direction_10m": "wind_dir",
-    "precipitation": "PRCP",
-    "pressure_msl": "pressure",
-    "cloud_cover": "cloud_cover"
-}
-lags = [1, 3, 6, 24, 48, 72]
-candidate_features = [
-    "TAVG_lag_1", "TAVG_lag_3", "TAVG_lag_6", "TAVG_24h_mean",
-    "PRCP_lag_1", "PRCP_lag_24", "PRCP_24h_sum",
-    "pressure_lag_24", "pressure_tendency_24h",
-    "WDSP_lag_1", "RH_lag_1", "wind_u_lag_1", "wind_v_lag_1",
-    "low_pressure_flag", "hour", "dayofyear", "month", "city_count"
-]
-target_cols = ["TAVG", "WDSP", "wind_u", "wind_v", "PRCP", "RH", "pressure", "cloud_cover", "dew_point"]
-
-def load_model_and_scalers():
-    global model, scaler_X, scaler_Y
-
-    if model is None:
-        model_path = Path(SAVE_DIR) / "seq2seq_kaggle_best.h5"
-
-        # Fixes "Could not deserialize 'keras.metrics.mse'"
-        model = tf.keras.models.load_model(
-            model_path,
-            compile=False,     # <-- IMPORTANT
-            custom_objects={
-                "mse": tf.keras.metrics.MeanSquaredError(),
-                "mae": tf.keras.metrics.MeanAbsoluteError(),
-                "MeanSquaredError": tf.keras.metrics.MeanSquaredError(),
-                "MeanAbsoluteError": tf.keras.metrics.MeanAbsoluteError()
-            }
-        )
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from django.db.models import Sum, Count
+from .services.affected_population_report import build_affected_population_series
+from .services import report_cache, report_xlsx
+from .services.dashboard_summary import build_dashboard_summary
+from .permissions import IsProvincialOrMunicipalAdmin
+
+from evac_app.models import EvacuationCenter, EvacuationLog, CenterOccupancy, DisasterEvent
+from auth_app.models import CustomUser, HazardReport
+from .services.congestion import compute_congestion_risk, compute_congestion_risk_batch, CongestionParams
+from .models import WeatherForecast
+from .services.weather_forecasts import latest_forecast_payload
 
-    if scaler_X is None:
-        scaler_X = joblib.load(Path(SAVE_DIR) / "scaler_X.pkl")
-
-    if scaler_Y is None:
-        scaler_Y = joblib.load(Path(SAVE_DIR) / "scaler_Y.pkl")
-
-def fetch_recent_weather():
-    lat = 13.41
-    lon = 121.18
-    now = datetime.now()
-    # Fetch past 8 days to ensure at least 168 hours
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&past_days=8&forecast_days=0&hourly={','.join(TARGET_COLUMNS)}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise ValueError("Failed to fetch weather data")
-    data = response.json()['hourly']
-    df = pd.DataFrame({
-        'datetime': pd.to_datetime(data['time']),
-        **{col: data[col] for col in TARGET_COLUMNS}
-    })
-    df = df[df['datetime'] < now].tail(INPUT_HOURS).copy()
-    if len(df) < INPUT_HOURS:
-        raise ValueError("Insufficient historical data")
-    df['city_count'] = 1  # Single location
-    return df
-
-def prepare_input(df):
-    df = df.rename(columns=rename_map)
-    df = df.set_index('datetime')
-
-    # Compute dew_point
-    if "dew_point" not in df.columns and ("TAVG" in df.columns and "RH" in df.columns):
-        T = df["TAVG"]
-        RH = df["RH"].clip(0.01, 100)
-        a, b = 17.625, 243.04
-        gamma = np.log(RH / 100.0) + (a * T) / (b + T)
-        df["dew_point"] = (b * gamma) / (a - gamma)
-
-    # Wind u/v
-    if "WDSP" in df.columns and "wind_dir" in df.columns:
-        theta = np.deg2rad(df["wind_dir"].fillna(0))
-        df["wind_u"] = -df["WDSP"] * np.sin(theta)
-        df["wind_v"] = -df["WDSP"] * np.cos(theta)
-
-    # Datetime features
-    df["hour"] = df.index.hour
-    df["dayofyear"] = df.index.dayofyear
-    df["month"] = df.index.month
-
-    # Lags and rolling
-    for lag in lags:
-        if "TAVG" in df.columns:
-            df[f"TAVG_lag_{lag}"] = df["TAVG"].shift(lag)
-        if "PRCP" in df.columns:
-            df[f"PRCP_lag_{lag}"] = df["PRCP"].shift(lag)
-        if "pressure" in df.columns:
-            df[f"pressure_lag_{lag}"] = df["pressure"].shift(lag)
-        if "WDSP" in df.columns:
-            df[f"WDSP_lag_{lag}"] = df["WDSP"].shift(lag)
-        if "RH" in df.columns:
-            df[f"RH_lag_{lag}"] = df["RH"].shift(lag)
-        if "wind_u" in df.columns:
-            df[f"wind_u_lag_{lag}"] = df["wind_u"].shift(lag)
-        if "wind_v" in df.columns:
-            df[f"wind_v_lag_{lag}"] = df["wind_v"].shift(lag)
-
-    if "TAVG" in df.columns:
-        df["TAVG_24h_mean"] = df["TAVG"].rolling(window=24, min_periods=1).mean()
-    if "PRCP" in df.columns:
-        df["PRCP_24h_sum"] = df["PRCP"].rolling(window=24, min_periods=1).sum()
-    if "pressure" in df.columns:
-        df["pressure_tendency_24h"] = df["pressure"] - df["pressure"].shift(24)
-
-    df["low_pressure_flag"] = (df["pressure"] < 1005).astype(int) if "pressure" in df.columns else 0
-
-    # Since df has exactly INPUT_HOURS rows, lags will have NaNs at start, but model was trained after dropna, but to match, fill NaNs?
-    # Better to fill similar to training: interpolate or ffill/bfill, but since small, ffill
-    df = df.ffill().bfill()  # Simple fill
-
-    feature_cols_local = [c for c in candidate_features if c in df.columns]
-    X = df[feature_cols_local].values[None, ...]  # (1, 168, n_feats)
-    return X, feature_cols_local
 
 def predict_weather_view(request):
-    try:
-        load_model_and_scalers()
-        recent_df = fetch_recent_weather()
-        X_raw, feature_cols_local = prepare_input(recent_df)
-        X_s = scaler_X.transform(X_raw.reshape(-1, X_raw.shape[-1])).reshape(X_raw.shape)
-        Y_pred_s = model.predict(X_s)
-        Y_pred = scaler_Y.inverse_transform(Y_pred_s.reshape(-1, len(target_cols))).reshape(OUTPUT_HOURS, len(target_cols))
-
-        now = datetime.now()
-        predictions = []
-        for i in range(OUTPUT_HOURS):
-            pred_dict = {'datetime': (now + timedelta(hours=i + 1)).isoformat()}
-            for j, col in enumerate(target_cols):
-                pred_dict[col] = float(Y_pred[i, j])
-            predictions.append(pred_dict)
-
-        return JsonResponse({'predictions': predictions})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+    """
+    Latest stored 72-hour forecast (manage.py refresh_weather_forecast keeps
+    it current), with its age; `fallback` marks an older forecast served
+    because the newest run failed. ?municipality=<id> for a municipality's
+    own forecast, otherwise the province-wide one.
+    """
+    municipality_id = request.GET.get("municipality") or None
+    if municipality_id is not None:
+        try:
+            municipality_id = int(municipality_id)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid municipality.'}, status=400)
+
+    payload = latest_forecast_payload(WeatherForecast, municipality_id=municipality_id)
+    if payload is None:
+        return JsonResponse({'error': 'No weather forecast has been generated yet.'}, status=503)
+    return JsonResponse(payload)
     
 
     
+def _parse_window_horizon(request):
+    # Optional query params:
+    # ?window=60&horizon=60
+    window = int(request.query_params.get("window", 60))
+    horizon = int(request.query_params.get("horizon", 60))
+
+    window = max(5, min(window, 24 * 60))     # clamp 5 min .. 24 hours
+    horizon = max(5, min(horizon, 6 * 60))    # clamp 5 min .. 6 hours
+    return window, horizon
+
+
+def _scoped_centers(user):
+    """Centers visible to the user, same scoping as EvacuationCenterViewSet."""
+    qs = EvacuationCenter.objects.select_related("occupancy").order_by("id")
+
+    if user.role == "MUNICIPAL_ADMIN":
+        if not user.municipality_id:
+            return qs.none()
+        return qs.filter(municipality_id=user.municipality_id)
+
+    if user.role == "EVAC_CENTER_STAFF":
+        if not user.assigned_center_id:
+            return qs.none()
+        return qs.filter(id=user.assigned_center_id)
+
+    return qs
+
+
+def _parse_event(request):
+    """
+    Optional ?event=<id> scoping. Returns (event, None) or (None, error Response);
+    event is None when the param is absent.
+    """
+    event_id = request.query_params.get("event")
+    if not event_id:
+        return None, None
+
+    try:
+        event = DisasterEvent.objects.filter(id=int(event_id)).first()
+    except ValueError:
+        return None, Response({"detail": "event must be an integer."}, status=400)
+
+    if event is None:
+        return None, Response({"detail": "Event not found."}, status=404)
+    return event, None
+
+
+def _event_centers(centers, event):
+    """Narrows centers to the event's municipality (province-wide events keep all)."""
+    if event is not None and event.municipality_id is not None:
+        return centers.filter(municipality_id=event.municipality_id)
+    return centers
+
+
 class CenterCongestionRiskView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, center_id: int):
-        # Optional query params:
-        # ?window=60&horizon=60
         try:
-            window = int(request.query_params.get("window", 60))
-            horizon = int(request.query_params.get("horizon", 60))
+            window, horizon = _parse_window_horizon(request)
         except ValueError:
             return Response({"detail": "window and horizon must be integers."}, status=400)
 
-        window = max(5, min(window, 24 * 60))     # clamp 5 min .. 24 hours
-        horizon = max(5, min(horizon, 6 * 60))    # clamp 5 min .. 6 hours
+        event, error = _parse_event(request)
+        if error:
+            return error
 
-        center = EvacuationCenter.objects.filter(id=center_id).first()
+        centers = _event_centers(EvacuationCenter.objects.select_related("occupancy"), event)
+        center = centers.filter(id=center_id).first()
         if not center:
             return Response({"detail": "Center not found."}, status=404)
 
@@ -200,62 +125,330 @@ class CenterCongestionRiskView(APIView):
 
         status_code = 200 if "error" not in result else 400
         return Response(result, status=status_code)
-    
-class AnalyticsStatsView(APIView):
+
+
+class CongestionRiskListView(APIView):
+    """
+    GET /api/analytics/congestion-risk/?municipality=3&event=7&window=60&horizon=60
+    Congestion risk of every center in the caller's scope, one entry per
+    center in the same shape as CenterCongestionRiskView. With `event`, only
+    the centers in that event's municipality are scored; occupancy and
+    window flows are still the centers' live ones, since running totals are
+    kept per center across events.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Total current evacuees = sum of latest total_current per center
-        # Simplest reliable approach: take latest log per center, then sum in Python.
+        try:
+            window, horizon = _parse_window_horizon(request)
+        except ValueError:
+            return Response({"detail": "window and horizon must be integers."}, status=400)
 
-        latest_logs = (
-            EvacuationLog.objects
-            .values("center_id")
-            .annotate(latest_time=Max("date_recorded"))
+        event, error = _parse_event(request)
+        if error:
+            return error
+
+        centers = _event_centers(_scoped_centers(request.user), event)
+
+        municipality_id = request.query_params.get("municipality")
+        if municipality_id:
+            try:
+                municipality_id = int(municipality_id)
+            except ValueError:
+                return Response({"detail": "municipality must be an integer."}, status=400)
+            centers = centers.filter(municipality_id=municipality_id)
+
+        results = compute_congestion_risk_batch(
+            centers=centers,
+            EvacuationLogModel=EvacuationLog,
+            params=CongestionParams(window_minutes=window, horizon_minutes=horizon),
         )
 
-        # Build a map center_id -> latest_time
-        latest_map = {x["center_id"]: x["latest_time"] for x in latest_logs}
+        return Response({
+            "window_minutes": window,
+            "horizon_minutes": horizon,
+            "count": len(results),
+            "results": results,
+        })
 
-        total_evacuees = 0
-        active_centers = 0
+class AnalyticsStatsView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        for center_id, latest_time in latest_map.items():
-            latest = (
-                EvacuationLog.objects
-                .filter(center_id=center_id, date_recorded=latest_time)
-                .values("total_current")
-                .first()
+    def get(self, request):
+        event, error = _parse_event(request)
+        if error:
+            return error
+
+        # Total current evacuees = sum of each center's occupancy snapshot
+        snapshots = CenterOccupancy.objects.filter(date_recorded__isnull=False)
+        if event is not None:
+            # centers whose latest log was recorded under the event
+            snapshots = snapshots.filter(latest_log__event_id=event.id)
+
+        agg = (
+            snapshots
+            .aggregate(
+                total_evacuees=Sum("total_current"),
+                active_centers=Count("center_id"),
             )
-            if latest:
-                total_evacuees += int(latest["total_current"] or 0)
-                active_centers += 1
+        )
+
+        total_evacuees = int(agg["total_evacuees"] or 0)
+        active_centers = int(agg["active_centers"] or 0)
 
         return Response({
             "total_evacuees": total_evacuees,
             "active_centers": active_centers,
+            "event": event.id if event else None,
         })
-    
+
+
+class DashboardSummaryView(APIView):
+    """
+    GET /api/analytics/dashboard-summary/
+    Evacuees, active centers, vulnerable counts, users by role and pending
+    hazards for the admin dashboards, scoped to a municipal admin's own
+    municipality. Cached briefly per scope.
+    """
+    permission_classes = [IsAuthenticated, IsProvincialOrMunicipalAdmin]
+
+    def get(self, request):
+        user = request.user
+        occupancy_qs = CenterOccupancy.objects.all()
+        users_qs = CustomUser.objects.all()
+        hazards_qs = HazardReport.objects.all()
+
+        if user.role == "MUNICIPAL_ADMIN":
+            if not user.municipality_id:
+                return Response({"detail": "No municipality assigned to this account."}, status=403)
+            scope = f"municipality-{user.municipality_id}"
+            occupancy_qs = occupancy_qs.filter(center__municipality_id=user.municipality_id)
+            users_qs = users_qs.filter(municipality_id=user.municipality_id)
+            hazards_qs = hazards_qs.filter(municipality_id=user.municipality_id)
+        else:
+            scope = "province"
+
+        data, hit = report_cache.get_or_build(
+            f"dashboard-summary:{scope}",
+            lambda: {
+                **build_dashboard_summary(
+                    occupancy_qs=occupancy_qs,
+                    users_qs=users_qs,
+                    hazards_qs=hazards_qs,
+                ),
+                "scope": scope,
+                "generated_at": _now_naive().isoformat(),
+            },
+            timeout=settings.DASHBOARD_SUMMARY_CACHE_SECONDS,
+        )
+        response = Response(data)
+        response["X-Report-Cache"] = "hit" if hit else "miss"
+        return response
+
+
+def _report_event(request):
+    """_parse_event() that also refuses archived events, whose logs are offline."""
+    event, error = _parse_event(request)
+    if error:
+        return None, error
+
+    if event is not None and event.status == "ARCHIVED":
+        return None, Response(
+            {"detail": "Event is archived. Restore it with restore_disaster_event to report on it."},
+            status=409,
+        )
+    return event, None
+
+
+def _parse_naive_datetime(request, name):
+    """Optional ISO datetime query param -> (naive datetime or None, error Response or None)."""
+    raw = request.query_params.get(name)
+    if not raw:
+        return None, None
+
+    value = parse_datetime(raw)
+    if value is None:
+        return None, Response({"detail": f"Invalid {name} datetime format."}, status=400)
+
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.get_current_timezone())
+    return value, None
+
+
+def _now_naive():
+    now = timezone.now()
+    if timezone.is_aware(now):
+        now = timezone.make_naive(now, timezone.get_current_timezone())
+    return now
+
+
+class XLSXRenderer(BaseRenderer):
+    """
+    Lets ?format=xlsx through DRF's content negotiation. The view builds the
+    workbook itself; only errors are rendered here.
+    """
+    media_type = report_xlsx.CONTENT_TYPE
+    format = "xlsx"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode("utf-8")
+
+
+def _report_municipalities(request, event):
+    """
+    Municipalities the report covers -> (ids, None) or (None, error Response).
+    Municipal admins always get their own; provincial admins may pass
+    ?municipality=<id>, otherwise the event's municipality or the province.
+    """
+    user = request.user
+
+    if user.role == "MUNICIPAL_ADMIN":
+        if not user.municipality_id:
+            return None, Response({"detail": "No municipality assigned to this account."}, status=403)
+        if event is not None and event.municipality_id not in (None, user.municipality_id):
+            return None, Response({"detail": "Event not found."}, status=404)
+        return [user.municipality_id], None
+
+    raw = request.query_params.get("municipality")
+    if raw:
+        try:
+            municipality_id = int(raw)
+        except ValueError:
+            return None, Response({"detail": "municipality must be an integer."}, status=400)
+        if event is not None and event.municipality_id not in (None, municipality_id):
+            return [], None
+        return [municipality_id], None
+
+    if event is not None and event.municipality_id is not None:
+        return [event.municipality_id], None
+
+    return list(
+        EvacuationCenter.objects.order_by().values_list("municipality_id", flat=True).distinct()
+    ), None
+
+
 class AffectedPopulationReportView(APIView):
-    permission_classes = [IsAuthenticated, IsProvincialAdmin]
+    """
+    GET /api/analytics/reports/affected-population/?as_of=&event=&municipality=&format=xlsx
+    JSON by default; format=xlsx downloads the report in the DROMIC layout.
+    Municipal admins get the report of their own municipality.
+    """
+    permission_classes = [IsAuthenticated, IsProvincialOrMunicipalAdmin]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [XLSXRenderer]
 
     def get(self, request):
-        as_of_raw = request.query_params.get("as_of")
+        event, error = _report_event(request)
+        if error:
+            return error
 
-        if as_of_raw:
-            as_of = parse_datetime(as_of_raw)
+        municipality_ids, error = _report_municipalities(request, event)
+        if error:
+            return error
 
-            if as_of is None:
-                return Response({"detail": "Invalid as_of datetime format."}, status=400)
+        as_of, error = _parse_naive_datetime(request, "as_of")
+        if error:
+            return error
 
-            if timezone.is_aware(as_of):
-                as_of = timezone.make_naive(as_of, timezone.get_current_timezone())
+        if as_of is None and event is not None and event.ended_at is not None:
+            # a closed event is reported as it stood when it ended
+            as_of = event.ended_at
+
+        if as_of is None:
+            as_of = _now_naive()
+            as_of_key = f"live-{report_cache.live_bucket(as_of)}"
         else:
-            as_of = timezone.localtime(timezone.now()).replace(tzinfo=None)
+            as_of_key = as_of.isoformat()
 
-        data = build_affected_population_report(
+        data, cache_status = report_cache.affected_population_report(
             EvacuationCenterModel=EvacuationCenter,
             EvacuationLogModel=EvacuationLog,
+            municipality_ids=municipality_ids,
             as_of=as_of,
+            as_of_key=as_of_key,
+            event=event,
+        )
+
+        if request.accepted_renderer.format == "xlsx":
+            name = ["affected-population"]
+            if event is not None:
+                name.append(f"event-{event.id}")
+            if len(municipality_ids) == 1:
+                name.append(f"municipality-{municipality_ids[0]}")
+            name.append(f"{as_of:%Y%m%d-%H%M}")
+            response = FileResponse(
+                report_xlsx.report_xlsx_file(data),
+                as_attachment=True,
+                filename="-".join(name) + ".xlsx",
+                content_type=report_xlsx.CONTENT_TYPE,
+            )
+        else:
+            response = Response(data)
+        response["X-Report-Cache"] = cache_status
+        return response
+
+
+SERIES_STEP_UNITS = {"m": 1, "min": 1, "h": 60, "d": 24 * 60}
+SERIES_MIN_STEP_MINUTES = 5
+SERIES_MAX_STEPS = 500
+
+
+def _parse_step(raw):
+    """'30m', '1h', '1d' -> timedelta, or None if malformed."""
+    match = re.fullmatch(r"(\d+)\s*(m|min|h|d)", (raw or "").strip().lower())
+    if not match:
+        return None
+    return timedelta(minutes=int(match.group(1)) * SERIES_STEP_UNITS[match.group(2)])
+
+
+class AffectedPopulationSeriesView(APIView):
+    """
+    GET /api/analytics/reports/affected-population/series/?from=&to=&step=1h&event=&municipality=
+    The affected population report at every step between `from` and `to`.
+    Defaults: the event's span when `event` is given, else the last 24 hours.
+    Scoped like the report: municipal admins get their own municipality.
+    """
+    permission_classes = [IsAuthenticated, IsProvincialOrMunicipalAdmin]
+
+    def get(self, request):
+        event, error = _report_event(request)
+        if error:
+            return error
+
+        municipality_ids, error = _report_municipalities(request, event)
+        if error:
+            return error
+
+        start, error = _parse_naive_datetime(request, "from")
+        if error:
+            return error
+        end, error = _parse_naive_datetime(request, "to")
+        if error:
+            return error
+
+        step = _parse_step(request.query_params.get("step", "1h"))
+        if step is None:
+            return Response({"detail": "step must look like 30m, 1h or 1d."}, status=400)
+        if step < timedelta(minutes=SERIES_MIN_STEP_MINUTES):
+            return Response({"detail": f"step must be at least {SERIES_MIN_STEP_MINUTES} minutes."}, status=400)
+
+        if end is None:
+            end = event.ended_at if event is not None and event.ended_at else _now_naive()
+        if start is None:
+            start = event.started_at if event is not None else end - timedelta(days=1)
+
+        if start > end:
+            return Response({"detail": "from must be before to."}, status=400)
+        if (end - start) / step > SERIES_MAX_STEPS:
+            return Response({"detail": f"At most {SERIES_MAX_STEPS} steps per request; widen step."}, status=400)
+
+        data = build_affected_population_series(
+            EvacuationCenterModel=EvacuationCenter,
+            EvacuationLogModel=EvacuationLog,
+            start=start,
+            end=end,
+            step=step,
+            event=event,
+            municipality_ids=municipality_ids,
         )
-        return Response(data)
\ No newline at end of file
+        return Response(data)
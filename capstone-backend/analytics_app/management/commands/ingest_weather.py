@@ -0,0 +1,60 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics_app.models import WeatherData
+from auth_app.models import Municipality
+from analytics_app.services.weather_observations import forecast_locations, ingest, input_windows, last_complete_hour
+from analytics_app.services.weather_source import INPUT_HOURS, FixtureSource, OpenMeteoSource, default_source
+
+
+class Command(BaseCommand):
+    help = "Store the missing hours of each location's weather input window in WeatherData and check the windows are complete"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fixture", help="Read observations from this JSON/CSV file instead of open-meteo")
+        parser.add_argument("--url", help="Base URL of a stand-in server speaking the open-meteo API")
+        parser.add_argument("--now", help="Pretend it is this ISO datetime (for replaying fixtures)")
+        parser.add_argument("--hours", type=int, default=INPUT_HOURS,
+                            help=f"Window length in hours (default {INPUT_HOURS})")
+        parser.add_argument("--province-only", action="store_true",
+                            help="Only the province-wide point, not each municipality")
+
+    def handle(self, *args, **options):
+        if options["fixture"] and options["url"]:
+            raise CommandError("Pass either --fixture or --url, not both.")
+
+        if options["fixture"]:
+            source = FixtureSource(options["fixture"])
+        elif options["url"]:
+            source = OpenMeteoSource(options["url"])
+        else:
+            source = default_source()
+
+        now = datetime.fromisoformat(options["now"]) if options["now"] else datetime.now()
+
+        locations = forecast_locations(None if options["province_only"] else Municipality)
+
+        started = time.perf_counter()
+        stats = ingest(WeatherDataModel=WeatherData, source=source, locations=locations, now=now,
+                       hours=options["hours"])
+        ingest_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        windows, errors = input_windows(WeatherDataModel=WeatherData, municipality_ids=locations.keys(),
+                                        end=last_complete_hour(now), hours=options["hours"])
+        window_ms = (time.perf_counter() - started) * 1000
+
+        if errors:
+            where = ", ".join("province" if mid is None else f"municipality {mid}" for mid in errors)
+            raise CommandError(
+                f"Incomplete window for {where} (stored {stats['stored']} of {stats['missing']} missing hours)."
+            )
+
+        window = windows[None]
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(locations)} locations: {stats['missing']} missing hours, {stats['requests']} source requests, "
+            f"{stats['stored']} stored in {ingest_ms:.1f} ms; "
+            f"windows {window['datetime'][0]} .. {window['datetime'][-1]} built in {window_ms:.1f} ms."
+        ))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics_app.models import WeatherData
+from analytics_app.services import weather_history
+from auth_app.models import Municipality
+
+
+class Command(BaseCommand):
+    help = "Backfill WeatherData from a CSV or Parquet file of hourly observations, in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or Parquet (.parquet) file")
+        parser.add_argument("--municipality", type=int,
+                            help="Municipality id the observations belong to (default: the province point)")
+        parser.add_argument("--datetime-column",
+                            help=f"Column with the hour stamp (default: first of {', '.join(weather_history.DATETIME_COLUMNS)})")
+        parser.add_argument("--map", action="append", default=[], metavar="COLUMN=FIELD",
+                            help="Read WeatherData FIELD from COLUMN; repeatable. Open-meteo and "
+                                 "training-set names (TAVG, RH, ...) are recognised without it")
+        parser.add_argument("--chunk-size", type=int, default=100_000,
+                            help="Rows read from the file at a time (default 100000)")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Rows per INSERT (default 5000)")
+
+    def handle(self, *args, **options):
+        municipality_id = options["municipality"]
+        if municipality_id is not None and not Municipality.objects.filter(id=municipality_id).exists():
+            raise CommandError(f"No municipality {municipality_id}.")
+
+        try:
+            overrides = dict(item.split("=", 1) for item in options["map"])
+        except ValueError:
+            raise CommandError("--map takes COLUMN=FIELD.")
+
+        try:
+            columns = weather_history.file_columns(options["path"])
+            mapping = weather_history.column_mapping(columns, overrides)
+            datetime_col = weather_history.datetime_column(columns, options["datetime_column"])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        missing = [col for col in mapping if col not in columns]
+        if missing:
+            raise CommandError(f"No column(s) {', '.join(missing)} in the file.")
+        if not mapping:
+            raise CommandError("None of the file's columns map to WeatherData fields; use --map.")
+        self.stdout.write(f"datetime <- {datetime_col}; " + ", ".join(f"{f} <- {c}" for c, f in mapping.items()))
+
+        started = time.perf_counter()
+        read = inserted = skipped = 0
+        for chunk in weather_history.read_chunks(options["path"], [datetime_col, *mapping], options["chunk_size"]):
+            rows = weather_history.normalize(chunk, mapping, datetime_col)
+            added, existing = weather_history.load_chunk(
+                WeatherData, rows, municipality_id=municipality_id, batch_size=options["batch_size"]
+            )
+            read += len(chunk)
+            inserted += added
+            skipped += existing + len(chunk) - len(rows)
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {read} rows read, {inserted} inserted, {skipped} skipped "
+                f"({read / elapsed * 60:,.0f} rows/min)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {inserted} observations ({skipped} duplicate or invalid rows skipped) "
+            f"in {time.perf_counter() - started:.1f} s."
+        ))
@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics_app.models import WeatherData
+from analytics_app.services import weather_model
+from analytics_app.services.weather_observations import input_windows, last_complete_hour
+
+
+class Command(BaseCommand):
+    help = ("Convert the Keras weather model to a quantized TFLite graph and report its accuracy "
+            "against the original on held-out observation windows")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=weather_model.QUANTIZE_MODES, default="float16",
+                            help="Weight precision (default float16; int8 = dynamic-range quantization)")
+        parser.add_argument("--output", help="Where to write the .tflite file "
+                                             "(default seq2seq_kaggle_best.<mode>.tflite next to the served model)")
+        parser.add_argument("--windows", type=int, default=8,
+                            help="Held-out windows from WeatherData to compare on, a day apart (default 8)")
+        parser.add_argument("--end", help="ISO datetime of the newest held-out window's last hour "
+                                          "(default the last complete hour)")
+
+    def handle(self, *args, **options):
+        save_dir = weather_model.model_dir()
+        output = Path(options["output"] or save_dir / f"seq2seq_kaggle_best.{options['mode']}.tflite")
+
+        keras_path = save_dir / weather_model.KERAS_MODEL_FILE
+        if not keras_path.exists():
+            raise CommandError(f"No Keras model at {keras_path}.")
+        keras_model = weather_model.load_keras_model(keras_path)
+        output.write_bytes(weather_model.convert_to_tflite(keras_model, options["mode"]))
+        self.stdout.write(
+            f"Wrote {output} ({output.stat().st_size / 1024:.0f} KiB, "
+            f"Keras model {keras_path.stat().st_size / 1024:.0f} KiB)."
+        )
+
+        windows = self._held_out_windows(options)
+        if not windows:
+            self.stderr.write("No complete observation windows in WeatherData; skipping the accuracy report.")
+            return
+
+        weather_model.load_model_and_scalers()
+        X_s = weather_model.scaled_input(windows)
+        reference, keras_ms = self._timed(keras_model, X_s)
+        quantized, tflite_ms = self._timed(weather_model.TFLiteModel(output), X_s)
+        error = np.abs(weather_model.unscaled_output(quantized) - weather_model.unscaled_output(reference))
+
+        self.stdout.write(f"\nAccuracy on {len(windows)} held-out window(s), {weather_model.OUTPUT_HOURS} hours each:")
+        self.stdout.write(f"  {'target':<12}{'MAE':>10}{'max abs':>10}")
+        for i, col in enumerate(weather_model.target_cols):
+            self.stdout.write(f"  {col:<12}{error[..., i].mean():>10.4f}{error[..., i].max():>10.4f}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Per window: Keras {keras_ms:.1f} ms, TFLite {tflite_ms:.1f} ms. "
+            f"Serve it with WEATHER_TFLITE_MODEL={output.name}."
+        ))
+
+    def _held_out_windows(self, options):
+        end = datetime.fromisoformat(options["end"]) if options["end"] else last_complete_hour(datetime.now())
+        windows = []
+        for i in range(max(0, options["windows"])):
+            found, _errors = input_windows(
+                WeatherDataModel=WeatherData, municipality_ids=[None], end=end - timedelta(days=i)
+            )
+            if None in found:
+                windows.append(found[None])
+        return windows
+
+    @staticmethod
+    def _timed(model, X_s):
+        model.predict(X_s[:1], verbose=0)  # warm-up, not timed
+        started = time.perf_counter()
+        # one window per call, as the worker serves them
+        outputs = np.concatenate([model.predict(X_s[i:i + 1], verbose=0) for i in range(len(X_s))])
+        return outputs, (time.perf_counter() - started) * 1000 / len(X_s)
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics_app.models import WeatherForecast
+from analytics_app.services.weather_forecasts import refresh_forecasts
+
+# after a failed run (e.g. the inference worker still warming up) try again sooner
+RETRY_SECONDS = 120
+
+
+class Command(BaseCommand):
+    help = "Fetch recent weather per location, run the forecasts through the inference worker and store them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=int, default=0,
+                            help="Keep running, refreshing every N minutes (default: run once)")
+        parser.add_argument("--force", action="store_true",
+                            help="Predict even if the input window hasn't changed")
+
+    def handle(self, *args, **options):
+        every = max(0, options["every"])
+
+        while True:
+            started = time.monotonic()
+            forecasts = refresh_forecasts(WeatherForecastModel=WeatherForecast, force=options["force"])
+
+            failed = {mid: forecast for mid, forecast in forecasts.items() if forecast.status != "OK"}
+            ok = len(forecasts) - len(failed)
+            if ok:
+                self.stdout.write(self.style.SUCCESS(f"{ok} location forecast(s) current."))
+            for mid, forecast in failed.items():
+                where = f"municipality {mid}" if mid is not None else "province"
+                self.stderr.write(f"Forecast run failed for {where}: {forecast.error}")
+
+            if not every:
+                return
+            delay = every * 60 if not failed else min(every * 60, RETRY_SECONDS)
+            time.sleep(max(0, delay - (time.monotonic() - started)))
@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics_app.models import WeatherData
+from analytics_app.services import weather_model, weather_training
+from analytics_app.services.weather_source import INPUT_HOURS
+
+
+class Command(BaseCommand):
+    help = ("Retrain the weather model on WeatherData (CPU, checkpointed) and publish it as a new "
+            "model version; inference workers swap it in on their next prediction")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--province-only", action="store_true",
+                            help="Train on the province point's observations only, not every municipality's")
+        parser.add_argument("--chunk-size", type=int, default=5000,
+                            help="Observations fetched per query (default 5000)")
+        parser.add_argument("--stride", type=int, default=3,
+                            help="Hours between consecutive training windows (default 3)")
+        parser.add_argument("--epochs", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=64)
+        parser.add_argument("--learning-rate", type=float, default=1e-3)
+        parser.add_argument("--validation", type=float, default=0.1,
+                            help="Share of the most recent windows held out for validation (default 0.1)")
+        parser.add_argument("--patience", type=int, default=3,
+                            help="Stop after this many epochs without a better validation loss (default 3)")
+        parser.add_argument("--threads", type=int, default=0,
+                            help="CPU threads for TensorFlow (default: all cores)")
+        parser.add_argument("--from-scratch", action="store_true",
+                            help="Start from fresh weights instead of fine-tuning the served model")
+        parser.add_argument("--resume", metavar="VERSION",
+                            help="Continue an interrupted run from its last checkpoint")
+        parser.add_argument("--no-activate", action="store_true",
+                            help="Write the new version without serving it")
+        parser.add_argument("--activate", metavar="VERSION",
+                            help="Only switch the served model to an existing version (e.g. to roll back)")
+
+    def handle(self, *args, **options):
+        if options["activate"]:
+            try:
+                weather_model.activate_version(options["activate"])
+            except FileNotFoundError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(f"Serving weather model version {options['activate']}."))
+            return
+
+        # train on the CPU even where TensorFlow can see a GPU; must be set before it is imported
+        os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+        import joblib
+        import tensorflow as tf
+
+        if options["threads"]:
+            tf.config.threading.set_intra_op_parallelism_threads(options["threads"])
+            tf.config.threading.set_inter_op_parallelism_threads(options["threads"])
+
+        version = options["resume"] or datetime.now().strftime("%Y%m%d-%H%M%S")
+        version_dir = Path(settings.WEATHER_MODEL_DIR) / weather_model.VERSIONS_DIR / version
+        if options["resume"] and not version_dir.is_dir():
+            raise CommandError(f"No weather model version {version!r} to resume.")
+        version_dir.mkdir(parents=True, exist_ok=True)
+
+        qs = weather_training.complete_observations(WeatherData, province_only=options["province_only"])
+        capacity = qs.count()
+        self.stdout.write(f"Building training windows from {capacity} observations...")
+
+        try:
+            X, Y, ends = weather_training.build_dataset(
+                weather_training.stream_observations(qs, chunk_size=options["chunk_size"]),
+                version_dir,
+                capacity,
+                stride=max(1, options["stride"]),
+                progress=lambda seen, samples: self.stdout.write(f"  {seen}/{capacity} observations, {samples} windows"),
+            )
+            if len(X) < 2:
+                raise CommandError(
+                    f"Not enough contiguous history: each window needs {INPUT_HOURS} hours "
+                    f"plus {weather_model.OUTPUT_HOURS} to predict."
+                )
+
+            scaler_X, scaler_Y = weather_training.fit_scalers(X, Y)
+            weather_training.scale_in_place(X, Y, scaler_X, scaler_Y)
+            train_ids, val_ids = weather_training.split_by_time(ends, options["validation"])
+            self.stdout.write(f"{len(train_ids)} training and {len(val_ids)} validation windows.")
+
+            current = weather_model.model_dir() / weather_model.KERAS_MODEL_FILE
+            if options["from_scratch"] or not current.exists():
+                model = weather_model.build_model(X.shape[-1])
+                self.stdout.write("Training from scratch.")
+            else:
+                model = weather_model.load_keras_model(current)
+                self.stdout.write(f"Fine-tuning {current}.")
+            model.compile(optimizer=tf.keras.optimizers.Adam(options["learning_rate"]), loss="mse", metrics=["mae"])
+
+            batches = dict(batch_size=options["batch_size"], output_shape=model.output_shape[1:])
+            validation = weather_training.window_batches(X, Y, val_ids, shuffle=False, **batches) if len(val_ids) else None
+            monitor = "val_loss" if validation is not None else "loss"
+            history = model.fit(
+                weather_training.window_batches(X, Y, train_ids, **batches),
+                validation_data=validation,
+                epochs=options["epochs"],
+                verbose=2,
+                callbacks=[
+                    # resumes an interrupted run (--resume) from its last finished epoch
+                    tf.keras.callbacks.BackupAndRestore(str(version_dir / "backup")),
+                    tf.keras.callbacks.ModelCheckpoint(
+                        str(version_dir / weather_model.KERAS_MODEL_FILE), monitor=monitor, save_best_only=True
+                    ),
+                    tf.keras.callbacks.EarlyStopping(
+                        monitor=monitor, patience=options["patience"], restore_best_weights=True
+                    ),
+                ],
+            )
+        finally:
+            for name in ("dataset_X.npy", "dataset_Y.npy"):
+                (version_dir / name).unlink(missing_ok=True)
+
+        joblib.dump(scaler_X, version_dir / "scaler_X.pkl")
+        joblib.dump(scaler_Y, version_dir / "scaler_Y.pkl")
+        shutil.rmtree(version_dir / "backup", ignore_errors=True)
+
+        best = min(history.history[monitor])
+        (version_dir / "metadata.json").write_text(json.dumps({
+            "version": version,
+            "trained_at": datetime.now().isoformat(),
+            "observations": capacity,
+            "train_windows": len(train_ids),
+            "validation_windows": len(val_ids),
+            "first_window_end": str(ends.min()),
+            "last_window_end": str(ends.max()),
+            "epochs": len(history.history[monitor]),
+            monitor: best,
+        }, indent=2), encoding="utf-8")
+
+        self.stdout.write(f"Wrote version {version} to {version_dir} (best {monitor} {best:.4f}).")
+        if options["no_activate"]:
+            self.stdout.write(f"Not activated; serve it with --activate {version}.")
+            return
+        weather_model.activate_version(version)
+        self.stdout.write(self.style.SUCCESS(f"Serving weather model version {version}."))
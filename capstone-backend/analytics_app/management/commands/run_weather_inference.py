@@ -0,0 +1,62 @@
+import socketserver
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics_app.services import inference_client, weather_model
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            message = inference_client.recv_message(self.request)
+            reply = self.server.dispatch(message)
+        except Exception as exc:
+            reply = {"ok": False, "error": str(exc)}
+        try:
+            inference_client.send_message(self.request, reply)
+        except OSError:
+            pass
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        # one prediction at a time; TF already uses every core per call
+        self.predict_lock = threading.Lock()
+
+    def dispatch(self, message):
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "predict":
+            with self.predict_lock:
+                windows = message["windows"]
+                predictions = weather_model.predict_batch(windows).tolist() if windows else []
+            return {"ok": True, "columns": weather_model.target_cols, "predictions": predictions}
+        return {"ok": False, "error": f"Unknown op {op!r}."}
+
+
+class Command(BaseCommand):
+    help = "Serve weather model predictions to the web workers over a local socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--address", default=None,
+                            help="host:port to listen on (default settings.WEATHER_INFERENCE_ADDRESS)")
+
+    def handle(self, *args, **options):
+        address = inference_client.parse_address(options["address"] or settings.WEATHER_INFERENCE_ADDRESS)
+
+        self.stdout.write("Loading weather model...")
+        weather_model.warm_up()
+
+        with _Server(address) as server:
+            self.stdout.write(self.style.SUCCESS(f"Weather inference listening on {address[0]}:{address[1]}"))
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
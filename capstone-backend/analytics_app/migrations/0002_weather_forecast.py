@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generated_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('OK', 'OK'), ('FAILED', 'Failed')], default='OK', max_length=10)),
+                ('input_end', models.DateTimeField(blank=True, null=True)),
+                ('input_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('predictions', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'ordering': ['-generated_at', '-id'],
+                'indexes': [models.Index(fields=['status', 'generated_at'], name='weatherforecast_status_gen')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics_app', '0002_weather_forecast'),
+        ('auth_app', '0014_merge_20260224_0546'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='weatherforecast',
+            name='weatherforecast_status_gen',
+        ),
+        migrations.AlterUniqueTogether(
+            name='weatherdata',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='weatherdata',
+            name='municipality',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='weather_data', to='auth_app.municipality'),
+        ),
+        migrations.AddField(
+            model_name='weatherforecast',
+            name='municipality',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='weather_forecasts', to='auth_app.municipality'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='weatherdata',
+            unique_together={('municipality', 'datetime')},
+        ),
+        migrations.AddIndex(
+            model_name='weatherforecast',
+            index=models.Index(fields=['municipality', 'status', 'generated_at'], name='weatherforecast_muni_status'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:36
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_province_rows(apps, schema_editor):
+    # keep the newest row of each province-point hour stored twice
+    WeatherData = apps.get_model("analytics_app", "WeatherData")
+    duplicated = (
+        WeatherData.objects
+        .filter(municipality__isnull=True)
+        .values("datetime")
+        .annotate(n=Count("id"), keep=Max("id"))
+        .filter(n__gt=1)
+    )
+    for row in duplicated:
+        WeatherData.objects.filter(
+            municipality__isnull=True, datetime=row["datetime"]
+        ).exclude(id=row["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics_app', '0003_weather_per_municipality'),
+        ('auth_app', '0015_hazardreport_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_province_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='weatherdata',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('municipality', 0, output_field=models.IntegerField()), models.F('datetime'), name='weatherdata_location_datetime_uniq'),
+        ),
+    ]
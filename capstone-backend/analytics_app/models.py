@@ -1,8 +1,17 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 
 # Create your models here.
 
 class WeatherData(models.Model):
+    # null = the province-wide point (weather_source.DEFAULT_LATITUDE/LONGITUDE)
+    municipality = models.ForeignKey(
+        "auth_app.Municipality",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="weather_data",
+    )
     datetime = models.DateTimeField()
     temperature_2m = models.FloatField(null=True)
     relative_humidity_2m = models.FloatField(null=True)
@@ -15,4 +24,50 @@ class WeatherData(models.Model):
 
     class Meta:
         ordering = ['datetime']
-        unique_together = ['datetime']  # Prevent duplicates
+        unique_together = ['municipality', 'datetime']  # Prevent duplicates
+        constraints = [
+            # unique_together lets NULLs repeat, so the province point gets
+            # its own key; MySQL ignores partial (conditional) indexes, hence
+            # a functional one
+            models.UniqueConstraint(
+                Coalesce('municipality', 0, output_field=models.IntegerField()),
+                'datetime',
+                name='weatherdata_location_datetime_uniq',
+            ),
+        ]
+
+
+class WeatherForecast(models.Model):
+    """
+    One run of the scheduled forecast job (manage.py refresh_weather_forecast).
+    Failed runs are kept too, so readers can tell they're being served an
+    older forecast and why.
+    """
+    STATUS_CHOICES = [
+        ('OK', 'OK'),
+        ('FAILED', 'Failed'),
+    ]
+
+    # null = the province-wide point
+    municipality = models.ForeignKey(
+        "auth_app.Municipality",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="weather_forecasts",
+    )
+    generated_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OK')
+    input_end = models.DateTimeField(null=True, blank=True)  # last observed hour fed to the model
+    input_hash = models.CharField(max_length=64, blank=True, default="")
+    predictions = models.JSONField(default=list)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ['-generated_at', '-id']
+        indexes = [
+            models.Index(fields=['municipality', 'status', 'generated_at'], name='weatherforecast_muni_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.status} forecast @ {self.generated_at}"
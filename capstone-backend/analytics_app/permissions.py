@@ -21,4 +21,23 @@ class IsProvincialAdmin(BasePermission):
         if hasattr(user, "municipality") and user.municipality is None:
             return True
 
-        return False
\ No newline at end of file
+        return False
+
+
+class IsProvincialOrMunicipalAdmin(BasePermission):
+    """
+    Provincial Admins, plus Municipal Admins; views scope the latter to
+    their own municipality.
+    """
+
+    ROLES = ("PROVINCIAL_ADMIN", "MUNICIPAL_ADMIN")
+
+    def has_permission(self, request, view):
+        user = request.user
+
+        if not user or not user.is_authenticated:
+            return False
+
+        # by role only: unlike IsProvincialAdmin, a missing municipality
+        # doesn't make a citizen or staff account provincial
+        return getattr(user, "role", None) in self.ROLES
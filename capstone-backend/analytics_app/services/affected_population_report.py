@@ -1,7 +1,8 @@
 from collections import defaultdict
 from typing import Any
 
-from django.db.models import Max, Sum
+from django.db.models import F, Q, Sum, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 
 
@@ -67,88 +68,119 @@ def _add_totals(target: dict, row: dict):
         target[field] += _safe_int(row.get(field))
 
 
-def build_affected_population_report(*, EvacuationCenterModel, EvacuationLogModel, as_of=None):
-    if as_of is None:
-        as_of = timezone.localtime(timezone.now()).replace(tzinfo=None)
+_NO_LOGS = {"families_in_sum": 0, "persons_in_sum": 0, "families_now": 0, "persons_now": 0}
 
-    if timezone.is_aware(as_of):
-        as_of = timezone.make_naive(as_of, timezone.get_current_timezone())
+
+def center_totals_as_of(logs_qs, as_of):
+    """
+    Per center, in one query: cumulative families/persons in up to `as_of`
+    and the running totals of its latest log at `as_of` (ROW_NUMBER over
+    each center's logs, newest first; the window sums share the partition).
+
+    Returns {center_id: {families_in_sum, persons_in_sum, families_now, persons_now}}.
+    """
+    by_center = [F("center_id")]
+    rows = (
+        logs_qs
+        .filter(date_recorded__lte=as_of)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=by_center,
+                order_by=[F("date_recorded").desc(), F("id").desc()],
+            ),
+            families_in_sum=Window(Sum("families_in"), partition_by=by_center),
+            persons_in_sum=Window(Sum("individuals_in"), partition_by=by_center),
+        )
+        .filter(position=1)
+        .values(
+            "center_id",
+            "families_in_sum",
+            "persons_in_sum",
+            "total_current_families",
+            "total_current",
+        )
+    )
+
+    return {
+        row["center_id"]: {
+            "families_in_sum": _safe_int(row["families_in_sum"]),
+            "persons_in_sum": _safe_int(row["persons_in_sum"]),
+            "families_now": _safe_int(row["total_current_families"]),
+            "persons_now": _safe_int(row["total_current"]),
+        }
+        for row in rows
+    }
+
+
+def _event_info(event):
+    if event is None:
+        return None
+    return {"id": event.id, "name": event.name, "status": event.status}
+
+
+def _naive(dt):
+    if timezone.is_aware(dt):
+        return timezone.make_naive(dt, timezone.get_current_timezone())
+    return dt
+
+
+def _report_scope(EvacuationCenterModel, EvacuationLogModel, event=None, municipality_ids=None):
+    """
+    Centers to list ({center_id: location}) and the logs that count.
+    With `event`, only that DisasterEvent's logs count and only centers in
+    its municipality (all, for a province-wide event) are listed. With
+    `municipality_ids`, only centers in those municipalities are.
+    """
+    centers_qs = EvacuationCenterModel.objects.all()
+    logs_qs = EvacuationLogModel.objects.all()
+    if event is not None:
+        logs_qs = logs_qs.filter(event_id=event.id)
+        if event.municipality_id is not None:
+            centers_qs = centers_qs.filter(municipality_id=event.municipality_id)
+    if municipality_ids is not None:
+        municipality_ids = list(municipality_ids)
+        centers_qs = centers_qs.filter(municipality_id__in=municipality_ids)
+        logs_qs = logs_qs.filter(center__municipality_id__in=municipality_ids)
 
     centers = list(
-        EvacuationCenterModel.objects.select_related("municipality", "barangay").values(
+        centers_qs.select_related("municipality", "barangay").values(
             "id",
             "name",
             "province",
+            "municipality_id",
             "municipality__name",
             "barangay__name",
             "shelter_category",
         )
     )
 
-    def has_activity(row):
-        return any([
-            row["affected_families"] > 0,
-            row["affected_persons"] > 0,
-            row["inside_families_now"] > 0,
-            row["inside_persons_now"] > 0,
-            row["outside_families_now"] > 0,
-            row["outside_persons_now"] > 0,
-            row["inside_families_cum"] > 0,
-            row["outside_families_cum"] > 0,
-        ])
-
     center_map = {
         c["id"]: {
             "province": c.get("province") or "Oriental Mindoro",
+            "municipality_id": c.get("municipality_id"),
             "municipality": c.get("municipality__name") or "Unknown Municipality",
             "barangay": c.get("barangay__name") or c.get("name") or "Unknown Barangay",
             "shelter_category": c.get("shelter_category") or "INSIDE_EC",
         }
         for c in centers
     }
+    return center_map, logs_qs
 
-    cumulative_logs = (
-        EvacuationLogModel.objects
-        .filter(date_recorded__lte=as_of)
-        .values("center_id")
-        .annotate(
-            families_in_sum=Sum("families_in"),
-            persons_in_sum=Sum("individuals_in"),
-        )
-    )
-
-    cumulative_map = {
-        row["center_id"]: {
-            "families_in_sum": _safe_int(row["families_in_sum"]),
-            "persons_in_sum": _safe_int(row["persons_in_sum"]),
-        }
-        for row in cumulative_logs
-    }
-
-    latest_times = (
-        EvacuationLogModel.objects
-        .filter(date_recorded__lte=as_of)
-        .values("center_id")
-        .annotate(latest_time=Max("date_recorded"))
-    )
-
-    latest_snapshot_map = {}
-    for row in latest_times:
-        center_id = row["center_id"]
-        latest_time = row["latest_time"]
-
-        latest = (
-            EvacuationLogModel.objects
-            .filter(center_id=center_id, date_recorded=latest_time)
-            .values("total_current_families", "total_current")
-            .order_by("-id")
-            .first()
-        )
 
-        latest_snapshot_map[center_id] = {
-            "families_now": _safe_int((latest or {}).get("total_current_families")),
-            "persons_now": _safe_int((latest or {}).get("total_current")),
-        }
+def _barangay_rows(center_map, center_totals):
+    """Affected barangay rows, sorted by municipality and barangay."""
+    def has_activity(row):
+        return any([
+            row["affected_families"] > 0,
+            row["affected_persons"] > 0,
+            row["inside_families_now"] > 0,
+            row["inside_persons_now"] > 0,
+            row["outside_families_now"] > 0,
+            row["outside_persons_now"] > 0,
+            row["inside_families_cum"] > 0,
+            row["outside_families_cum"] > 0,
+        ])
 
     grouped = defaultdict(dict)
 
@@ -170,8 +202,7 @@ def build_affected_population_report(*, EvacuationCenterModel, EvacuationLogMode
 
         row = grouped[key]
 
-        cum = cumulative_map.get(center_id, {"families_in_sum": 0, "persons_in_sum": 0})
-        snap = latest_snapshot_map.get(center_id, {"families_now": 0, "persons_now": 0})
+        cum = snap = center_totals.get(center_id, _NO_LOGS)
 
         # temporary approximation until a separate affected-population source exists
         row["affected_brgys"] = 1
@@ -206,18 +237,16 @@ def build_affected_population_report(*, EvacuationCenterModel, EvacuationLogMode
         if has_activity(row)
     ]
 
-    data_rows = sorted(
+    return sorted(
         filtered_rows,
         key=lambda r: (r["municipality"], r["barangay"])
     )
 
+
+def _with_totals(data_rows):
+    """Sorted barangay rows with municipal subtotals and a grand total; [] when there are none."""
     if not data_rows:
-        return {
-            "title": "Affected Population Report",
-            "as_of": as_of.isoformat(),
-            "rows": [],
-            "note": "No affected areas found for this time period."
-        }
+        return []
 
     final_rows = []
     grand_total = _blank_row(row_type="grand_total", barangay="Total")
@@ -244,8 +273,175 @@ def build_affected_population_report(*, EvacuationCenterModel, EvacuationLogMode
 
     final_rows.append(grand_total)
 
+    return final_rows
+
+
+def _report_rows(center_map, center_totals):
+    """Barangay rows with municipal subtotals and a grand total; [] when nothing is affected."""
+    return _with_totals(_barangay_rows(center_map, center_totals))
+
+
+def build_municipal_partials(*, EvacuationCenterModel, EvacuationLogModel, municipality_ids, as_of, event=None):
+    """
+    Report rows of each municipality on its own: its barangay rows followed
+    by its subtotal, or [] when nothing there is affected. Two queries for
+    any number of municipalities. merge_partials() puts them back together.
+
+    Returns {municipality_id: rows}.
+    """
+    municipality_ids = list(municipality_ids)
+    as_of = _naive(as_of)
+
+    center_map, logs_qs = _report_scope(EvacuationCenterModel, EvacuationLogModel, event, municipality_ids)
+    center_totals = center_totals_as_of(logs_qs, as_of)
+
+    by_municipality = defaultdict(dict)
+    for center_id, location in center_map.items():
+        by_municipality[location["municipality_id"]][center_id] = location
+
+    partials = {}
+    for municipality_id in municipality_ids:
+        rows = _report_rows(by_municipality.get(municipality_id, {}), center_totals)
+        partials[municipality_id] = rows[:-1]  # without the grand total
+    return partials
+
+
+def merge_partials(partials):
+    """Report rows from municipal partials: ordered by municipality, plus the grand total."""
+    partials = sorted(
+        (rows for rows in partials if rows),
+        key=lambda rows: rows[-1]["municipality"],
+    )
+    if not partials:
+        return []
+
+    final_rows = []
+    grand_total = _blank_row(row_type="grand_total", barangay="Total")
+    for rows in partials:
+        final_rows.extend(rows)
+        for row in rows:
+            if row["row_type"] == "subtotal":
+                _add_totals(grand_total, row)
+
+    final_rows.append(grand_total)
+    return final_rows
+
+
+def report_payload(rows, as_of, event=None):
+    payload = {
+        "title": "Affected Population Report",
+        "as_of": _naive(as_of).isoformat(),
+        "event": _event_info(event),
+        "rows": rows,
+    }
+    if not rows:
+        payload["note"] = "No affected areas found for this time period."
+    return payload
+
+
+def build_affected_population_report(
+    *,
+    EvacuationCenterModel,
+    EvacuationLogModel,
+    as_of=None,
+    event=None,
+    municipality_ids=None,
+):
+    as_of = _naive(as_of or timezone.now())
+
+    center_map, logs_qs = _report_scope(EvacuationCenterModel, EvacuationLogModel, event, municipality_ids)
+    final_rows = _report_rows(center_map, center_totals_as_of(logs_qs, as_of))
+    return report_payload(final_rows, as_of, event)
+
+
+def _logs_in_order(logs_qs, start, end, batch_size=5000):
+    """(center_id, families_in, individuals_in, total_current_families, total_current, date_recorded)
+    of logs in (start, end], in (date_recorded, id) order, read in keyset batches."""
+    base = (
+        logs_qs
+        .filter(date_recorded__gt=start, date_recorded__lte=end)
+        .order_by("date_recorded", "id")
+        .values_list(
+            "center_id",
+            "families_in",
+            "individuals_in",
+            "total_current_families",
+            "total_current",
+            "date_recorded",
+            "id",
+        )
+    )
+
+    last = None
+    while True:
+        qs = base
+        if last is not None:
+            qs = qs.filter(Q(date_recorded__gt=last[0]) | Q(date_recorded=last[0], id__gt=last[1]))
+        batch = list(qs[:batch_size])
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = (batch[-1][5], batch[-1][6])
+
+
+def build_affected_population_series(
+    *,
+    EvacuationCenterModel,
+    EvacuationLogModel,
+    start,
+    end,
+    step,
+    event=None,
+    municipality_ids=None,
+):
+    """
+    The affected population report at every `step` from `start` to `end`
+    (end always included), from one chronological pass over the logs,
+    optionally limited to centers in `municipality_ids`.
+
+    Totals at `start` come from center_totals_as_of(); each later log then
+    bumps its center's cumulative sums and replaces its "now" totals (the
+    newest log of a center carries its running totals). At each boundary
+    the full report rows are emitted from that state.
+    """
+    start, end = _naive(start), _naive(end)
+
+    boundaries = []
+    at = start + step
+    while at < end:
+        boundaries.append(at)
+        at += step
+    if end > start:
+        boundaries.append(end)
+
+    center_map, logs_qs = _report_scope(EvacuationCenterModel, EvacuationLogModel, event, municipality_ids)
+    state = center_totals_as_of(logs_qs, start)
+
+    series = [{"as_of": start.isoformat(), "rows": _report_rows(center_map, state)}]
+    pending = iter(boundaries)
+    boundary = next(pending, None)
+
+    for log in _logs_in_order(logs_qs, start, end):
+        center_id, families_in, persons_in, families_now, persons_now, date_recorded, _ = log
+        while boundary is not None and date_recorded > boundary:
+            series.append({"as_of": boundary.isoformat(), "rows": _report_rows(center_map, state)})
+            boundary = next(pending, None)
+
+        totals = state.setdefault(center_id, dict(_NO_LOGS))
+        totals["families_in_sum"] += _safe_int(families_in)
+        totals["persons_in_sum"] += _safe_int(persons_in)
+        totals["families_now"] = _safe_int(families_now)
+        totals["persons_now"] = _safe_int(persons_now)
+
+    while boundary is not None:
+        series.append({"as_of": boundary.isoformat(), "rows": _report_rows(center_map, state)})
+        boundary = next(pending, None)
+
     return {
         "title": "Affected Population Report",
-        "as_of": as_of.isoformat(),
-        "rows": final_rows,
-    }
\ No newline at end of file
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "step_minutes": int(step.total_seconds() // 60),
+        "event": _event_info(event),
+        "series": series,
+    }
@@ -2,11 +2,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List
 
-from django.db.models import Sum
-from django.utils import timezone
+from django.apps import apps
+
+from evac_app.services import rollups
 
 
 @dataclass
@@ -23,6 +23,97 @@ def clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
 
 
+# Recommendation text per risk level
+RECOMMENDATIONS = {
+    "CRITICAL": "Center likely to exceed capacity soon. Redirect evacuees to nearby centers.",
+    "HIGH": "High congestion risk. Prepare overflow plan and monitor inflow closely.",
+    "MODERATE": "Moderate risk. Continue monitoring and prepare additional resources.",
+    "LOW": "Low risk. Normal monitoring.",
+}
+
+NO_CAPACITY_RECOMMENDATION = "No capacity configured for this center."
+
+
+def no_capacity_payload(*, center_id: int, capacity: int, params: CongestionParams) -> Dict[str, Any]:
+    """LOW-risk payload of a center without a configured capacity."""
+    return {
+        "center_id": center_id,
+        "capacity": capacity,
+        "latest_log_time": None,
+
+        "current_total": 0,
+        "occupancy": 0.0,
+
+        "window_minutes": params.window_minutes,
+        "horizon_minutes": params.horizon_minutes,
+        "total_in_window": 0,
+        "total_out_window": 0,
+        "net_rate_per_min": 0.0,
+
+        "predicted_total": 0,
+        "predicted_occupancy": 0.0,
+
+        "vulnerable_total": 0,
+        "vulnerability_ratio": 0.0,
+
+        "risk_score": 0.0,
+        "risk_level": "LOW",
+        "recommendation": NO_CAPACITY_RECOMMENDATION,
+    }
+
+
+def risk_payload(
+    *,
+    center_id: int,
+    capacity: int,
+    latest_log_time: Optional[str],
+    current_total: int,
+    occupancy: float,
+    params: CongestionParams,
+    total_in: int,
+    total_out: int,
+    net_rate_per_min: float,
+    predicted_total: float,
+    predicted_occupancy: float,
+    vulnerable_total: int,
+    vulnerability_ratio: float,
+    risk_score: float,
+    risk_level: str,
+) -> Dict[str, Any]:
+    """Congestion risk payload of a scored center (rounding and recommendation included)."""
+    return {
+        "center_id": center_id,
+        "capacity": capacity,
+        "latest_log_time": latest_log_time,
+
+        "current_total": current_total,
+        "occupancy": round(occupancy, 4),
+
+        "window_minutes": params.window_minutes,
+        "horizon_minutes": params.horizon_minutes,
+        "total_in_window": total_in,
+        "total_out_window": total_out,
+        "net_rate_per_min": round(net_rate_per_min, 4),
+
+        "predicted_total": int(round(predicted_total)),
+        "predicted_occupancy": round(predicted_occupancy, 4),
+
+        "vulnerable_total": vulnerable_total,
+        "vulnerability_ratio": round(vulnerability_ratio, 4),
+
+        "risk_score": round(risk_score, 4),
+        "risk_level": risk_level,
+        "recommendation": RECOMMENDATIONS[risk_level],
+    }
+
+
+def _capacity_of(center) -> int:
+    try:
+        return int(getattr(center, "individual_capacity_max", None) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
 def compute_congestion_risk(
     *,
     center,
@@ -32,65 +123,77 @@ def compute_congestion_risk(
     """
     Hybrid Real-Time Congestion Risk Model (no training required)
 
+    Loads the inflow/outflow window of one center and scores it with
+    score_congestion_risk().
+    """
+    if _capacity_of(center) <= 0:
+        return score_congestion_risk(center=center, total_in=0, total_out=0, params=params)
+
+    window = params.window_minutes
+    flows = rollups.window_sums(
+        EvacuationLogModel=EvacuationLogModel,
+        RollupModel=apps.get_model("evac_app", "EvacuationFlowRollup"),
+        center_ids=[center.id],
+        windows=[window],
+    )[window][center.id]
+
+    return score_congestion_risk(
+        center=center,
+        total_in=flows["individuals_in"],
+        total_out=flows["individuals_out"],
+        params=params,
+    )
+
+
+def compute_congestion_risk_batch(
+    *,
+    centers: Iterable,
+    EvacuationLogModel,
+    params: CongestionParams = CongestionParams(),
+) -> List[Dict[str, Any]]:
+    """
+    compute_congestion_risk() for many centers at once, scored by the
+    vectorized CongestionEngine. `centers` should come with
+    select_related("occupancy").
+    """
+    from .congestion_engine import CongestionEngine
+
+    engine = CongestionEngine.from_centers(
+        centers,
+        EvacuationLogModel,
+        windows=[params.window_minutes],
+    )
+    return engine.results(params)
+
+
+def score_congestion_risk(
+    *,
+    center,
+    total_in: int,
+    total_out: int,
+    params: CongestionParams = CongestionParams(),
+) -> Dict[str, Any]:
+    """
+    Hybrid Real-Time Congestion Risk Model (no training required)
+
     Requires:
       - center.capacity (int)
-      - logs fields (based on your schema):
-        date_recorded, individuals_in, individuals_out, total_current,
-        children_count, lactating_count, pregnant_count, pwd_count, senior_count
+      - center.occupancy (CenterOccupancy snapshot, select_related when batching)
+      - total_in / total_out: individuals in/out over params.window_minutes
     """
 
     # capacity
-    capacity_raw = getattr(center, "individual_capacity_max", None)
-
-    try:
-        capacity = int(capacity_raw or 0)
-    except (TypeError, ValueError):
-        capacity = 0
+    capacity = _capacity_of(center)
 
     # If capacity is missing, DON'T return 400.
     # Return a valid LOW-risk payload so the frontend table won't spam 400s.
     if capacity <= 0:
-        return {
-            "center_id": center.id,
-            "capacity": capacity,
-            "latest_log_time": None,
-
-            "current_total": 0,
-            "occupancy": 0.0,
-
-            "window_minutes": params.window_minutes,
-            "horizon_minutes": params.horizon_minutes,
-            "total_in_window": 0,
-            "total_out_window": 0,
-            "net_rate_per_min": 0.0,
-
-            "predicted_total": 0,
-            "predicted_occupancy": 0.0,
-
-            "vulnerable_total": 0,
-            "vulnerability_ratio": 0.0,
-
-            "risk_score": 0.0,
-            "risk_level": "LOW",
-            "recommendation": "No capacity configured for this center.",
-        }
-
-    # 1) latest snapshot
-    latest = (
-        EvacuationLogModel.objects
-        .filter(center_id=center.id)
-        .order_by("-date_recorded")
-        .only(
-            "date_recorded",
-            "total_current",
-            "children_count",
-            "lactating_count",
-            "pregnant_count",
-            "pwd_count",
-            "senior_count",
-        )
-        .first()
-    )
+        return no_capacity_payload(center_id=center.id, capacity=capacity, params=params)
+
+    # 1) latest snapshot (maintained by EvacuationLog.save)
+    latest = getattr(center, "occupancy", None)
+    if latest is not None and latest.date_recorded is None:
+        latest = None
 
     current_total = int(getattr(latest, "total_current", 0) or 0)
     occupancy = current_total / float(capacity)
@@ -110,20 +213,7 @@ def compute_congestion_risk(
         vulnerable_total = 0
         vulnerability_ratio = 0.0
 
-    # 2) compute inflow/outflow in window
-    since = timezone.now() - timedelta(minutes=params.window_minutes)
-    agg = (
-        EvacuationLogModel.objects
-        .filter(center_id=center.id, date_recorded__gte=since)
-        .aggregate(
-            total_in=Sum("individuals_in"),
-            total_out=Sum("individuals_out"),
-        )
-    )
-
-    total_in = int(agg["total_in"] or 0)
-    total_out = int(agg["total_out"] or 0)
-
+    # 2) inflow/outflow in window (loaded by the caller)
     net_flow = total_in - total_out
     net_rate_per_min = net_flow / float(params.window_minutes) if params.window_minutes > 0 else 0.0
 
@@ -153,37 +243,20 @@ def compute_congestion_risk(
     else:
         risk_level = "LOW"
 
-    # Recommendation text (optional)
-    if risk_level == "CRITICAL":
-        recommendation = "Center likely to exceed capacity soon. Redirect evacuees to nearby centers."
-    elif risk_level == "HIGH":
-        recommendation = "High congestion risk. Prepare overflow plan and monitor inflow closely."
-    elif risk_level == "MODERATE":
-        recommendation = "Moderate risk. Continue monitoring and prepare additional resources."
-    else:
-        recommendation = "Low risk. Normal monitoring."
-
-    return {
-        "center_id": center.id,
-        "capacity": capacity,
-        "latest_log_time": latest.date_recorded.isoformat() if latest else None,
-
-        "current_total": current_total,
-        "occupancy": round(occupancy, 4),
-
-        "window_minutes": params.window_minutes,
-        "horizon_minutes": params.horizon_minutes,
-        "total_in_window": total_in,
-        "total_out_window": total_out,
-        "net_rate_per_min": round(net_rate_per_min, 4),
-
-        "predicted_total": int(round(predicted_total)),
-        "predicted_occupancy": round(predicted_occupancy, 4),
-
-        "vulnerable_total": vulnerable_total,
-        "vulnerability_ratio": round(vulnerability_ratio, 4),
-
-        "risk_score": round(risk_score, 4),
-        "risk_level": risk_level,
-        "recommendation": recommendation,
-    }
\ No newline at end of file
+    return risk_payload(
+        center_id=center.id,
+        capacity=capacity,
+        latest_log_time=latest.date_recorded.isoformat() if latest else None,
+        current_total=current_total,
+        occupancy=occupancy,
+        params=params,
+        total_in=total_in,
+        total_out=total_out,
+        net_rate_per_min=net_rate_per_min,
+        predicted_total=predicted_total,
+        predicted_occupancy=predicted_occupancy,
+        vulnerable_total=vulnerable_total,
+        vulnerability_ratio=vulnerability_ratio,
+        risk_score=risk_score,
+        risk_level=risk_level,
+    )
@@ -0,0 +1,257 @@
+#analytics_app/services/congestion_engine.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.apps import apps
+
+from evac_app.services import rollups
+from .congestion import CongestionParams, no_capacity_payload, risk_payload
+
+
+RISK_LEVELS = np.array(["LOW", "MODERATE", "HIGH", "CRITICAL"])
+
+
+@dataclass
+class CenterArrays:
+    """Per-center inputs of the congestion model, aligned by index."""
+    center_ids: np.ndarray          # int64
+    capacity: np.ndarray            # int64, individual_capacity_max
+    current_total: np.ndarray       # int64, 0 when there is no snapshot
+    vulnerable_total: np.ndarray    # int64, 0 when current_total is 0
+    latest_log_time: List[Optional[str]]
+
+    def __len__(self):
+        return len(self.center_ids)
+
+
+def _int_or_zero(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def load_center_arrays(centers: Iterable) -> CenterArrays:
+    """
+    Reads capacity and the occupancy snapshot of each center into arrays.
+    `centers` should come with select_related("occupancy").
+    """
+    ids, capacity, current, vulnerable, latest_times = [], [], [], [], []
+
+    for center in centers:
+        latest = getattr(center, "occupancy", None)
+        if latest is not None and latest.date_recorded is None:
+            latest = None
+
+        current_total = _int_or_zero(getattr(latest, "total_current", 0))
+        vulnerable_total = 0
+        if latest is not None and current_total > 0:
+            vulnerable_total = (
+                _int_or_zero(latest.children_count)
+                + _int_or_zero(latest.senior_count)
+                + _int_or_zero(latest.pwd_count)
+                + _int_or_zero(latest.pregnant_count)
+                + _int_or_zero(latest.lactating_count)
+            )
+
+        ids.append(center.id)
+        capacity.append(_int_or_zero(getattr(center, "individual_capacity_max", None)))
+        current.append(current_total)
+        vulnerable.append(vulnerable_total)
+        latest_times.append(latest.date_recorded.isoformat() if latest else None)
+
+    return CenterArrays(
+        center_ids=np.asarray(ids, dtype=np.int64),
+        capacity=np.asarray(capacity, dtype=np.int64),
+        current_total=np.asarray(current, dtype=np.int64),
+        vulnerable_total=np.asarray(vulnerable, dtype=np.int64),
+        latest_log_time=latest_times,
+    )
+
+
+def load_window_flows(
+    *,
+    center_ids: Sequence[int],
+    EvacuationLogModel,
+    windows: Iterable[int],
+    now=None,
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Individuals in/out of every center for each window (minutes), read from
+    the hourly flow rollups plus the raw logs at the window edges:
+    {window: (total_in, total_out)}.
+    """
+    windows = sorted(set(int(w) for w in windows))
+    center_ids = np.asarray(center_ids, dtype=np.int64)
+    flows = {
+        w: (np.zeros(len(center_ids), dtype=np.int64), np.zeros(len(center_ids), dtype=np.int64))
+        for w in windows
+    }
+    if not windows or not len(center_ids):
+        return flows
+
+    sums = rollups.window_sums(
+        EvacuationLogModel=EvacuationLogModel,
+        RollupModel=apps.get_model("evac_app", "EvacuationFlowRollup"),
+        center_ids=center_ids.tolist(),
+        windows=windows,
+        now=now,
+    )
+
+    position = {int(cid): i for i, cid in enumerate(center_ids)}
+    for w in windows:
+        for center_id, totals in sums[w].items():
+            i = position[center_id]
+            flows[w][0][i] = totals["individuals_in"]
+            flows[w][1][i] = totals["individuals_out"]
+
+    return flows
+
+
+def score_arrays(
+    centers: CenterArrays,
+    total_in: np.ndarray,
+    total_out: np.ndarray,
+    params: CongestionParams = CongestionParams(),
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized score_congestion_risk(). Same operations in the same order,
+    so the float64 results are identical to the scalar model.
+    """
+    has_capacity = centers.capacity > 0
+    capacity = np.where(has_capacity, centers.capacity, 1).astype(np.float64)
+    current_total = np.where(has_capacity, centers.current_total, 0)
+    total_in = np.where(has_capacity, total_in, 0)
+    total_out = np.where(has_capacity, total_out, 0)
+
+    occupancy = current_total / capacity
+
+    vulnerable_total = np.where(has_capacity & (current_total > 0), centers.vulnerable_total, 0)
+    vulnerability_ratio = np.zeros(len(centers), dtype=np.float64)
+    populated = current_total > 0
+    vulnerability_ratio[populated] = np.clip(
+        vulnerable_total[populated] / current_total[populated].astype(np.float64), 0.0, 1.0
+    )
+
+    if params.window_minutes > 0:
+        net_rate_per_min = (total_in - total_out) / float(params.window_minutes)
+    else:
+        net_rate_per_min = np.zeros(len(centers), dtype=np.float64)
+    net_rate_per_min = np.maximum(0.0, net_rate_per_min)
+
+    predicted_total = current_total + (net_rate_per_min * params.horizon_minutes)
+    predicted_occupancy = predicted_total / capacity
+
+    risk_score = (
+        params.w_occ * occupancy
+        + params.w_pred * predicted_occupancy
+        + params.w_vuln * vulnerability_ratio
+    )
+
+    # same precedence as the scalar guardrails
+    level_index = np.select(
+        [
+            predicted_occupancy >= 1.0,
+            occupancy >= 0.95,
+            risk_score >= 0.90,
+            risk_score >= 0.70,
+        ],
+        [3, 2, 2, 1],
+        default=0,
+    )
+    level_index = np.where(has_capacity, level_index, 0)
+
+    return {
+        "has_capacity": has_capacity,
+        "current_total": current_total,
+        "occupancy": np.where(has_capacity, occupancy, 0.0),
+        "total_in_window": total_in,
+        "total_out_window": total_out,
+        "net_rate_per_min": np.where(has_capacity, net_rate_per_min, 0.0),
+        "predicted_total": np.where(has_capacity, predicted_total, 0.0),
+        "predicted_occupancy": np.where(has_capacity, predicted_occupancy, 0.0),
+        "vulnerable_total": vulnerable_total,
+        "vulnerability_ratio": vulnerability_ratio,
+        "risk_score": np.where(has_capacity, risk_score, 0.0),
+        "risk_level": RISK_LEVELS[level_index],
+    }
+
+
+class CongestionEngine:
+    """
+    Congestion risk for many centers and many (window, horizon) pairs.
+
+        engine = CongestionEngine.from_centers(centers, EvacuationLog, windows=[60])
+        results = engine.results(CongestionParams(window_minutes=60))
+
+    Snapshots and window flows are loaded once with a fixed number of
+    queries; every parameter set is then scored with array operations.
+    """
+
+    def __init__(self, centers: CenterArrays, flows: Dict[int, Tuple[np.ndarray, np.ndarray]]):
+        self.centers = centers
+        self.flows = flows
+
+    @classmethod
+    def from_centers(cls, centers: Iterable, EvacuationLogModel, windows: Iterable[int] = (60,)):
+        arrays = load_center_arrays(centers)
+        flows = load_window_flows(
+            center_ids=arrays.center_ids[arrays.capacity > 0],
+            EvacuationLogModel=EvacuationLogModel,
+            windows=windows,
+        )
+
+        # flows were loaded for centers with capacity only; spread back to full length
+        full = {}
+        for w, (w_in, w_out) in flows.items():
+            total_in = np.zeros(len(arrays), dtype=np.int64)
+            total_out = np.zeros(len(arrays), dtype=np.int64)
+            total_in[arrays.capacity > 0] = w_in
+            total_out[arrays.capacity > 0] = w_out
+            full[w] = (total_in, total_out)
+
+        return cls(arrays, full)
+
+    def evaluate(self, params: CongestionParams = CongestionParams()) -> Dict[str, np.ndarray]:
+        if params.window_minutes not in self.flows:
+            raise KeyError(f"Window {params.window_minutes} was not loaded.")
+        total_in, total_out = self.flows[params.window_minutes]
+        return score_arrays(self.centers, total_in, total_out, params)
+
+    def evaluate_many(self, param_sets: Iterable[CongestionParams]) -> List[Dict[str, np.ndarray]]:
+        return [self.evaluate(params) for params in param_sets]
+
+    def results(self, params: CongestionParams = CongestionParams()) -> List[Dict[str, Any]]:
+        """Per-center payloads, identical to compute_congestion_risk()."""
+        scored = self.evaluate(params)
+        payloads = []
+
+        for i, center_id in enumerate(self.centers.center_ids.tolist()):
+            capacity = int(self.centers.capacity[i])
+
+            if not scored["has_capacity"][i]:
+                payloads.append(no_capacity_payload(center_id=center_id, capacity=capacity, params=params))
+                continue
+
+            payloads.append(risk_payload(
+                center_id=center_id,
+                capacity=capacity,
+                latest_log_time=self.centers.latest_log_time[i],
+                current_total=int(scored["current_total"][i]),
+                occupancy=float(scored["occupancy"][i]),
+                params=params,
+                total_in=int(scored["total_in_window"][i]),
+                total_out=int(scored["total_out_window"][i]),
+                net_rate_per_min=float(scored["net_rate_per_min"][i]),
+                predicted_total=float(scored["predicted_total"][i]),
+                predicted_occupancy=float(scored["predicted_occupancy"][i]),
+                vulnerable_total=int(scored["vulnerable_total"][i]),
+                vulnerability_ratio=float(scored["vulnerability_ratio"][i]),
+                risk_score=float(scored["risk_score"][i]),
+                risk_level=str(scored["risk_level"][i]),
+            ))
+
+        return payloads
@@ -0,0 +1,93 @@
+# analytics_app/services/dashboard_summary.py
+"""
+Headline numbers for the admin dashboards in two queries: one conditional
+aggregation over the center occupancy snapshots, and one UNION ALL of the
+users grouped by role and the hazard reports grouped by status.
+"""
+from django.db.models import Count, Q, Sum, Value
+
+ROLES = {
+    "CITIZEN": "citizen",
+    "PROVINCIAL_ADMIN": "provincial_admin",
+    "MUNICIPAL_ADMIN": "municipal_admin",
+    "RESPONSE_TEAM": "response_team",
+    "EVAC_CENTER_STAFF": "evac_center_staff",
+}
+
+# hazard reports awaiting review ("PENDING" is the older spelling)
+PENDING_HAZARD_STATUSES = ("REPORTED", "PENDING")
+HIGH_SEVERITIES = ("HIGH", "CRITICAL")
+
+VULNERABLE_FIELDS = {
+    "children": "children_count",
+    "seniors": "senior_count",
+    "pwd": "pwd_count",
+    "pregnant": "pregnant_count",
+    "lactating": "lactating_count",
+    "total": "vulnerable_individuals",
+}
+
+
+def _occupancy_totals(occupancy_qs):
+    agg = occupancy_qs.aggregate(
+        total_evacuees=Sum("total_current"),
+        total_families=Sum("total_current_families"),
+        active_centers=Count("center_id", filter=Q(date_recorded__isnull=False)),
+        occupied_centers=Count("center_id", filter=Q(total_current__gt=0)),
+        **{f"vulnerable_{name}": Sum(field) for name, field in VULNERABLE_FIELDS.items()},
+    )
+    return {key: int(value or 0) for key, value in agg.items()}
+
+
+def _people_and_hazard_counts(users_qs, hazards_qs):
+    """(kind, key, total, flagged) rows: users by role (flagged = active) and
+    hazards by status (flagged = high severity)."""
+    users = (
+        users_qs.order_by()
+        .values("role")
+        .annotate(
+            kind=Value("user"),
+            total=Count("id"),
+            flagged=Count("id", filter=Q(is_active=True)),
+        )
+        .values_list("kind", "role", "total", "flagged")
+    )
+    hazards = (
+        hazards_qs.order_by()
+        .values("status")
+        .annotate(
+            kind=Value("hazard"),
+            total=Count("id"),
+            flagged=Count("id", filter=Q(severity__in=HIGH_SEVERITIES)),
+        )
+        .values_list("kind", "status", "total", "flagged")
+    )
+    return list(users.union(hazards, all=True))
+
+
+def build_dashboard_summary(*, occupancy_qs, users_qs, hazards_qs):
+    occupancy = _occupancy_totals(occupancy_qs)
+
+    by_role = {name: 0 for name in ROLES.values()}
+    users = {"total": 0, "active": 0}
+    hazards = {"pending": 0, "pending_high_severity": 0}
+
+    for kind, key, total, flagged in _people_and_hazard_counts(users_qs, hazards_qs):
+        if kind == "user":
+            users["total"] += total
+            users["active"] += flagged
+            if key in ROLES:
+                by_role[ROLES[key]] += total
+        elif key in PENDING_HAZARD_STATUSES:
+            hazards["pending"] += total
+            hazards["pending_high_severity"] += flagged
+
+    return {
+        "total_evacuees": occupancy["total_evacuees"],
+        "total_families": occupancy["total_families"],
+        "active_centers": occupancy["active_centers"],
+        "occupied_centers": occupancy["occupied_centers"],
+        "vulnerable": {name: occupancy[f"vulnerable_{name}"] for name in VULNERABLE_FIELDS},
+        "users": {**users, "by_role": by_role},
+        "hazards": hazards,
+    }
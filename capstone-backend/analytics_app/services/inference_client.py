@@ -0,0 +1,74 @@
+# analytics_app/services/inference_client.py
+"""
+Client side of the local weather inference worker (manage.py
+run_weather_inference). Messages are JSON objects, each sent with a 4-byte
+big-endian length prefix; one request and one reply per connection.
+"""
+import json
+import socket
+import struct
+
+from django.conf import settings
+
+_HEADER = struct.Struct(">I")
+
+
+class InferenceUnavailable(Exception):
+    """The worker isn't running or didn't answer in time."""
+
+
+class InferenceError(Exception):
+    """The worker answered with an error."""
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def send_message(sock, payload):
+    data = json.dumps(payload).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 16))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size).decode("utf-8"))
+
+
+def request(payload, timeout=None):
+    timeout = settings.WEATHER_INFERENCE_TIMEOUT if timeout is None else timeout
+    try:
+        with socket.create_connection(parse_address(settings.WEATHER_INFERENCE_ADDRESS), timeout=timeout) as sock:
+            send_message(sock, payload)
+            reply = recv_message(sock)
+    except (OSError, ConnectionError, ValueError) as exc:
+        raise InferenceUnavailable(f"Weather inference worker unavailable: {exc}") from exc
+
+    if not reply.get("ok"):
+        raise InferenceError(reply.get("error") or "Weather inference failed.")
+    return reply
+
+
+def predict(windows, timeout=None):
+    """
+    Predictions for each observation window (see weather_source).
+    Returns (columns, [OUTPUT_HOURS x len(columns) nested lists per window]).
+    """
+    reply = request({"op": "predict", "windows": list(windows)}, timeout=timeout)
+    return reply["columns"], reply["predictions"]
+
+
+def ping(timeout=1):
+    return request({"op": "ping"}, timeout=timeout)
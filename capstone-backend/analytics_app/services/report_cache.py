@@ -0,0 +1,132 @@
+# analytics_app/services/report_cache.py
+"""
+Shared cache for affected-population reports.
+
+Reports are cached as municipal partials (each municipality's barangay rows
+and subtotal), keyed on (municipality data version, event, as_of). The
+version changes only on writes to that municipality's centers and logs
+(evac_app.services.data_version), so after a write just that municipality
+is rebuilt and the provincial report is a merge of the cached partials.
+Concurrent misses for the same key are collapsed: one request takes a short
+lock and builds, the others wait for its result instead of building again.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from evac_app.services import data_version
+from .affected_population_report import build_municipal_partials, merge_partials, report_payload
+
+LOCK_SECONDS = 60
+WAIT_INTERVAL = 0.1
+
+
+def live_bucket(now):
+    """Requests without as_of within the same bucket share one entry."""
+    seconds = max(1, settings.REPORT_CACHE_LIVE_BUCKET_SECONDS)
+    return int(now.timestamp()) // seconds
+
+
+def partial_key(version, *parts):
+    return ":".join(["affected-population", "partial", str(version)] + [str(p) for p in parts])
+
+
+def get_or_build(key, build, timeout=None):
+    """
+    Cached value of `key`, building it with `build()` on a miss.
+    Returns (value, hit).
+    """
+    timeout = settings.REPORT_CACHE_SECONDS if timeout is None else timeout
+
+    value = cache.get(key)
+    if value is not None:
+        return value, True
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_SECONDS):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value, False
+
+    # someone else is building it; wait for their result, then give up and build
+    deadline = time.monotonic() + LOCK_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value, True
+        if cache.get(lock_key) is None:
+            break
+
+    value = build()
+    cache.set(key, value, timeout)
+    return value, False
+
+
+def get_many_or_build(keys, build, timeout=None):
+    """
+    Cached values of `keys` ({name: cache key}), building the missing ones
+    together with `build(missing_names)` -> {name: value}.
+    Returns ({name: value}, missing_names).
+    """
+    timeout = settings.REPORT_CACHE_SECONDS if timeout is None else timeout
+
+    found = cache.get_many(list(keys.values()))
+    values = {name: found[key] for name, key in keys.items() if key in found}
+    missing = [name for name in keys if name not in values]
+    if not missing:
+        return values, missing
+
+    # requests missing the same entries share one build
+    digest = hashlib.sha1("|".join(sorted(keys[name] for name in missing)).encode()).hexdigest()
+    built, _hit = get_or_build(f"affected-population:build:{digest}", lambda: build(missing), timeout)
+
+    cache.set_many({keys[name]: built[name] for name in missing}, timeout)
+    values.update((name, built[name]) for name in missing)
+    return values, missing
+
+
+def affected_population_report(
+    *,
+    EvacuationCenterModel,
+    EvacuationLogModel,
+    municipality_ids,
+    as_of,
+    as_of_key,
+    event=None,
+):
+    """
+    The report over `municipality_ids`, merged from cached municipal
+    partials. Returns (report, cache status: "hit", "partial" or "miss").
+    """
+    municipality_ids = list(municipality_ids)
+    versions = data_version.municipality_versions(municipality_ids)
+    event_key = f"event-{event.id}" if event is not None else "all"
+
+    keys = {
+        mid: partial_key(versions[mid], event_key, as_of_key, mid)
+        for mid in municipality_ids
+    }
+    partials, missing = get_many_or_build(
+        keys,
+        lambda missing: build_municipal_partials(
+            EvacuationCenterModel=EvacuationCenterModel,
+            EvacuationLogModel=EvacuationLogModel,
+            municipality_ids=missing,
+            as_of=as_of,
+            event=event,
+        ),
+    )
+
+    if not missing:
+        status = "hit"
+    elif len(missing) < len(keys):
+        status = "partial"
+    else:
+        status = "miss"
+    return report_payload(merge_partials(partials.values()), as_of, event), status
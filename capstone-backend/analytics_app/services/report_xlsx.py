@@ -0,0 +1,180 @@
+# analytics_app/services/report_xlsx.py
+"""
+Affected population report as an .xlsx workbook in the DROMIC layout:
+title block, three header rows with the merged inside/outside EC column
+groups, then the data, subtotal and grand-total rows.
+
+The workbook is written with openpyxl's write-only mode, which streams rows
+to a temporary file instead of keeping a cell object per value, and is saved
+to a temporary file the response then streams from. Memory stays flat
+however many barangays the report covers.
+"""
+import tempfile
+from datetime import datetime
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+ROW_FIELDS = [
+    "province",
+    "municipality",
+    "barangay",
+    "affected_brgys",
+    "affected_families",
+    "affected_persons",
+    "ecs_cum",
+    "ecs_now",
+    "inside_families_cum",
+    "inside_families_now",
+    "inside_persons_cum",
+    "inside_persons_now",
+    "outside_families_cum",
+    "outside_families_now",
+    "outside_persons_cum",
+    "outside_persons_now",
+    "total_families_cum",
+    "total_families_now",
+    "total_persons_cum",
+    "total_persons_now",
+]
+TEXT_COLUMNS = 3
+COLUMN_COUNT = len(ROW_FIELDS)
+
+# (label, first column, last column) per header row, 1-based columns
+HEADER_GROUPS = [
+    ("NO. OF AFFECTED", 4, 6),
+    ("NO. OF ECS", 7, 8),
+    ("INSIDE EVACUATION CENTERS", 9, 12),
+    ("OUTSIDE EVACUATION CENTERS", 13, 16),
+    ("TOTAL SERVED (CURRENT)", 17, 20),
+]
+ROW_LABELS = ["Province", "City / Municipality", "Barangay"]
+SUB_LABELS = ["Brgys.", "Families", "Persons", "CUM", "NOW"]
+
+_THIN = Side(style="thin")
+_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_CENTER = Alignment(horizontal="center", vertical="center", wrap_text=True)
+_BOLD = Font(bold=True)
+_HEADER_FILL = PatternFill("solid", fgColor="D9E1F2")
+_ROW_FILLS = {
+    "subtotal": PatternFill("solid", fgColor="F2F2F2"),
+    "grand_total": PatternFill("solid", fgColor="FFF2CC"),
+}
+
+
+def _cell(ws, value, *, bold=False, fill=None, center=False, border=True):
+    cell = WriteOnlyCell(ws, value=value)
+    if bold:
+        cell.font = _BOLD
+    if fill is not None:
+        cell.fill = fill
+    if center:
+        cell.alignment = _CENTER
+    if border:
+        cell.border = _BORDER
+    return cell
+
+
+def _header_rows(ws):
+    """The three header rows as cell lists; merged cells are left as blanks."""
+    rows = [[None] * COLUMN_COUNT for _ in range(3)]
+
+    for col, label in enumerate(ROW_LABELS):
+        rows[0][col] = label
+    for label, first, _last in HEADER_GROUPS:
+        rows[0][first - 1] = label
+
+    # affected / ECs: one label per column spanning rows 2-3
+    for col, label in zip(range(3, 8), SUB_LABELS):
+        rows[1][col] = label
+
+    # inside / outside / total: Families and Persons over CUM/NOW pairs
+    for col in range(8, COLUMN_COUNT, 2):
+        rows[1][col] = "Families" if (col - 8) % 4 == 0 else "Persons"
+        rows[2][col] = "CUM"
+        rows[2][col + 1] = "NOW"
+
+    return [
+        [_cell(ws, value, bold=True, fill=_HEADER_FILL, center=True) for value in row]
+        for row in rows
+    ]
+
+
+def _header_merges(top):
+    """Merged ranges of the header block starting at worksheet row `top`."""
+    letter = get_column_letter
+    merges = [f"{letter(col)}{top}:{letter(col)}{top + 2}" for col in range(1, TEXT_COLUMNS + 1)]
+    merges += [f"{letter(first)}{top}:{letter(last)}{top}" for _label, first, last in HEADER_GROUPS]
+    merges += [f"{letter(col)}{top + 1}:{letter(col)}{top + 2}" for col in range(4, 9)]
+    merges += [f"{letter(col)}{top + 1}:{letter(col + 1)}{top + 1}" for col in range(9, COLUMN_COUNT + 1, 2)]
+    return merges
+
+
+def _report_title(report):
+    event = report.get("event")
+    if event and event.get("name"):
+        return f"EFFECTS OF {event['name'].upper()}"
+    return (report.get("title") or "Affected Population Report").upper()
+
+
+def _as_of_label(report):
+    try:
+        as_of = datetime.fromisoformat(report["as_of"])
+    except (KeyError, TypeError, ValueError):
+        return ""
+    return f"As of {as_of:%d %B %Y, %I:%M %p}"
+
+
+def write_report_xlsx(report, fh):
+    """Write `report` (build_affected_population_report output) to the binary file `fh`."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Affected Population")
+
+    # column sizes, merges and panes must be set before the first append
+    ws.column_dimensions["A"].width = 20
+    ws.column_dimensions["B"].width = 25
+    ws.column_dimensions["C"].width = 25
+    for col in range(TEXT_COLUMNS + 1, COLUMN_COUNT + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 12
+
+    last = get_column_letter(COLUMN_COUNT)
+    for row in range(1, 4):
+        ws.merged_cells.add(f"A{row}:{last}{row}")
+    header_top = 5
+    for merge in _header_merges(header_top):
+        ws.merged_cells.add(merge)
+    ws.freeze_panes = f"D{header_top + 3}"
+
+    ws.append([_cell(ws, _report_title(report), bold=True, border=False)])
+    ws.append([_cell(ws, "AFFECTED POPULATION", bold=True, border=False)])
+    ws.append([_cell(ws, _as_of_label(report), border=False)])
+    ws.append([])
+    for row in _header_rows(ws):
+        ws.append(row)
+
+    for row in report.get("rows") or []:
+        row_type = row.get("row_type")
+        bold = row_type in _ROW_FILLS
+        fill = _ROW_FILLS.get(row_type)
+        ws.append([
+            _cell(ws, row.get(field) or ("" if i < TEXT_COLUMNS else 0), bold=bold, fill=fill)
+            for i, field in enumerate(ROW_FIELDS)
+        ])
+
+    wb.save(fh)
+
+
+def report_xlsx_file(report):
+    """The workbook in a rewound temporary file, ready to stream."""
+    fh = tempfile.TemporaryFile()
+    try:
+        write_report_xlsx(report, fh)
+    except Exception:
+        fh.close()
+        raise
+    fh.seek(0)
+    return fh
@@ -0,0 +1,233 @@
+# analytics_app/services/weather_features.py
+"""
+weather_model.prepare_input, kept up to date one hour at a time.
+
+FeatureWindow holds the newest INPUT_HOURS feature rows, already scaled
+with scaler_X. Appending an hour computes its lags and 24-hour rolling
+mean/sum from stored state in O(1); only the first rows of the window,
+where prepare_input back-fills lags and shortens rolling windows, are
+recomputed when the matrix is read. FeatureStore keeps one FeatureWindow
+per forecast location and appends just the hours a new observation window
+adds to the previous one.
+"""
+import math
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from .weather_model import candidate_features
+from .weather_source import INPUT_HOURS, TARGET_COLUMNS
+
+# per-hour values the features are derived from
+RAW_COLUMNS = ["TAVG", "PRCP", "pressure", "WDSP", "RH", "wind_u", "wind_v"]
+_RAW = {name: i for i, name in enumerate(RAW_COLUMNS)}
+_FEATURE = {name: i for i, name in enumerate(candidate_features)}
+
+# feature -> (raw column, hours back)
+LAGGED = {
+    "TAVG_lag_1": ("TAVG", 1),
+    "TAVG_lag_3": ("TAVG", 3),
+    "TAVG_lag_6": ("TAVG", 6),
+    "PRCP_lag_1": ("PRCP", 1),
+    "PRCP_lag_24": ("PRCP", 24),
+    "pressure_lag_24": ("pressure", 24),
+    "WDSP_lag_1": ("WDSP", 1),
+    "RH_lag_1": ("RH", 1),
+    "wind_u_lag_1": ("wind_u", 1),
+    "wind_v_lag_1": ("wind_v", 1),
+}
+_LAG_FEATURES = np.array([_FEATURE[name] for name in LAGGED])
+_LAG_RAW = np.array([_RAW[column] for column, _ in LAGGED.values()])
+_LAG_HOURS = np.array([hours_back for _, hours_back in LAGGED.values()])
+ROLLING_HOURS = 24
+
+# rows at the start of a window whose features depend on where the window starts
+EDGE_ROWS = 24
+
+
+def _scaling(scaler):
+    """Row-wise scaling function for `scaler` (fitted sklearn scaler or None)."""
+    if scaler is None:
+        return lambda X: X
+    if hasattr(scaler, "mean_") and hasattr(scaler, "scale_"):  # StandardScaler
+        shift = scaler.mean_ if scaler.mean_ is not None else 0.0
+        factor = 1.0 / scaler.scale_ if scaler.scale_ is not None else 1.0
+        return lambda X: (X - shift) * factor
+    if hasattr(scaler, "min_") and hasattr(scaler, "scale_"):  # MinMaxScaler
+        return lambda X: X * scaler.scale_ + scaler.min_
+    return scaler.transform
+
+
+class FeatureWindow:
+    def __init__(self, scaler=None, hours=INPUT_HOURS, city_count=1):
+        self.hours = hours
+        self.city_count = city_count
+        self._scale = _scaling(scaler)
+
+        # rows [_start, _end) are the window; the rest is room to append
+        # before the window is moved back to the front
+        size = 2 * hours
+        self._raw = np.empty((size, len(RAW_COLUMNS)))
+        self._features = np.empty((size, len(candidate_features)))
+        self._scaled = np.empty_like(self._features)
+        self._start = 0
+        self._end = 0
+
+        # running TAVG and PRCP sums over the last ROLLING_HOURS rows
+        self._tavg_sum = 0.0
+        self._prcp_sum = 0.0
+
+        # hour stamps (iso) and observed values, to match incoming windows against
+        self.times = deque(maxlen=hours)
+        self.observed = deque(maxlen=hours)
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def ready(self):
+        return len(self) == self.hours
+
+    def append(self, at, values):
+        """Add the hour `at` ({observation column: value} as in WeatherData), dropping the oldest."""
+        if self._end == len(self._raw):
+            self._compact()
+
+        observed = tuple(values[col] for col in TARGET_COLUMNS)
+        speed = float(values["wind_speed_10m"])
+        theta = math.radians(values["wind_direction_10m"] or 0)
+        raw = self._raw[self._end]
+        raw[:] = (
+            values["temperature_2m"],
+            values["precipitation"],
+            values["pressure_msl"],
+            speed,
+            values["relative_humidity_2m"],
+            -speed * math.sin(theta),
+            -speed * math.cos(theta),
+        )
+
+        i = self._end
+        self._end += 1
+        if len(self) > self.hours:
+            self._start += 1
+
+        self._tavg_sum += raw[_RAW["TAVG"]]
+        self._prcp_sum += raw[_RAW["PRCP"]]
+        if len(self) > ROLLING_HOURS:
+            self._tavg_sum -= self._raw[i - ROLLING_HOURS, _RAW["TAVG"]]
+            self._prcp_sum -= self._raw[i - ROLLING_HOURS, _RAW["PRCP"]]
+
+        # lags reach back at most to the start of the window; rows that
+        # short are edge rows and get recomputed in matrix()
+        available = len(self) - 1
+        row = self._features[i]
+        row[_LAG_FEATURES] = self._raw[i - np.minimum(_LAG_HOURS, available), _LAG_RAW]
+
+        pressure = raw[_RAW["pressure"]]
+        row[_FEATURE["TAVG_24h_mean"]] = self._tavg_sum / min(len(self), ROLLING_HOURS)
+        row[_FEATURE["PRCP_24h_sum"]] = self._prcp_sum
+        row[_FEATURE["pressure_tendency_24h"]] = pressure - row[_FEATURE["pressure_lag_24"]]
+        row[_FEATURE["low_pressure_flag"]] = pressure < 1005
+        row[_FEATURE["hour"]] = at.hour
+        row[_FEATURE["dayofyear"]] = at.timetuple().tm_yday
+        row[_FEATURE["month"]] = at.month
+        row[_FEATURE["city_count"]] = self.city_count
+
+        self._scaled[i] = self._scale(row[None, :])[0]
+        self.times.append(at.isoformat())
+        self.observed.append(observed)
+
+    def _compact(self):
+        n = len(self)
+        for buffer in (self._raw, self._features, self._scaled):
+            buffer[:n] = buffer[self._start:self._end]
+        self._start, self._end = 0, n
+
+        # re-add the rolling sums exactly so float error can't build up
+        recent = self._raw[max(0, n - ROLLING_HOURS):n]
+        self._tavg_sum = float(recent[:, _RAW["TAVG"]].sum())
+        self._prcp_sum = float(recent[:, _RAW["PRCP"]].sum())
+
+    def _edge_features(self):
+        """Unscaled features of the first EDGE_ROWS rows, as prepare_input computes them."""
+        raw = self._raw[self._start:self._start + EDGE_ROWS + 1]
+        features = self._features[self._start:self._start + EDGE_ROWS].copy()
+        rows = np.arange(EDGE_ROWS)
+
+        # prepare_input back-fills lags from the window's first hour...
+        features[:, _LAG_FEATURES] = raw[np.maximum(rows[:, None] - _LAG_HOURS, 0), _LAG_RAW]
+        # ...so the 24-hour pressure tendency of these rows is that of row 24
+        pressure = raw[:, _RAW["pressure"]]
+        features[:, _FEATURE["pressure_tendency_24h"]] = pressure[EDGE_ROWS] - pressure[0]
+        # and rolling windows start at the window's first hour (min_periods=1)
+        features[:, _FEATURE["TAVG_24h_mean"]] = np.cumsum(raw[:EDGE_ROWS, _RAW["TAVG"]]) / (rows + 1)
+        features[:, _FEATURE["PRCP_24h_sum"]] = np.cumsum(raw[:EDGE_ROWS, _RAW["PRCP"]])
+        return features
+
+    def features(self):
+        """Unscaled (hours, n_feats) features, equal to prepare_input's."""
+        if not self.ready:
+            raise ValueError("Insufficient historical data")
+        X = self._features[self._start:self._end].copy()
+        X[:EDGE_ROWS] = self._edge_features()
+        return X
+
+    def matrix(self):
+        """Scaled (hours, n_feats) model input."""
+        if not self.ready:
+            raise ValueError("Insufficient historical data")
+        X = self._scaled[self._start:self._end].copy()
+        X[:EDGE_ROWS] = self._scale(self._edge_features())
+        return X
+
+
+class FeatureStore:
+    """
+    FeatureWindows per location (the window's "location" key). A window
+    that continues the stored one only appends its new hours; one that
+    doesn't (revised observations, a gap, no location) is rebuilt.
+    """
+
+    def __init__(self, scaler=None, hours=INPUT_HOURS):
+        self.scaler = scaler
+        self.hours = hours
+        self._windows = {}
+
+    def _new_hours(self, features, window):
+        """Index of the first hour of `window` after `features`, or None if they don't line up."""
+        times = window["datetime"]
+        if not features.times or features.city_count != window.get("city_count", 1):
+            return None
+        try:
+            overlap = times.index(features.times[-1]) + 1
+        except ValueError:
+            return None
+
+        if list(features.times)[-overlap:] != times[:overlap]:
+            return None
+        observed = list(zip(*(window[col][:overlap] for col in TARGET_COLUMNS)))
+        if list(features.observed)[-overlap:] != observed:
+            return None
+        return overlap
+
+    def scaled(self, window):
+        """Scaled model input for an observation window (see weather_source)."""
+        keyed = "location" in window
+        features = self._windows.get(window["location"]) if keyed else None
+        start = self._new_hours(features, window) if features is not None else None
+
+        if start is None:
+            features = FeatureWindow(self.scaler, self.hours, window.get("city_count", 1))
+            start = 0
+            if keyed:
+                self._windows[window["location"]] = features
+
+        times = window["datetime"]
+        for i in range(start, len(times)):
+            features.append(
+                datetime.fromisoformat(times[i]),
+                {col: window[col][i] for col in TARGET_COLUMNS},
+            )
+        return features.matrix()
@@ -0,0 +1,159 @@
+# analytics_app/services/weather_forecasts.py
+"""
+Scheduled 72-hour forecasts stored in WeatherForecast, one series per
+location (the province point and each municipality), so the predict
+endpoint reads a row instead of calling open-meteo and the model per hit.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from . import inference_client
+from .weather_observations import recent_windows
+
+
+def window_hash(window):
+    return hashlib.sha256(json.dumps(window, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def prediction_rows(columns, values, input_end):
+    """Model output -> [{"datetime": ..., <column>: value}], one per hour after input_end."""
+    return [
+        {
+            "datetime": (input_end + timedelta(hours=i + 1)).isoformat(),
+            **{col: float(value) for col, value in zip(columns, row)},
+        }
+        for i, row in enumerate(values)
+    ]
+
+
+def _latest_ok(WeatherForecastModel):
+    """{municipality_id: newest good forecast's (id, input_hash)}, one query."""
+    ranked = (
+        WeatherForecastModel.objects
+        .filter(status="OK")
+        .annotate(position=Window(
+            expression=RowNumber(),
+            partition_by=[F("municipality_id")],
+            order_by=[F("generated_at").desc(), F("id").desc()],
+        ))
+        .filter(position=1)
+        .values_list("municipality_id", "id", "input_hash")
+    )
+    return {mid: (forecast_id, digest) for mid, forecast_id, digest in ranked}
+
+
+def refresh_forecasts(*, WeatherForecastModel, collect=recent_windows, predict=inference_client.predict,
+                      now=None, force=False):
+    """
+    Collect the latest observation window of every location (province point
+    and municipalities), predict all changed windows in one batch and store
+    one run per location. A location whose window is unchanged (same hash
+    as its latest good run) is not predicted again unless `force`.
+    Failures are stored as FAILED runs of the affected locations.
+
+    `collect(now)` returns ({municipality_id: window}, {municipality_id: error}).
+    Returns {municipality_id: WeatherForecast row produced or reused}.
+    """
+    now = now or datetime.now()
+    latest = _latest_ok(WeatherForecastModel)
+
+    try:
+        windows, errors = collect(now=now)
+    except Exception as exc:
+        # nothing to go on for any location
+        windows, errors = {}, {mid: str(exc) for mid in latest.keys() | {None}}
+    errors = dict(errors)
+
+    changed = {}
+    for mid, window in windows.items():
+        digest = window_hash(window)
+        if force or latest.get(mid, (None, None))[1] != digest:
+            changed[mid] = (window, digest)
+
+    created = []
+    if changed:
+        try:
+            columns, values = predict([window for window, _digest in changed.values()])
+        except Exception as exc:
+            errors.update((mid, str(exc)) for mid in changed)
+        else:
+            for (mid, (window, digest)), location_values in zip(changed.items(), values):
+                input_end = datetime.fromisoformat(window["datetime"][-1])
+                created.append(WeatherForecastModel(
+                    municipality_id=mid,
+                    generated_at=now,
+                    status="OK",
+                    input_end=input_end,
+                    input_hash=digest,
+                    predictions=prediction_rows(columns, location_values, input_end),
+                ))
+
+    created.extend(
+        WeatherForecastModel(municipality_id=mid, generated_at=now, status="FAILED", error=message)
+        for mid, message in errors.items()
+    )
+    WeatherForecastModel.objects.bulk_create(created)
+
+    forecasts = {forecast.municipality_id: forecast for forecast in created}
+    unchanged_ids = [latest[mid][0] for mid in windows.keys() - forecasts.keys()]
+    forecasts.update(
+        (forecast.municipality_id, forecast)
+        for forecast in WeatherForecastModel.objects.filter(id__in=unchanged_ids)
+    )
+
+    prune(WeatherForecastModel)
+    return forecasts
+
+
+def prune(WeatherForecastModel, keep=None):
+    """Drop all but the newest `keep` runs of each location, never its newest good one."""
+    keep = settings.WEATHER_FORECAST_KEEP if keep is None else keep
+    newest_ok = {forecast_id for forecast_id, _digest in _latest_ok(WeatherForecastModel).values()}
+    stale_ids = [
+        forecast_id
+        for forecast_id in (
+            WeatherForecastModel.objects
+            .annotate(position=Window(
+                expression=RowNumber(),
+                partition_by=[F("municipality_id")],
+                order_by=[F("generated_at").desc(), F("id").desc()],
+            ))
+            .filter(position__gt=keep)
+            .values_list("id", flat=True)
+        )
+        if forecast_id not in newest_ok
+    ]
+    if stale_ids:
+        WeatherForecastModel.objects.filter(id__in=stale_ids).delete()
+
+
+def latest_forecast_payload(WeatherForecastModel, municipality_id=None, now=None):
+    """
+    The newest good forecast of a location (None = province point) with
+    staleness metadata, or None if there has never been one. `fallback` is
+    true when the newest run failed and an older forecast is being served.
+    """
+    now = now or datetime.now()
+    runs = WeatherForecastModel.objects.filter(municipality_id=municipality_id)
+    forecast = runs.filter(status="OK").first()
+    if forecast is None:
+        return None
+
+    last_run = runs.only("id", "status", "generated_at", "error").first()
+    age = (now - forecast.generated_at).total_seconds()
+
+    return {
+        "municipality": municipality_id,
+        "predictions": forecast.predictions,
+        "generated_at": forecast.generated_at.isoformat(),
+        "input_end": forecast.input_end.isoformat() if forecast.input_end else None,
+        "age_seconds": int(age),
+        "stale": age > settings.WEATHER_FORECAST_STALE_MINUTES * 60,
+        "fallback": last_run.id != forecast.id,
+        "last_error": last_run.error if last_run.status == "FAILED" else None,
+    }
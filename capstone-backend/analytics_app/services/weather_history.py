@@ -0,0 +1,114 @@
+# analytics_app/services/weather_history.py
+"""
+Bulk backfill of historical hourly observations (CSV or Parquet, e.g. the
+dataset the model was trained on) into WeatherData, for
+manage.py load_weather_history. Files are read in chunks with pandas and
+each chunk is inserted with a few bulk INSERTs.
+"""
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .weather_model import rename_map
+from .weather_source import TARGET_COLUMNS
+
+FIELDS = TARGET_COLUMNS + ["city_count"]
+DATETIME_COLUMNS = ["datetime", "time", "date", "timestamp"]
+
+# source column -> WeatherData field; the model's training names are understood too
+DEFAULT_MAPPING = {
+    **{field: field for field in FIELDS},
+    **{source: field for field, source in rename_map.items()},
+}
+
+
+def column_mapping(columns, overrides=None):
+    """{source column: WeatherData field} for the columns of a file."""
+    mapping = {col: DEFAULT_MAPPING[col] for col in columns if col in DEFAULT_MAPPING}
+    for source, field in (overrides or {}).items():
+        if field not in FIELDS:
+            raise ValueError(f"Unknown WeatherData field {field!r}.")
+        mapping = {col: f for col, f in mapping.items() if f != field}
+        mapping[source] = field
+    return mapping
+
+
+def datetime_column(columns, preferred=None):
+    if preferred:
+        if preferred not in columns:
+            raise ValueError(f"No column {preferred!r} in the file.")
+        return preferred
+    for name in DATETIME_COLUMNS:
+        if name in columns:
+            return name
+    raise ValueError(f"No datetime column (looked for {', '.join(DATETIME_COLUMNS)}).")
+
+
+def file_columns(path):
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_chunks(path, columns, chunk_size=100_000):
+    """DataFrames of at most `chunk_size` rows holding `columns` of a CSV or Parquet file."""
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=list(columns)):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=list(columns), chunksize=chunk_size)
+
+
+def normalize(df, mapping, datetime_col):
+    """
+    Chunk -> DataFrame with a naive local `datetime` and WeatherData field
+    columns; rows without a parseable datetime are dropped and, for hours
+    that appear twice, the last row wins.
+    """
+    out = pd.DataFrame({"datetime": pd.to_datetime(df[datetime_col], errors="coerce")})
+    if out["datetime"].dt.tz is not None:
+        # stored datetimes are naive local time (USE_TZ = False)
+        out["datetime"] = out["datetime"].dt.tz_convert(settings.TIME_ZONE).dt.tz_localize(None)
+    for source, field in mapping.items():
+        out[field] = pd.to_numeric(df[source], errors="coerce")
+    if "city_count" in out:
+        out["city_count"] = out["city_count"].fillna(1).astype(int)
+
+    out = out.dropna(subset=["datetime"]).drop_duplicates(subset="datetime", keep="last")
+    return out.sort_values("datetime")
+
+
+def load_chunk(WeatherDataModel, df, municipality_id=None, batch_size=5000):
+    """
+    Insert the rows of a normalized chunk; hours already stored for the
+    location are left alone by the unique index (ignore_conflicts).
+    Returns (inserted, skipped).
+    """
+    if df.empty:
+        return 0, 0
+
+    start, end = df["datetime"].iloc[0].to_pydatetime(), df["datetime"].iloc[-1].to_pydatetime()
+    stored = WeatherDataModel.objects.filter(
+        municipality_id=municipality_id, datetime__gte=start, datetime__lte=end
+    )
+
+    fields = [col for col in df.columns if col != "datetime"]
+    values = df[fields].astype(object).where(df[fields].notna(), None)
+    objs = [
+        WeatherDataModel(municipality_id=municipality_id, datetime=at, **dict(zip(fields, row)))
+        for at, row in zip(df["datetime"].dt.to_pydatetime(), values.itertuples(index=False, name=None))
+    ]
+
+    with transaction.atomic():
+        before = stored.count()
+        WeatherDataModel.objects.bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
+        inserted = stored.count() - before
+    return inserted, len(objs) - inserted
@@ -0,0 +1,318 @@
+# analytics_app/services/weather_model.py
+"""
+The seq2seq weather model: feature preparation, scalers and prediction.
+
+Only the inference worker (manage.py run_weather_inference) imports this
+module; web processes talk to the worker through inference_client and never
+load TensorFlow. With WEATHER_TFLITE_MODEL set the worker serves a quantized
+TFLite graph instead of the Keras model and needs only a TFLite runtime.
+"""
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .weather_source import INPUT_HOURS, TARGET_COLUMNS
+
+OUTPUT_HOURS = 72
+rename_map = {
+    "temperature_2m": "TAVG",
+    "relative_humidity_2m": "RH",
+    "wind_speed_10m": "WDSP",
+    "wind_direction_10m": "wind_dir",
+    "precipitation": "PRCP",
+    "pressure_msl": "pressure",
+    "cloud_cover": "cloud_cover"
+}
+lags = [1, 3, 6, 24, 48, 72]
+candidate_features = [
+    "TAVG_lag_1", "TAVG_lag_3", "TAVG_lag_6", "TAVG_24h_mean",
+    "PRCP_lag_1", "PRCP_lag_24", "PRCP_24h_sum",
+    "pressure_lag_24", "pressure_tendency_24h",
+    "WDSP_lag_1", "RH_lag_1", "wind_u_lag_1", "wind_v_lag_1",
+    "low_pressure_flag", "hour", "dayofyear", "month", "city_count"
+]
+target_cols = ["TAVG", "WDSP", "wind_u", "wind_v", "PRCP", "RH", "pressure", "cloud_cover", "dew_point"]
+
+KERAS_MODEL_FILE = "seq2seq_kaggle_best.h5"
+QUANTIZE_MODES = ("float16", "int8")
+
+# Retrained models (manage.py retrain_weather_model) live in
+# WEATHER_MODEL_DIR/versions/<version>/; the CURRENT file names the one to serve
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+
+# Loaded once per process, and again when CURRENT changes
+model = None
+scaler_X = None
+scaler_Y = None
+feature_store = None
+loaded_dir = None
+
+
+def load_keras_model(path):
+    import tensorflow as tf
+
+    # Fixes "Could not deserialize 'keras.metrics.mse'"
+    return tf.keras.models.load_model(
+        path,
+        compile=False,     # <-- IMPORTANT
+        custom_objects={
+            "mse": tf.keras.metrics.MeanSquaredError(),
+            "mae": tf.keras.metrics.MeanAbsoluteError(),
+            "MeanSquaredError": tf.keras.metrics.MeanSquaredError(),
+            "MeanAbsoluteError": tf.keras.metrics.MeanAbsoluteError()
+        }
+    )
+
+
+def _tflite_interpreter_class():
+    # the standalone runtimes are far smaller than TensorFlow; fall back to it
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    """
+    A converted model (manage.py quantize_weather_model) behind the same
+    predict() call as the Keras one. The graph has a fixed batch of one, so
+    batches run window by window; an invoke costs about a millisecond.
+    """
+
+    def __init__(self, path, num_threads=None):
+        self.interpreter = _tflite_interpreter_class()(model_path=str(path), num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+
+    def predict(self, X, batch_size=None, verbose=0):
+        outputs = []
+        for row in np.asarray(X, dtype=self.input["dtype"]):
+            self.interpreter.set_tensor(self.input["index"], row[None, ...])
+            self.interpreter.invoke()
+            outputs.append(self.interpreter.get_tensor(self.output["index"])[0].copy())
+        return np.stack(outputs)
+
+
+def convert_to_tflite(keras_model, mode="float16"):
+    """
+    TFLite flatbuffer of `keras_model` with float16 or int8 weights.
+    int8 is dynamic-range quantization (int8 weights, float activations):
+    full-integer LSTMs need calibration that the converter doesn't handle
+    reliably for this architecture.
+    """
+    import tensorflow as tf
+
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantization mode {mode!r}.")
+
+    # a fixed batch of one lets the converter lower the LSTMs to builtin ops
+    inputs = tf.keras.Input(batch_shape=(1, *keras_model.input_shape[1:]))
+    fixed = tf.keras.Model(inputs, keras_model(inputs))
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(fixed)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def model_dir():
+    """Directory of the model to serve: the CURRENT version, else WEATHER_MODEL_DIR itself."""
+    base = Path(settings.WEATHER_MODEL_DIR)
+    try:
+        version = (base / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        version = ""
+    return base / VERSIONS_DIR / version if version else base
+
+
+def activate_version(version):
+    """Point CURRENT at `version`; workers pick it up on their next prediction."""
+    base = Path(settings.WEATHER_MODEL_DIR)
+    if not (base / VERSIONS_DIR / version / KERAS_MODEL_FILE).exists():
+        raise FileNotFoundError(f"No weather model version {version!r}.")
+    tmp = base / f".{CURRENT_FILE}.tmp"
+    tmp.write_text(version, encoding="utf-8")
+    tmp.replace(base / CURRENT_FILE)  # atomic, readers never see half a name
+
+
+def load_model_and_scalers():
+    """
+    Load the model and scalers from model_dir(), again whenever it changes,
+    so a retrained version is swapped in without restarting the worker.
+    settings.WEATHER_TFLITE_MODEL (a file in that directory) switches the
+    model to a converted graph when present; otherwise the Keras .h5 is loaded.
+    """
+    global model, scaler_X, scaler_Y, feature_store, loaded_dir
+
+    save_dir = model_dir()
+    if model is not None and scaler_X is not None and scaler_Y is not None and save_dir == loaded_dir:
+        return
+
+    import joblib
+
+    from .weather_features import FeatureStore
+
+    tflite_path = save_dir / settings.WEATHER_TFLITE_MODEL if settings.WEATHER_TFLITE_MODEL else None
+    if tflite_path is not None and tflite_path.exists():
+        new_model = TFLiteModel(tflite_path)
+    else:
+        new_model = load_keras_model(save_dir / KERAS_MODEL_FILE)
+    new_scaler_X = joblib.load(save_dir / "scaler_X.pkl")
+    new_scaler_Y = joblib.load(save_dir / "scaler_Y.pkl")
+
+    # everything loaded before anything is replaced
+    model, scaler_X, scaler_Y = new_model, new_scaler_X, new_scaler_Y
+    feature_store = FeatureStore(scaler_X)
+    loaded_dir = save_dir
+
+
+def build_model(n_features=len(candidate_features), units=64):
+    """Encoder-decoder LSTM for training from scratch (the shipped model's shapes)."""
+    import tensorflow as tf
+
+    inputs = tf.keras.Input((INPUT_HOURS, n_features))
+    x = tf.keras.layers.LSTM(units)(inputs)
+    x = tf.keras.layers.RepeatVector(OUTPUT_HOURS)(x)
+    x = tf.keras.layers.LSTM(units, return_sequences=True)(x)
+    outputs = tf.keras.layers.TimeDistributed(tf.keras.layers.Dense(len(target_cols)))(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def target_values(values):
+    """target_cols of one observation ({column: value} as in WeatherData), as prepare_input derives them."""
+    T = values["temperature_2m"]
+    RH = min(max(values["relative_humidity_2m"], 0.01), 100)
+    a, b = 17.625, 243.04
+    gamma = math.log(RH / 100.0) + (a * T) / (b + T)
+    speed = values["wind_speed_10m"]
+    theta = math.radians(values["wind_direction_10m"] or 0)
+    return (
+        T,
+        speed,
+        -speed * math.sin(theta),
+        -speed * math.cos(theta),
+        values["precipitation"],
+        values["relative_humidity_2m"],
+        values["pressure_msl"],
+        values["cloud_cover"],
+        (b * gamma) / (a - gamma),
+    )
+
+
+def window_frame(window):
+    """Observation window as sent by weather_source ({"datetime": [...], column: [...]}) -> DataFrame."""
+    df = pd.DataFrame({
+        "datetime": pd.to_datetime(window["datetime"]),
+        **{col: window[col] for col in TARGET_COLUMNS},
+    })
+    df["city_count"] = window.get("city_count", 1)
+    return df
+
+
+def prepare_input(df):
+    """
+    Features as the model was trained on them, built from a whole window.
+    Inference uses weather_features, which produces the same matrix
+    incrementally.
+    """
+    df = df.rename(columns=rename_map)
+    df = df.set_index('datetime')
+
+    # Compute dew_point
+    if "dew_point" not in df.columns and ("TAVG" in df.columns and "RH" in df.columns):
+        T = df["TAVG"]
+        RH = df["RH"].clip(0.01, 100)
+        a, b = 17.625, 243.04
+        gamma = np.log(RH / 100.0) + (a * T) / (b + T)
+        df["dew_point"] = (b * gamma) / (a - gamma)
+
+    # Wind u/v
+    if "WDSP" in df.columns and "wind_dir" in df.columns:
+        theta = np.deg2rad(df["wind_dir"].fillna(0))
+        df["wind_u"] = -df["WDSP"] * np.sin(theta)
+        df["wind_v"] = -df["WDSP"] * np.cos(theta)
+
+    # Datetime features
+    df["hour"] = df.index.hour
+    df["dayofyear"] = df.index.dayofyear
+    df["month"] = df.index.month
+
+    # Lags and rolling
+    for lag in lags:
+        if "TAVG" in df.columns:
+            df[f"TAVG_lag_{lag}"] = df["TAVG"].shift(lag)
+        if "PRCP" in df.columns:
+            df[f"PRCP_lag_{lag}"] = df["PRCP"].shift(lag)
+        if "pressure" in df.columns:
+            df[f"pressure_lag_{lag}"] = df["pressure"].shift(lag)
+        if "WDSP" in df.columns:
+            df[f"WDSP_lag_{lag}"] = df["WDSP"].shift(lag)
+        if "RH" in df.columns:
+            df[f"RH_lag_{lag}"] = df["RH"].shift(lag)
+        if "wind_u" in df.columns:
+            df[f"wind_u_lag_{lag}"] = df["wind_u"].shift(lag)
+        if "wind_v" in df.columns:
+            df[f"wind_v_lag_{lag}"] = df["wind_v"].shift(lag)
+
+    if "TAVG" in df.columns:
+        df["TAVG_24h_mean"] = df["TAVG"].rolling(window=24, min_periods=1).mean()
+    if "PRCP" in df.columns:
+        df["PRCP_24h_sum"] = df["PRCP"].rolling(window=24, min_periods=1).sum()
+    if "pressure" in df.columns:
+        df["pressure_tendency_24h"] = df["pressure"] - df["pressure"].shift(24)
+
+    df["low_pressure_flag"] = (df["pressure"] < 1005).astype(int) if "pressure" in df.columns else 0
+
+    # Since df has exactly INPUT_HOURS rows, lags will have NaNs at start, but model was trained after dropna, but to match, fill NaNs?
+    # Better to fill similar to training: interpolate or ffill/bfill, but since small, ffill
+    df = df.ffill().bfill()  # Simple fill
+
+    feature_cols_local = [c for c in candidate_features if c in df.columns]
+    X = df[feature_cols_local].values[None, ...]  # (1, 168, n_feats)
+    return X, feature_cols_local
+
+
+def scaled_input(windows):
+    """Observation windows -> scaled model input of shape (len(windows), 168, n_feats)."""
+    return np.stack([feature_store.scaled(window) for window in windows])
+
+
+def unscaled_output(Y_pred_s):
+    """Scaled model output -> (n, 72, len(target_cols)) in physical units."""
+    return scaler_Y.inverse_transform(Y_pred_s.reshape(-1, len(target_cols))).reshape(
+        -1, OUTPUT_HOURS, len(target_cols)
+    )
+
+
+def predict_batch(windows):
+    """
+    (len(windows), 72, len(target_cols)) predictions for INPUT_HOURS
+    observation windows, e.g. one per municipality: scaled together and
+    run through the model as a single batch.
+    """
+    load_model_and_scalers()
+    X_s = scaled_input(windows)
+    return unscaled_output(model.predict(X_s, batch_size=len(windows), verbose=0))
+
+
+def predict(window):
+    """72 x len(target_cols) predictions for one INPUT_HOURS observation window."""
+    return predict_batch([window])[0]
+
+
+def warm_up():
+    """Load everything and run one prediction so the first real request is fast."""
+    load_model_and_scalers()
+    n_features = getattr(scaler_X, "n_features_in_", len(candidate_features))
+    model.predict(np.zeros((1, INPUT_HOURS, n_features), dtype="float32"), verbose=0)
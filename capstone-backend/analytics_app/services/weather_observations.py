@@ -0,0 +1,230 @@
+# analytics_app/services/weather_observations.py
+"""
+Hourly observations kept in WeatherData, per location: the province-wide
+point (municipality None) and each municipality with coordinates. Each
+refresh asks the source only for the hours of the input window that aren't
+stored yet (usually the last one or two), fetching every location that is
+missing the same hours in one request, and builds the model's input windows
+from the database.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+
+from .weather_source import (
+    DEFAULT_LATITUDE,
+    DEFAULT_LONGITUDE,
+    INPUT_HOURS,
+    TARGET_COLUMNS,
+    default_source,
+)
+
+HOUR = timedelta(hours=1)
+
+# input_windows() looks this far past a full window for the newest complete hours
+WINDOW_SLACK = timedelta(hours=24)
+
+
+def last_complete_hour(now):
+    """Newest hour stamp strictly before `now`."""
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    return hour if hour < now else hour - HOUR
+
+
+def forecast_locations(MunicipalityModel=None):
+    """{municipality_id or None: (lat, lon)}: the province point, plus each
+    municipality with coordinates when MunicipalityModel is given."""
+    locations = {None: (DEFAULT_LATITUDE, DEFAULT_LONGITUDE)}
+    if MunicipalityModel is not None:
+        rows = (
+            MunicipalityModel.objects
+            .filter(latitude__isnull=False, longitude__isnull=False)
+            .order_by("id")
+            .values_list("id", "latitude", "longitude")
+        )
+        locations.update((mid, (float(lat), float(lon))) for mid, lat, lon in rows)
+    return locations
+
+
+def _complete(qs):
+    for col in TARGET_COLUMNS:
+        qs = qs.filter(**{f"{col}__isnull": False})
+    return qs
+
+
+def _at_locations(qs, municipality_ids):
+    ids = [mid for mid in municipality_ids if mid is not None]
+    condition = Q(municipality_id__in=ids)
+    if len(ids) < len(municipality_ids):
+        condition |= Q(municipality__isnull=True)
+    return qs.filter(condition)
+
+
+def missing_hours(WeatherDataModel, municipality_ids, start, end):
+    """{municipality_id: [hour stamps in [start, end] without a complete observation]}, one query."""
+    municipality_ids = list(municipality_ids)
+    stored = defaultdict(set)
+    rows = _complete(_at_locations(
+        WeatherDataModel.objects.filter(datetime__gte=start, datetime__lte=end), municipality_ids
+    )).values_list("municipality_id", "datetime")
+    for mid, at in rows:
+        stored[mid].add(at)
+
+    hours = []
+    at = start
+    while at <= end:
+        hours.append(at)
+        at += HOUR
+    return {mid: [at for at in hours if at not in stored[mid]] for mid in municipality_ids}
+
+
+def _spans(hours):
+    """Sorted hour stamps -> [(first, last)] of consecutive runs."""
+    spans = []
+    for at in hours:
+        if spans and at - spans[-1][1] == HOUR:
+            spans[-1][1] = at
+        else:
+            spans.append([at, at])
+    return [tuple(span) for span in spans]
+
+
+@transaction.atomic
+def upsert(WeatherDataModel, rows, municipality_id=None, batch_size=1000):
+    """
+    Store observations for one location, replacing those of the same hours.
+    Delete-then-insert rather than an ON CONFLICT update: the province
+    point's key is a functional index, which can't be named as a conflict
+    target. The index still keeps one row per hour, so a concurrent upsert
+    of the same hours wins instead of duplicating them.
+    """
+    objs = [
+        WeatherDataModel(
+            municipality_id=municipality_id,
+            datetime=row["datetime"],
+            **{col: row.get(col) for col in TARGET_COLUMNS},
+        )
+        for row in rows
+    ]
+    if not objs:
+        return 0
+
+    WeatherDataModel.objects.filter(
+        municipality_id=municipality_id,
+        datetime__in=[obj.datetime for obj in objs],
+    ).delete()
+    WeatherDataModel.objects.bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
+    return len(objs)
+
+
+def ingest(*, WeatherDataModel, source, locations=None, now=None, hours=INPUT_HOURS):
+    """
+    Fetch the missing hours of the `hours`-long window ending before `now`
+    for every location ({municipality_id: (lat, lon)}, default the province
+    point). Locations missing the same run of hours share one source
+    request. Returns {"missing": n, "requests": n, "stored": n}.
+    """
+    locations = locations or forecast_locations()
+    end = last_complete_hour(now or datetime.now())
+    start = end - (hours - 1) * HOUR
+
+    missing = missing_hours(WeatherDataModel, locations.keys(), start, end)
+
+    by_span = defaultdict(list)
+    for mid, location_hours in missing.items():
+        for span in _spans(location_hours):
+            by_span[span].append(mid)
+
+    stored = 0
+    for (first, last), mids in sorted(by_span.items(), key=lambda item: item[0]):
+        results = source.fetch_many([locations[mid] for mid in mids], first, last)
+        for mid, rows in zip(mids, results):
+            stored += upsert(WeatherDataModel, rows, municipality_id=mid)
+
+    return {
+        "missing": sum(len(location_hours) for location_hours in missing.values()),
+        "requests": len(by_span),
+        "stored": stored,
+    }
+
+
+def input_windows(*, WeatherDataModel, municipality_ids, end, hours=INPUT_HOURS):
+    """
+    Per location, the model input window of the newest `hours` consecutive
+    complete observations up to `end`:
+    {"datetime": [iso, ...], <column>: [...], "city_count": 1, "location": municipality_id}.
+    One query.
+
+    Returns ({municipality_id: window}, {municipality_id: error message}).
+    """
+    municipality_ids = list(municipality_ids)
+    since = end - (hours - 1) * HOUR - WINDOW_SLACK
+
+    by_location = defaultdict(list)
+    rows = _complete(_at_locations(
+        WeatherDataModel.objects.filter(datetime__gte=since, datetime__lte=end), municipality_ids
+    )).order_by("datetime").values("municipality_id", "datetime", *TARGET_COLUMNS)
+    for row in rows:
+        by_location[row["municipality_id"]].append(row)
+
+    windows, errors = {}, {}
+    for mid in municipality_ids:
+        location_rows = by_location[mid][-hours:]
+        if len(location_rows) < hours or location_rows[-1]["datetime"] - location_rows[0]["datetime"] != (hours - 1) * HOUR:
+            errors[mid] = "Insufficient historical data"
+            continue
+
+        windows[mid] = {
+            "datetime": [row["datetime"].isoformat() for row in location_rows],
+            **{col: [row[col] for row in location_rows] for col in TARGET_COLUMNS},
+            "city_count": 1,  # Single location
+            "location": mid,
+        }
+    return windows, errors
+
+
+def input_window(*, WeatherDataModel, end, municipality_id=None, hours=INPUT_HOURS):
+    windows, errors = input_windows(
+        WeatherDataModel=WeatherDataModel, municipality_ids=[municipality_id], end=end, hours=hours
+    )
+    if municipality_id in errors:
+        raise ValueError(errors[municipality_id])
+    return windows[municipality_id]
+
+
+def recent_windows(source=None, now=None, municipalities=True):
+    """
+    Bring WeatherData up to date for the province point and (optionally)
+    every municipality, then return their latest input windows.
+    Returns ({municipality_id: window}, {municipality_id: error message}).
+    """
+    WeatherData = apps.get_model("analytics_app", "WeatherData")
+    Municipality = apps.get_model("auth_app", "Municipality") if municipalities else None
+    now = now or datetime.now()
+
+    locations = forecast_locations(Municipality)
+    try:
+        ingest(WeatherDataModel=WeatherData, source=source or default_source(), locations=locations, now=now)
+    except Exception as exc:
+        # whatever is already stored may still make complete windows
+        fetch_error = str(exc)
+    else:
+        fetch_error = None
+
+    windows, errors = input_windows(
+        WeatherDataModel=WeatherData, municipality_ids=locations.keys(), end=last_complete_hour(now)
+    )
+    if fetch_error:
+        errors = {mid: f"{fetch_error}; {message}" for mid, message in errors.items()}
+    return windows, errors
+
+
+def fetch_recent_weather(source=None, now=None):
+    """Input window of the province point, bringing its observations up to date first."""
+    windows, errors = recent_windows(source=source, now=now, municipalities=False)
+    if None in errors:
+        raise ValueError(errors[None])
+    return windows[None]
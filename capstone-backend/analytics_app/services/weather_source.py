@@ -0,0 +1,116 @@
+# analytics_app/services/weather_source.py
+"""
+Where hourly observations come from. Plain Python on purpose: web processes
+use this without importing pandas or TensorFlow.
+
+A source has fetch_many(points, start, end) -> one list of
+{"datetime": datetime, <column>: value} rows per (lat, lon) point, for the
+hour stamps in [start, end]. OpenMeteoSource talks to open-meteo (all points
+in one request), or to a stand-in server speaking the same API when given
+its base URL; FixtureSource reads a local file, so the pipeline runs offline.
+"""
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from django.conf import settings
+
+INPUT_HOURS = 168
+TARGET_COLUMNS = ["temperature_2m", "wind_speed_10m", "wind_direction_10m",
+                  "precipitation", "relative_humidity_2m", "pressure_msl", "cloud_cover"]
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+DEFAULT_LATITUDE = 13.41
+DEFAULT_LONGITUDE = 121.18
+
+_HOUR_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def rows_from_hourly(hourly):
+    """open-meteo's {"time": [...], <column>: [...]} -> observation rows."""
+    times = hourly["time"]
+    columns = {col: hourly.get(col) or [None] * len(times) for col in TARGET_COLUMNS}
+    return [
+        {
+            "datetime": datetime.fromisoformat(at),
+            **{col: _number(values[i]) for col, values in columns.items()},
+        }
+        for i, at in enumerate(times)
+    ]
+
+
+class OpenMeteoSource:
+    def __init__(self, base_url=None, lat=DEFAULT_LATITUDE, lon=DEFAULT_LONGITUDE, timeout=30):
+        self.base_url = base_url or OPEN_METEO_URL
+        self.lat = lat
+        self.lon = lon
+        self.timeout = timeout
+
+    def fetch(self, start, end):
+        return self.fetch_many([(self.lat, self.lon)], start, end)[0]
+
+    def fetch_many(self, points, start, end):
+        # open-meteo takes comma-separated coordinates and answers with a list
+        response = requests.get(self.base_url, params={
+            "latitude": ",".join(str(lat) for lat, _ in points),
+            "longitude": ",".join(str(lon) for _, lon in points),
+            "hourly": ",".join(TARGET_COLUMNS),
+            "timezone": settings.TIME_ZONE,
+            "start_hour": start.strftime(_HOUR_FORMAT),
+            "end_hour": end.strftime(_HOUR_FORMAT),
+        }, timeout=self.timeout)
+        if response.status_code != 200:
+            raise ValueError("Failed to fetch weather data")
+
+        data = response.json()
+        if isinstance(data, dict):
+            data = [data]
+        if len(data) != len(points):
+            raise ValueError(f"Expected weather for {len(points)} locations, got {len(data)}")
+        return [rows_from_hourly(location["hourly"]) for location in data]
+
+
+class FixtureSource:
+    """An open-meteo JSON response saved to disk, or a CSV with a datetime column."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._rows = None
+
+    def _load(self):
+        if self.path.suffix.lower() == ".csv":
+            with open(self.path, newline="", encoding="utf-8") as fh:
+                return [
+                    {
+                        "datetime": datetime.fromisoformat(row["datetime"]),
+                        **{col: _number(row.get(col)) for col in TARGET_COLUMNS},
+                    }
+                    for row in csv.DictReader(fh)
+                ]
+        with open(self.path, encoding="utf-8") as fh:
+            return rows_from_hourly(json.load(fh)["hourly"])
+
+    def fetch(self, start, end):
+        if self._rows is None:
+            self._rows = self._load()
+        return [row for row in self._rows if start <= row["datetime"] <= end]
+
+    def fetch_many(self, points, start, end):
+        # a fixture is a single site; every point gets its observations
+        rows = self.fetch(start, end)
+        return [rows for _ in points]
+
+
+def default_source():
+    """settings.WEATHER_SOURCE_FIXTURE if set, else open-meteo (or WEATHER_SOURCE_URL)."""
+    if settings.WEATHER_SOURCE_FIXTURE:
+        return FixtureSource(settings.WEATHER_SOURCE_FIXTURE)
+    return OpenMeteoSource(settings.WEATHER_SOURCE_URL or None)
@@ -0,0 +1,166 @@
+# analytics_app/services/weather_training.py
+"""
+Training data for manage.py retrain_weather_model.
+
+WeatherData is read location by location in keyset-paginated chunks, so
+memory stays flat however much history there is, and turned into model
+windows with the same FeatureWindow the inference worker uses. Windows are
+written to .npy memmaps next to the new model version and fed to Keras
+batch by batch.
+"""
+from collections import deque
+from datetime import timedelta
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sklearn.preprocessing import StandardScaler
+
+from .weather_features import FeatureWindow
+from .weather_model import OUTPUT_HOURS, candidate_features, target_cols, target_values
+from .weather_source import INPUT_HOURS, TARGET_COLUMNS
+
+HOUR = timedelta(hours=1)
+
+
+def complete_observations(WeatherDataModel, province_only=False):
+    """WeatherData rows with every observed column, of every location or just the province point."""
+    qs = WeatherDataModel.objects.all()
+    for col in TARGET_COLUMNS:
+        qs = qs.filter(**{f"{col}__isnull": False})
+    if province_only:
+        qs = qs.filter(municipality__isnull=True)
+    return qs
+
+
+def stream_observations(qs, chunk_size=5000):
+    """
+    Yield (municipality_id, datetime, {column: value}) ordered by location,
+    then hour; each query fetches at most `chunk_size` rows after the last
+    one seen.
+    """
+    locations = sorted(
+        qs.order_by().values_list("municipality_id", flat=True).distinct(),
+        key=lambda mid: (mid is not None, mid or 0),
+    )
+    for mid in locations:
+        location_qs = qs.filter(municipality_id=mid).order_by("datetime")
+        last = None
+        while True:
+            chunk_qs = location_qs if last is None else location_qs.filter(datetime__gt=last)
+            chunk = list(chunk_qs.values_list("datetime", *TARGET_COLUMNS)[:chunk_size])
+            for at, *values in chunk:
+                yield mid, at, dict(zip(TARGET_COLUMNS, values))
+            if len(chunk) < chunk_size:
+                break
+            last = chunk[-1][0]
+
+
+def build_dataset(observations, directory, capacity, stride=1, progress=None, progress_every=10000):
+    """
+    Write a training sample for every `stride`-th complete window: X the
+    unscaled (INPUT_HOURS, n_feats) features up to an hour, Y the
+    (OUTPUT_HOURS, len(target_cols)) targets after it. Windows never span
+    a gap in the observations or two locations.
+
+    `capacity` bounds the number of samples (the observation count will do).
+    Returns (X, Y, ends) with ends the datetime64 of each window's last hour.
+    """
+    X = open_memmap(directory / "dataset_X.npy", mode="w+", dtype="float32",
+                    shape=(capacity, INPUT_HOURS, len(candidate_features)))
+    Y = open_memmap(directory / "dataset_Y.npy", mode="w+", dtype="float32",
+                    shape=(capacity, OUTPUT_HOURS, len(target_cols)))
+    ends = []
+    n = 0
+
+    location = last = window = None
+    position = 0
+    targets = deque(maxlen=OUTPUT_HOURS)
+    pending = deque()  # (slot, position, datetime) of windows still waiting for their targets
+
+    for seen, (mid, at, values) in enumerate(observations, start=1):
+        if window is None or mid != location or at - last != HOUR:
+            # samples still waiting are always the newest slots; drop them
+            n -= len(pending)
+            pending.clear()
+            targets.clear()
+            window = FeatureWindow()
+            location, position = mid, -1
+
+        last = at
+        position += 1
+        window.append(at, values)
+        targets.append(target_values(values))
+
+        if pending and position - pending[0][1] == OUTPUT_HOURS:
+            slot, _position, end = pending.popleft()
+            Y[slot] = targets
+            ends.append(end)
+
+        if window.ready and (position - (INPUT_HOURS - 1)) % stride == 0:
+            X[n] = window.features()
+            pending.append((n, position, at))
+            n += 1
+
+        if progress and seen % progress_every == 0:
+            progress(seen, len(ends))
+
+    n -= len(pending)
+    X.flush()
+    Y.flush()
+    return X[:n], Y[:n], np.array(ends, dtype="datetime64[s]")
+
+
+def fit_scalers(X, Y, chunk=1024):
+    """StandardScalers for the feature and target columns, fitted chunk by chunk."""
+    scaler_X, scaler_Y = StandardScaler(), StandardScaler()
+    for start in range(0, len(X), chunk):
+        scaler_X.partial_fit(X[start:start + chunk].reshape(-1, X.shape[-1]))
+        scaler_Y.partial_fit(Y[start:start + chunk].reshape(-1, Y.shape[-1]))
+    return scaler_X, scaler_Y
+
+
+def scale_in_place(X, Y, scaler_X, scaler_Y, chunk=1024):
+    for start in range(0, len(X), chunk):
+        x, y = X[start:start + chunk], Y[start:start + chunk]
+        x[:] = scaler_X.transform(x.reshape(-1, x.shape[-1])).reshape(x.shape)
+        y[:] = scaler_Y.transform(y.reshape(-1, y.shape[-1])).reshape(y.shape)
+
+
+def split_by_time(ends, validation=0.1):
+    """(train ids, validation ids): the windows ending in the last `validation` share of time are held out."""
+    ids = np.arange(len(ends))
+    if not validation or len(ends) < 2:
+        return ids, ids[:0]
+    seconds = ends.astype("int64")
+    cutoff = np.quantile(seconds, 1 - validation)
+    held_out = seconds >= cutoff
+    if held_out.all():
+        return ids, ids[:0]
+    return ids[~held_out], ids[held_out]
+
+
+def window_batches(X, Y, ids, batch_size, output_shape, shuffle=True, seed=0):
+    """Keras PyDataset over the samples `ids` of the memmapped dataset."""
+    import tensorflow as tf
+
+    class WindowBatches(tf.keras.utils.PyDataset):
+        def __init__(self):
+            super().__init__()
+            self.ids = np.array(ids)
+            self.rng = np.random.default_rng(seed)
+            if shuffle:
+                self.rng.shuffle(self.ids)
+
+        def __len__(self):
+            return -(-len(self.ids) // batch_size)
+
+        def __getitem__(self, index):
+            # sorted ids read the memmaps in file order
+            batch = np.sort(self.ids[index * batch_size:(index + 1) * batch_size])
+            return X[batch], Y[batch].reshape((len(batch), *output_shape))
+
+        def on_epoch_end(self):
+            if shuffle:
+                self.rng.shuffle(self.ids)
+
+    return WindowBatches()
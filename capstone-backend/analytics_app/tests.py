@@ -1,3 +1,1053 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from auth_app.models import Barangay, CustomUser, HazardReport, Municipality
+from evac_app.models import CenterOccupancy, EvacuationCenter, EvacuationLog
+from evac_app.services import data_version
+from analytics_app.management.commands import refresh_weather_forecast
+from analytics_app.models import WeatherData, WeatherForecast
+from analytics_app.services import (
+    inference_client,
+    report_cache,
+    report_xlsx,
+    weather_features,
+    weather_history,
+    weather_model,
+    weather_observations,
+)
+from analytics_app.services.affected_population_report import (
+    build_affected_population_report,
+    build_affected_population_series,
+    center_totals_as_of,
+)
+from analytics_app.services.dashboard_summary import build_dashboard_summary
+from analytics_app.services.weather_forecasts import latest_forecast_payload, refresh_forecasts
+from analytics_app.services.weather_source import TARGET_COLUMNS, FixtureSource
+from analytics_app.services.congestion import (
+    CongestionParams,
+    compute_congestion_risk,
+    compute_congestion_risk_batch,
+)
+
+
+class CongestionTestMixin:
+    """Centers in two municipalities with recent logs covering the risk model's branches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.calapan = Municipality.objects.create(name="Calapan City")
+        cls.baco = Municipality.objects.create(name="Baco")
+        now = timezone.now()
+
+        # (capacity, [(minutes ago, individuals in, individuals out, children)])
+        scenarios = [
+            (100, [(150, 40, 0, 5), (30, 20, 5, 2), (10, 15, 0, 0)]),   # filling up fast
+            (100, [(150, 96, 0, 10)]),                                  # nearly full, no flow
+            (200, [(150, 120, 0, 30), (20, 0, 60, 0)]),                 # easing
+            (50, [(90, 30, 0, 40)]),                                    # vulnerable share > 1
+            (80, []),                                                   # never logged
+            (0, [(20, 10, 0, 0)]),                                      # no capacity
+        ]
+        cls.centers = []
+        for i, (capacity, logs) in enumerate(scenarios):
+            center = EvacuationCenter.objects.create(
+                name=f"Center {i}",
+                municipality=cls.calapan if i % 3 else cls.baco,
+                individual_capacity_max=capacity,
+                family_capacity_max=10,
+            )
+            cls.centers.append(center)
+            for minutes_ago, ind_in, ind_out, children in logs:
+                EvacuationLog.objects.create(
+                    center=center,
+                    date_recorded=now - timedelta(minutes=minutes_ago),
+                    individuals_in=ind_in,
+                    individuals_out=ind_out,
+                    children_count=children,
+                )
+
+
+class CongestionEngineParityTests(CongestionTestMixin, TestCase):
+    def test_batch_matches_scalar_model(self):
+        for params in [
+            CongestionParams(),
+            CongestionParams(window_minutes=240, horizon_minutes=120),
+            CongestionParams(window_minutes=15, horizon_minutes=360, w_occ=0.3, w_pred=0.6, w_vuln=0.1),
+        ]:
+            with self.subTest(params=params):
+                centers = EvacuationCenter.objects.select_related("occupancy").order_by("id")
+                batch = compute_congestion_risk_batch(
+                    centers=centers, EvacuationLogModel=EvacuationLog, params=params
+                )
+                scalar = [
+                    compute_congestion_risk(center=center, EvacuationLogModel=EvacuationLog, params=params)
+                    for center in centers
+                ]
+                self.assertEqual(batch, scalar)
+
+        levels = {r["risk_level"] for r in compute_congestion_risk_batch(
+            centers=EvacuationCenter.objects.select_related("occupancy"),
+            EvacuationLogModel=EvacuationLog,
+        )}
+        # the scenarios reach more than one branch of the guardrails
+        self.assertGreater(len(levels), 2)
+
+
+class CongestionRiskListViewTests(CongestionTestMixin, TestCase):
+    url = "/api/analytics/congestion-risk/"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        def user(email, role, **extra):
+            return CustomUser.objects.create_user(email=email, password="pass", role=role, **extra)
+
+        cls.provincial = user("province@example.com", "PROVINCIAL_ADMIN")
+        cls.municipal = user("calapan@example.com", "MUNICIPAL_ADMIN", municipality=cls.calapan)
+        cls.staff = user("staff@example.com", "EVAC_CENTER_STAFF", assigned_center=cls.centers[0])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, user, url=None, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(url or self.url, params)
+
+    def center_ids(self, user, **params):
+        response = self.get(user, **params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], len(response.data["results"]))
+        return [row["center_id"] for row in response.data["results"]]
+
+    def test_one_entry_per_center_in_scope(self):
+        every = [c.id for c in self.centers]
+        in_calapan = [c.id for c in self.centers if c.municipality_id == self.calapan.id]
+        in_baco = [c.id for c in self.centers if c.municipality_id == self.baco.id]
+        self.assertTrue(in_calapan and in_baco)
+
+        self.assertEqual(self.center_ids(self.provincial), every)
+        self.assertEqual(self.center_ids(self.provincial, municipality=self.baco.id), in_baco)
+        self.assertEqual(self.center_ids(self.municipal), in_calapan)
+        self.assertEqual(self.center_ids(self.staff), [self.centers[0].id])
+
+        # ?municipality= narrows the caller's scope, never widens it
+        self.assertEqual(self.center_ids(self.municipal, municipality=self.baco.id), [])
+        self.assertEqual(self.get(self.provincial, municipality="calapan").status_code, 400)
+
+    def test_entries_match_the_single_center_payload(self):
+        for params in ({}, {"window": 240, "horizon": 120}):
+            with self.subTest(params=params):
+                response = self.get(self.provincial, **params)
+                self.assertEqual(
+                    (response.data["window_minutes"], response.data["horizon_minutes"]),
+                    (params.get("window", 60), params.get("horizon", 60)),
+                )
+                for row in response.data["results"]:
+                    single = self.get(self.provincial, f"/api/analytics/centers/{row['center_id']}/congestion-risk/", **params)
+                    self.assertEqual(row, single.data)
+
+
+class AffectedPopulationTestMixin:
+    """Centers in two municipalities with logs around a few report cut-offs."""
+
+    base = datetime(2025, 7, 1, 8, 0)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.baco = Municipality.objects.create(name="Baco")
+        cls.calapan = Municipality.objects.create(name="Calapan City")
+        lalud = Barangay.objects.create(name="Lalud", municipality=cls.calapan)
+        alag = Barangay.objects.create(name="Alag", municipality=cls.baco)
+
+        def center(name, municipality, barangay, category="INSIDE_EC"):
+            return EvacuationCenter.objects.create(
+                name=name,
+                municipality=municipality,
+                barangay=barangay,
+                shelter_category=category,
+                individual_capacity_max=200,
+            )
+
+        cls.gym = center("Alag Gym", cls.baco, alag)
+        cls.chapel = center("Alag Chapel", cls.baco, alag, "OUTSIDE_EC")
+        cls.school = center("Lalud School", cls.calapan, lalud)
+        cls.hall = center("Lalud Hall", cls.calapan, lalud)
+
+        # (center, hours after base, families in/out, individuals in/out), in
+        # insertion order: the gym's +1h log is backdated and two of its logs
+        # share +2h; the hall only has logs after the earlier cut-offs
+        for c, hours, fam_in, fam_out, ind_in, ind_out in [
+            (cls.gym, 0, 3, 0, 10, 0),
+            (cls.gym, 2, 1, 0, 5, 0),
+            (cls.school, 0.5, 6, 0, 20, 0),
+            (cls.chapel, 1, 2, 0, 6, 0),
+            (cls.school, 3, 0, 2, 0, 5),
+            (cls.gym, 5, 0, 2, 0, 8),
+            (cls.gym, 1, 1, 0, 4, 0),
+            (cls.gym, 2, 1, 0, 2, 0),
+            (cls.chapel, 6, 0, 2, 0, 6),
+            (cls.hall, 7, 2, 0, 9, 0),
+        ]:
+            EvacuationLog.objects.create(
+                center=c,
+                date_recorded=cls.base + timedelta(hours=hours),
+                families_in=fam_in,
+                families_out=fam_out,
+                individuals_in=ind_in,
+                individuals_out=ind_out,
+            )
+
+    def reference_totals(self, as_of):
+        """center_totals_as_of() computed the old way: one lookup per center."""
+        totals = {}
+        for c in EvacuationCenter.objects.all():
+            logs = EvacuationLog.objects.filter(center=c, date_recorded__lte=as_of)
+            latest = logs.order_by("-date_recorded", "-id").first()
+            if latest is None:
+                continue
+            sums = logs.aggregate(families=Sum("families_in"), persons=Sum("individuals_in"))
+            totals[c.id] = {
+                "families_in_sum": sums["families"],
+                "persons_in_sum": sums["persons"],
+                "families_now": latest.total_current_families,
+                "persons_now": latest.total_current,
+            }
+        return totals
+
+
+class AffectedPopulationReportTests(AffectedPopulationTestMixin, TestCase):
+    def test_windowed_totals_match_per_center_lookup(self):
+        for hours in [-1, 0.5, 2, 4, 6.5, 8]:
+            as_of = self.base + timedelta(hours=hours)
+            with self.subTest(as_of=as_of):
+                expected = self.reference_totals(as_of)
+                self.assertEqual(center_totals_as_of(EvacuationLog.objects.all(), as_of), expected)
+
+                report = build_affected_population_report(
+                    EvacuationCenterModel=EvacuationCenter,
+                    EvacuationLogModel=EvacuationLog,
+                    as_of=as_of,
+                )
+                if not expected:
+                    self.assertEqual(report["rows"], [])
+                    continue
+
+                total = report["rows"][-1]
+                self.assertEqual(total["row_type"], "grand_total")
+                self.assertEqual(total["total_families_cum"], sum(t["families_in_sum"] for t in expected.values()))
+                self.assertEqual(total["total_persons_cum"], sum(t["persons_in_sum"] for t in expected.values()))
+                self.assertEqual(total["total_families_now"], sum(t["families_now"] for t in expected.values()))
+                self.assertEqual(total["total_persons_now"], sum(t["persons_now"] for t in expected.values()))
+
+    def test_ties_take_the_newest_log(self):
+        # the two +2h gym logs: the later id carries the running totals
+        as_of = self.base + timedelta(hours=2)
+        latest = EvacuationLog.objects.filter(center=self.gym, date_recorded=as_of).order_by("-id").first()
+        totals = center_totals_as_of(EvacuationLog.objects.all(), as_of)[self.gym.id]
+        self.assertEqual(totals["persons_now"], latest.total_current)
+        self.assertEqual(totals["persons_now"], 21)
+
+
+class AffectedPopulationSeriesTests(AffectedPopulationTestMixin, TestCase):
+    def test_each_step_matches_a_report_at_that_time(self):
+        start = self.base - timedelta(minutes=30)
+        end = self.base + timedelta(hours=7, minutes=10)
+        series = build_affected_population_series(
+            EvacuationCenterModel=EvacuationCenter,
+            EvacuationLogModel=EvacuationLog,
+            start=start,
+            end=end,
+            step=timedelta(minutes=90),
+        )["series"]
+
+        # start, every 90 minutes, then the end itself
+        expected_times = [start + timedelta(minutes=90 * i) for i in range(6)] + [end]
+        self.assertEqual([step["as_of"] for step in series], [t.isoformat() for t in expected_times])
+
+        for step, as_of in zip(series, expected_times):
+            with self.subTest(as_of=as_of):
+                report = build_affected_population_report(
+                    EvacuationCenterModel=EvacuationCenter,
+                    EvacuationLogModel=EvacuationLog,
+                    as_of=as_of,
+                )
+                self.assertEqual(step["rows"], report["rows"])
+
+                expected = self.reference_totals(as_of)
+                if expected:
+                    total = step["rows"][-1]
+                    self.assertEqual(total["total_persons_now"], sum(t["persons_now"] for t in expected.values()))
+                    self.assertEqual(total["total_persons_cum"], sum(t["persons_in_sum"] for t in expected.values()))
+
+
+class ReportXlsxTests(AffectedPopulationTestMixin, TestCase):
+    def test_dromic_layout(self):
+        report = build_affected_population_report(
+            EvacuationCenterModel=EvacuationCenter,
+            EvacuationLogModel=EvacuationLog,
+            as_of=self.base + timedelta(hours=8),
+        )
+        with report_xlsx.report_xlsx_file(report) as fh:
+            ws = load_workbook(fh)["Affected Population"]
+
+        def values(row):
+            return [cell.value for cell in ws[row]]
+
+        self.assertEqual(ws["A1"].value, "AFFECTED POPULATION REPORT")
+        self.assertEqual(ws["A2"].value, "AFFECTED POPULATION")
+        self.assertEqual(ws["A3"].value, "As of 01 July 2025, 04:00 PM")
+
+        # three header rows, the groups merged across them
+        self.assertEqual(values(5), [
+            "Province", "City / Municipality", "Barangay",
+            "NO. OF AFFECTED", None, None,
+            "NO. OF ECS", None,
+            "INSIDE EVACUATION CENTERS", None, None, None,
+            "OUTSIDE EVACUATION CENTERS", None, None, None,
+            "TOTAL SERVED (CURRENT)", None, None, None,
+        ])
+        self.assertEqual(values(6), [
+            None, None, None,
+            "Brgys.", "Families", "Persons", "CUM", "NOW",
+            "Families", None, "Persons", None,
+            "Families", None, "Persons", None,
+            "Families", None, "Persons", None,
+        ])
+        self.assertEqual(values(7), [None] * 8 + ["CUM", "NOW"] * 6)
+        merged = {str(cells) for cells in ws.merged_cells.ranges}
+        for cells in ("A1:T1", "A5:A7", "C5:C7", "D5:F5", "I5:L5", "Q5:T5", "D6:D7", "H6:H7", "I6:J6", "S6:T6"):
+            self.assertIn(cells, merged)
+        self.assertEqual(ws.freeze_panes, "D8")
+
+        # then one worksheet row per report row, in the DROMIC column order
+        rows = report["rows"]
+        self.assertEqual(ws.max_row, 7 + len(rows))
+        first = rows[0]
+        self.assertEqual(first["row_type"], "data")
+        self.assertEqual(values(8), [
+            first["province"], first["municipality"], first["barangay"],
+            first["affected_brgys"], first["affected_families"], first["affected_persons"],
+            first["ecs_cum"], first["ecs_now"],
+            first["inside_families_cum"], first["inside_families_now"],
+            first["inside_persons_cum"], first["inside_persons_now"],
+            first["outside_families_cum"], first["outside_families_now"],
+            first["outside_persons_cum"], first["outside_persons_now"],
+            first["total_families_cum"], first["total_families_now"],
+            first["total_persons_cum"], first["total_persons_now"],
+        ])
+        # Alag: the gym took in 21 persons and let 8 go, the chapel 6 and 6
+        self.assertEqual(values(8)[1:3], ["Baco", "Alag"])
+        self.assertEqual(values(8)[-2:], [27, 13])
+        self.assertEqual(values(7 + len(rows))[2], "Total")
+        self.assertEqual(values(7 + len(rows))[-1], rows[-1]["total_persons_now"])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ReportCacheTests(AffectedPopulationTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.as_of = self.base + timedelta(hours=8)
+        self.municipality_ids = [self.baco.id, self.calapan.id]
+
+    def report(self):
+        return report_cache.affected_population_report(
+            EvacuationCenterModel=EvacuationCenter,
+            EvacuationLogModel=EvacuationLog,
+            municipality_ids=self.municipality_ids,
+            as_of=self.as_of,
+            as_of_key=self.as_of.isoformat(),
+        )
+
+    def partial_keys(self):
+        versions = data_version.municipality_versions(self.municipality_ids)
+        return {
+            mid: report_cache.partial_key(versions[mid], "all", self.as_of.isoformat(), mid)
+            for mid in self.municipality_ids
+        }
+
+    def test_log_write_rebuilds_only_its_municipality(self):
+        before, status = self.report()
+        self.assertEqual(status, "miss")
+        self.assertEqual(self.report(), (before, "hit"))
+        keys_before = self.partial_keys()
+
+        # a new log in Baco, recorded before as_of
+        with self.captureOnCommitCallbacks(execute=True):
+            EvacuationLog.objects.create(
+                center=self.gym,
+                date_recorded=self.base + timedelta(hours=4),
+                families_in=2,
+                individuals_in=7,
+            )
+
+        keys_after = self.partial_keys()
+        self.assertEqual(keys_after[self.calapan.id], keys_before[self.calapan.id])
+        self.assertIsNotNone(cache.get(keys_after[self.calapan.id]))
+        self.assertNotEqual(keys_after[self.baco.id], keys_before[self.baco.id])
+        self.assertIsNone(cache.get(keys_after[self.baco.id]))
+
+        with mock.patch.object(
+            report_cache, "build_municipal_partials", wraps=report_cache.build_municipal_partials
+        ) as build:
+            after, status = self.report()
+
+        self.assertEqual(status, "partial")
+        build.assert_called_once()
+        self.assertEqual(build.call_args.kwargs["municipality_ids"], [self.baco.id])
+
+        self.assertNotEqual(after["rows"], before["rows"])
+        self.assertEqual(after["rows"][-1]["total_persons_cum"], before["rows"][-1]["total_persons_cum"] + 7)
+        fresh = build_affected_population_report(
+            EvacuationCenterModel=EvacuationCenter,
+            EvacuationLogModel=EvacuationLog,
+            as_of=self.as_of,
+        )
+        self.assertEqual(after["rows"], fresh["rows"])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AffectedPopulationScopeTests(AffectedPopulationTestMixin, TestCase):
+    report_url = "/api/analytics/reports/affected-population/"
+    series_url = "/api/analytics/reports/affected-population/series/"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.municipal = CustomUser.objects.create_user(
+            email="baco@example.com", password="pass", role="MUNICIPAL_ADMIN", municipality=cls.baco
+        )
+        cls.unassigned = CustomUser.objects.create_user(
+            email="nowhere@example.com", password="pass", role="MUNICIPAL_ADMIN"
+        )
+        cls.citizen = CustomUser.objects.create_user(email="citizen@example.com", password="pass", role="CITIZEN")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.as_of = self.base + timedelta(hours=8)
+        self.series_params = {
+            "from": self.base.isoformat(),
+            "to": self.as_of.isoformat(),
+            "step": "2h",
+        }
+
+    def get(self, user, url, params):
+        self.client.force_authenticate(user)
+        return self.client.get(url, params)
+
+    def test_municipal_admin_sees_only_their_centers(self):
+        expected = build_affected_population_report(
+            EvacuationCenterModel=EvacuationCenter,
+            EvacuationLogModel=EvacuationLog,
+            as_of=self.as_of,
+            municipality_ids=[self.baco.id],
+        )["rows"]
+        self.assertEqual({row["municipality"] for row in expected if row["row_type"] == "data"}, {"Baco"})
+
+        # ?municipality= can't point a municipal admin elsewhere
+        for params in ({}, {"municipality": self.calapan.id}):
+            with self.subTest(params=params):
+                response = self.get(self.municipal, self.report_url, {"as_of": self.as_of.isoformat(), **params})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["rows"], expected)
+
+                response = self.get(self.municipal, self.series_url, {**self.series_params, **params})
+                self.assertEqual(response.status_code, 200)
+                series = response.data["series"]
+                self.assertEqual(series[-1]["rows"], expected)
+                for step in series:
+                    self.assertTrue(all(row["municipality"] in ("Baco", "") for row in step["rows"]))
+
+        expected_series = build_affected_population_series(
+            EvacuationCenterModel=EvacuationCenter,
+            EvacuationLogModel=EvacuationLog,
+            start=self.base,
+            end=self.as_of,
+            step=timedelta(hours=2),
+            municipality_ids=[self.baco.id],
+        )["series"]
+        self.assertEqual(series, expected_series)
+
+    def test_accounts_without_a_municipality_are_refused(self):
+        for user in (self.unassigned, self.citizen):
+            for url, params in (
+                (self.report_url, {"as_of": self.as_of.isoformat()}),
+                (self.series_url, self.series_params),
+            ):
+                with self.subTest(user=user.email, url=url):
+                    self.assertEqual(self.get(user, url, params).status_code, 403)
+
+
+class DashboardSummaryTestMixin:
+    """Centers, users and hazard reports in two municipalities."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.baco = Municipality.objects.create(name="Baco")
+        cls.calapan = Municipality.objects.create(name="Calapan City")
+        at = datetime(2025, 7, 1, 8, 0)
+
+        def center(name, municipality):
+            return EvacuationCenter.objects.create(name=name, municipality=municipality, individual_capacity_max=100)
+
+        # (center, hours after `at`, families in/out, individuals in/out, vulnerable counts)
+        gym, school, hall = center("Baco Gym", cls.baco), center("Lalud School", cls.calapan), center("Lalud Hall", cls.calapan)
+        center("Empty Chapel", cls.calapan)
+        for c, hours, fam_in, fam_out, ind_in, ind_out, vulnerable in [
+            (gym, 0, 6, 0, 30, 0, dict(children_count=4, senior_count=2, pwd_count=1, pregnant_count=1)),
+            (school, 0, 5, 0, 20, 0, dict(children_count=6)),
+            (school, 2, 0, 5, 0, 20, {}),  # emptied: active, not occupied
+            (hall, 1, 3, 0, 12, 0, dict(children_count=3, lactating_count=2)),
+        ]:
+            EvacuationLog.objects.create(
+                center=c,
+                date_recorded=at + timedelta(hours=hours),
+                families_in=fam_in,
+                families_out=fam_out,
+                individuals_in=ind_in,
+                individuals_out=ind_out,
+                **vulnerable,
+            )
+
+        def user(email, role, municipality=None, **extra):
+            return CustomUser.objects.create_user(
+                email=email, password="pass", role=role, municipality=municipality, **extra
+            )
+
+        cls.provincial = user("province@example.com", "PROVINCIAL_ADMIN")
+        cls.municipal = user("calapan@example.com", "MUNICIPAL_ADMIN", cls.calapan)
+        cls.unassigned = user("nowhere@example.com", "MUNICIPAL_ADMIN")
+        cls.citizen = user("citizen@example.com", "CITIZEN")  # no municipality either
+        user("baco-admin@example.com", "MUNICIPAL_ADMIN", cls.baco)
+        user("resident@example.com", "CITIZEN", cls.calapan, is_active=False)
+        user("staff@example.com", "EVAC_CENTER_STAFF", cls.calapan)
+
+        for municipality, status, severity in [
+            (cls.baco, "PENDING", "HIGH"),
+            (cls.baco, "PENDING", "LOW"),
+            (cls.calapan, "PENDING", "CRITICAL"),
+            (cls.calapan, "PENDING", "MEDIUM"),
+            (cls.calapan, "APPROVED", "HIGH"),
+        ]:
+            HazardReport.objects.create(
+                reporter=cls.citizen,
+                hazard_type="FLOOD",
+                severity=severity,
+                status=status,
+                description="Knee-deep water",
+                latitude=13.41,
+                longitude=121.18,
+                municipality=municipality,
+            )
+
+    province_summary = {
+        "total_evacuees": 42,
+        "total_families": 9,
+        "active_centers": 3,
+        "occupied_centers": 2,
+        "vulnerable": {"children": 7, "seniors": 2, "pwd": 1, "pregnant": 1, "lactating": 2, "total": 13},
+        "users": {
+            "total": 7,
+            "active": 6,
+            "by_role": {
+                "citizen": 2,
+                "provincial_admin": 1,
+                "municipal_admin": 3,
+                "response_team": 0,
+                "evac_center_staff": 1,
+            },
+        },
+        "hazards": {"pending": 4, "pending_high_severity": 2},
+    }
+
+    calapan_summary = {
+        "total_evacuees": 12,
+        "total_families": 3,
+        "active_centers": 2,
+        "occupied_centers": 1,
+        "vulnerable": {"children": 3, "seniors": 0, "pwd": 0, "pregnant": 0, "lactating": 2, "total": 5},
+        "users": {
+            "total": 3,
+            "active": 2,
+            "by_role": {
+                "citizen": 1,
+                "provincial_admin": 0,
+                "municipal_admin": 1,
+                "response_team": 0,
+                "evac_center_staff": 1,
+            },
+        },
+        "hazards": {"pending": 2, "pending_high_severity": 1},
+    }
+
+
+class DashboardSummaryTests(DashboardSummaryTestMixin, TestCase):
+    def test_every_field(self):
+        summary = build_dashboard_summary(
+            occupancy_qs=CenterOccupancy.objects.all(),
+            users_qs=CustomUser.objects.all(),
+            hazards_qs=HazardReport.objects.all(),
+        )
+        self.assertEqual(summary, self.province_summary)
+
+        summary = build_dashboard_summary(
+            occupancy_qs=CenterOccupancy.objects.filter(center__municipality=self.calapan),
+            users_qs=CustomUser.objects.filter(municipality=self.calapan),
+            hazards_qs=HazardReport.objects.filter(municipality=self.calapan),
+        )
+        self.assertEqual(summary, self.calapan_summary)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class DashboardSummaryViewTests(DashboardSummaryTestMixin, TestCase):
+    url = "/api/analytics/dashboard-summary/"
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get(self.url)
+
+    def test_provincial_admin_sees_the_province(self):
+        response = self.get(self.provincial)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["scope"], "province")
+        self.assertEqual({k: v for k, v in response.data.items() if k in self.province_summary}, self.province_summary)
+
+    def test_municipal_admin_sees_their_municipality(self):
+        response = self.get(self.municipal)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["scope"], f"municipality-{self.calapan.id}")
+        self.assertEqual({k: v for k, v in response.data.items() if k in self.calapan_summary}, self.calapan_summary)
+
+    def test_other_roles_are_refused(self):
+        # the citizen has no municipality, which must not pass for provincial
+        for user in (self.citizen, self.unassigned):
+            with self.subTest(user=user.email):
+                self.assertEqual(self.get(user).status_code, 403)
+
+
+class WeatherDataTests(TestCase):
+    def test_one_row_per_location_and_hour(self):
+        calapan = Municipality.objects.create(name="Calapan City")
+        at = datetime(2026, 3, 1, 8, 0)
+        WeatherData.objects.create(datetime=at)
+        WeatherData.objects.create(municipality=calapan, datetime=at)
+
+        # the province point (NULL municipality) is covered too
+        for municipality in (None, calapan):
+            with self.subTest(municipality=municipality), self.assertRaises(IntegrityError), transaction.atomic():
+                WeatherData.objects.create(municipality=municipality, datetime=at)
+
+        WeatherData.objects.create(datetime=at + timedelta(hours=1))
+        self.assertEqual(WeatherData.objects.count(), 3)
+
+
+def write_observations(path, start, end):
+    """CSV fixture for FixtureSource with every hour in [start, end]; values follow the hour of day."""
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["datetime", *TARGET_COLUMNS])
+        at = start
+        while at <= end:
+            writer.writerow([at.isoformat(), *[at.hour + i / 10 for i in range(len(TARGET_COLUMNS))]])
+            at += timedelta(hours=1)
+    return path
+
+
+class WeatherObservationTests(TestCase):
+    """ingest() against a CSV fixture covering every hour of the input window and a day before it."""
+
+    now = datetime(2026, 3, 12, 0, 10)
+    end = datetime(2026, 3, 12, 0, 0)
+    start = end - timedelta(hours=weather_observations.INPUT_HOURS - 1)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.fixture = write_observations(
+            os.path.join(tmp.name, "observations.csv"), self.start - timedelta(hours=24), self.end
+        )
+
+        self.calapan = Municipality.objects.create(name="Calapan City", latitude=13.41, longitude=121.18)
+        self.locations = weather_observations.forecast_locations(Municipality)
+
+    def ingest(self):
+        source = FixtureSource(self.fixture)
+        with mock.patch.object(source, "fetch_many", wraps=source.fetch_many) as fetch_many:
+            result = weather_observations.ingest(
+                WeatherDataModel=WeatherData, source=source, locations=self.locations, now=self.now
+            )
+        return result, [call.args[1:] for call in fetch_many.call_args_list]
+
+    def assertWindowsComplete(self):
+        windows, errors = weather_observations.input_windows(
+            WeatherDataModel=WeatherData, municipality_ids=self.locations.keys(), end=self.end
+        )
+        self.assertEqual(errors, {})
+        for window in windows.values():
+            self.assertEqual(window["datetime"][0], self.start.isoformat())
+            self.assertEqual(window["datetime"][-1], self.end.isoformat())
+            self.assertEqual(window["temperature_2m"][-1], float(self.end.hour))
+
+    def test_nothing_stored(self):
+        result, requests = self.ingest()
+        hours = weather_observations.INPUT_HOURS
+
+        # both locations miss the same hours: one request for the lot
+        self.assertEqual(requests, [(self.start, self.end)])
+        self.assertEqual(result, {"missing": 2 * hours, "requests": 1, "stored": 2 * hours})
+        self.assertEqual(WeatherData.objects.filter(municipality__isnull=True).count(), hours)
+        self.assertEqual(WeatherData.objects.filter(municipality=self.calapan).count(), hours)
+        self.assertWindowsComplete()
+
+    def test_gap_in_the_middle(self):
+        self.ingest()
+        gap_start = self.start + timedelta(hours=50)
+        gap_end = gap_start + timedelta(hours=9)
+        incomplete = self.start + timedelta(hours=100)
+        WeatherData.objects.filter(
+            municipality__isnull=True, datetime__gte=gap_start, datetime__lte=gap_end
+        ).delete()
+        WeatherData.objects.filter(municipality=self.calapan, datetime=incomplete).update(precipitation=None)
+
+        result, requests = self.ingest()
+
+        # only the missing runs are asked for, one request per run
+        self.assertEqual(sorted(requests), [(gap_start, gap_end), (incomplete, incomplete)])
+        self.assertEqual(result, {"missing": 11, "requests": 2, "stored": 11})
+        self.assertEqual(WeatherData.objects.count(), 2 * weather_observations.INPUT_HOURS)
+        self.assertWindowsComplete()
+
+    def test_everything_stored(self):
+        self.ingest()
+        result, requests = self.ingest()
+        self.assertEqual(requests, [])
+        self.assertEqual(result, {"missing": 0, "requests": 0, "stored": 0})
+
+    def test_upsert_replaces_hours(self):
+        rows = FixtureSource(self.fixture).fetch(self.end - timedelta(hours=2), self.end)
+        for municipality_id in (None, self.calapan.id):
+            with self.subTest(municipality_id=municipality_id):
+                weather_observations.upsert(WeatherData, rows, municipality_id=municipality_id)
+                weather_observations.upsert(
+                    WeatherData, [{**row, "temperature_2m": 30.0} for row in rows], municipality_id=municipality_id
+                )
+                stored = WeatherData.objects.filter(municipality_id=municipality_id)
+                self.assertEqual(stored.count(), 3)
+                self.assertEqual(set(stored.values_list("temperature_2m", flat=True)), {30.0})
+
+
+class WeatherHistoryLoadTests(TestCase):
+    def chunk(self, start, hours):
+        # training-set column names, with one hour repeated (the last row wins)
+        df = pd.DataFrame({
+            "time": pd.date_range(start, periods=hours, freq="h"),
+            "TAVG": [27.0 + i for i in range(hours)],
+            "RH": 80.0,
+        })
+        df = pd.concat([df, df.iloc[[2]].assign(TAVG=99.0)])
+        mapping = weather_history.column_mapping(df.columns)
+        return weather_history.normalize(df, mapping, "time")
+
+    def test_loading_a_chunk_twice_keeps_one_row_per_hour(self):
+        calapan = Municipality.objects.create(name="Calapan City")
+        rows = self.chunk("2025-07-01 00:00", 6)
+        for municipality_id in (None, calapan.id):
+            with self.subTest(municipality_id=municipality_id):
+                self.assertEqual(weather_history.load_chunk(WeatherData, rows, municipality_id, batch_size=4), (6, 0))
+                self.assertEqual(weather_history.load_chunk(WeatherData, rows, municipality_id, batch_size=4), (0, 6))
+                self.assertEqual(WeatherData.objects.filter(municipality_id=municipality_id).count(), 6)
+
+        # an overlapping chunk only adds its new hours
+        self.assertEqual(weather_history.load_chunk(WeatherData, self.chunk("2025-07-01 04:00", 4)), (2, 2))
+        stored = WeatherData.objects.filter(municipality__isnull=True).order_by("datetime")
+        self.assertEqual(stored.count(), 8)
+        self.assertEqual(stored[2].temperature_2m, 99.0)
+        self.assertEqual(stored[4].temperature_2m, 31.0)
+
+
+class StopLoop(Exception):
+    pass
+
+
+class WeatherForecastTests(TestCase):
+    """Scheduled forecasts with the inference worker stubbed at inference_client.request."""
+
+    url = "/api/analytics/weather/predict/"
+    generated_at = datetime(2026, 3, 12, 0, 5)
+
+    def window(self, last_hour):
+        return {"datetime": [last_hour.isoformat()], "temperature_2m": [float(last_hour.hour)], "location": None}
+
+    def worker_reply(self, *values):
+        return {"ok": True, "columns": ["temperature_2m"], "predictions": [[[v] for v in values]]}
+
+    def refresh(self, last_hour, now, reply=None, error=None):
+        with mock.patch.object(inference_client, "request", return_value=reply, side_effect=error):
+            return refresh_forecasts(
+                WeatherForecastModel=WeatherForecast,
+                collect=lambda now: ({None: self.window(last_hour)}, {}),
+                now=now,
+            )
+
+    def test_nothing_stored_is_503(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+
+        # a failed run alone doesn't make a forecast either
+        with mock.patch.object(inference_client, "request", side_effect=inference_client.InferenceUnavailable("down")):
+            forecasts = refresh_forecasts(
+                WeatherForecastModel=WeatherForecast,
+                collect=lambda now: ({None: self.window(datetime(2026, 3, 12))}, {}),
+                now=self.generated_at,
+            )
+        self.assertEqual(forecasts[None].status, "FAILED")
+        self.assertEqual(self.client.get(self.url).status_code, 503)
+
+    def test_failed_run_serves_the_last_good_forecast(self):
+        first_hour = datetime(2026, 3, 12, 0, 0)
+        good = self.refresh(first_hour, self.generated_at, reply=self.worker_reply(26.0, 27.5))[None]
+        self.assertEqual(good.status, "OK")
+
+        payload = self.client.get(self.url).json()
+        self.assertFalse(payload["fallback"])
+        self.assertIsNone(payload["last_error"])
+        self.assertEqual(payload["predictions"], [
+            {"datetime": "2026-03-12T01:00:00", "temperature_2m": 26.0},
+            {"datetime": "2026-03-12T02:00:00", "temperature_2m": 27.5},
+        ])
+
+        # an hour later the window has moved but the worker is down
+        failed = self.refresh(
+            first_hour + timedelta(hours=1),
+            self.generated_at + timedelta(hours=1),
+            error=inference_client.InferenceUnavailable("Weather inference worker unavailable: refused"),
+        )[None]
+        self.assertEqual(failed.status, "FAILED")
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        fallback = response.json()
+        self.assertTrue(fallback["fallback"])
+        self.assertIn("refused", fallback["last_error"])
+        self.assertEqual(fallback["predictions"], payload["predictions"])
+        self.assertEqual(fallback["generated_at"], self.generated_at.isoformat())
+
+        stale_after = timedelta(minutes=settings.WEATHER_FORECAST_STALE_MINUTES)
+        fresh = latest_forecast_payload(WeatherForecast, now=self.generated_at + stale_after)
+        stale = latest_forecast_payload(WeatherForecast, now=self.generated_at + stale_after + timedelta(minutes=1))
+        self.assertFalse(fresh["stale"])
+        self.assertTrue(stale["stale"])
+
+    def test_every_loop_retries_sooner_after_a_failure(self):
+        # the command runs on the clock: observations up to the coming hour
+        hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        fixture = write_observations(
+            os.path.join(tmp.name, "observations.csv"), hour - timedelta(days=10), hour + timedelta(hours=1)
+        )
+
+        # the worker is still warming up on the first run, then answers
+        replies = [
+            inference_client.InferenceUnavailable("Weather inference worker unavailable: refused"),
+            self.worker_reply(26.0, 27.5),
+        ]
+        with override_settings(WEATHER_SOURCE_FIXTURE=fixture), \
+                mock.patch.object(inference_client, "request", side_effect=replies), \
+                mock.patch.object(refresh_weather_forecast.time, "sleep", side_effect=[None, StopLoop]) as sleep, \
+                self.assertRaises(StopLoop):
+            call_command("refresh_weather_forecast", every=60, stdout=io.StringIO(), stderr=io.StringIO())
+
+        (retry,), (regular,) = [call.args for call in sleep.call_args_list]
+        self.assertLessEqual(retry, refresh_weather_forecast.RETRY_SECONDS)
+        self.assertGreater(retry, refresh_weather_forecast.RETRY_SECONDS - 30)
+        self.assertLessEqual(regular, 60 * 60)
+        self.assertGreater(regular, 60 * 60 - 30)
+
+        self.assertEqual(
+            list(WeatherForecast.objects.order_by("id").values_list("status", flat=True)), ["FAILED", "OK"]
+        )
+        self.assertFalse(self.client.get(self.url).json()["fallback"])
+
+
+class WeatherFeatureParityTests(TestCase):
+    """The incremental FeatureStore against batch prepare_input on the same observations."""
+
+    hours = weather_observations.INPUT_HOURS
+
+    def setUp(self):
+        from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+        # 500 hours of noisy observations, some without a wind direction
+        rng = np.random.default_rng(7)
+        n = 500
+        self.times = [datetime(2026, 2, 20) + timedelta(hours=i) for i in range(n)]
+        self.values = {
+            "temperature_2m": 27 + 4 * np.sin(np.arange(n) / 24 * 2 * np.pi) + rng.normal(0, 0.5, n),
+            "wind_speed_10m": rng.gamma(2.0, 2.0, n),
+            "wind_direction_10m": rng.uniform(0, 360, n),
+            "precipitation": rng.exponential(0.5, n) * (rng.random(n) < 0.3),
+            "relative_humidity_2m": rng.uniform(60, 100, n),
+            "pressure_msl": 1006 + rng.normal(0, 3, n),
+            "cloud_cover": rng.uniform(0, 100, n),
+        }
+        self.values = {col: [float(v) for v in series] for col, series in self.values.items()}
+        for i in (30, 200, 410):
+            self.values["wind_direction_10m"][i] = None
+
+        features = np.concatenate([self.batch(end) for end in range(self.hours, n + 1, 24)])
+        self.scalers = [StandardScaler().fit(features), MinMaxScaler().fit(features)]
+
+    def window(self, end, location=None):
+        """Observation window of the `hours` hours before index `end`."""
+        return {
+            "datetime": [at.isoformat() for at in self.times[end - self.hours:end]],
+            **{col: series[end - self.hours:end] for col, series in self.values.items()},
+            "city_count": 1,
+            "location": location,
+        }
+
+    def batch(self, end):
+        X, columns = weather_model.prepare_input(weather_model.window_frame(self.window(end)))
+        self.assertEqual(columns, weather_model.candidate_features)
+        return X[0]
+
+    def test_incremental_matches_batch(self):
+        # hour by hour, a few hours at once, past the window buffer's wrap-around,
+        # then a window that doesn't continue the stored one
+        ends = list(range(self.hours, self.hours + 30)) + list(range(self.hours + 35, 480, 7)) + [300, 500]
+        batches = {end: self.batch(end) for end in ends}
+        for scaler in self.scalers:
+            store = weather_features.FeatureStore(scaler)
+            window = weather_features.FeatureWindow(scaler)
+            appended = 0
+            for end in ends:
+                with self.subTest(scaler=type(scaler).__name__, end=end):
+                    expected = batches[end]
+                    np.testing.assert_allclose(
+                        store.scaled(self.window(end)), scaler.transform(expected), rtol=1e-9, atol=1e-9
+                    )
+
+                    if end < appended:
+                        continue
+                    for i in range(max(appended, end - self.hours), end):
+                        window.append(self.times[i], {col: series[i] for col, series in self.values.items()})
+                    appended = end
+                    np.testing.assert_allclose(window.features(), expected, rtol=1e-9, atol=1e-9)
+                    np.testing.assert_allclose(window.matrix(), scaler.transform(expected), rtol=1e-9, atol=1e-9)
+
+
+class WeatherModelServingTests(TestCase):
+    """The worker's model loading with tiny published versions (4-unit LSTMs, fitted scalers)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.base = Path(tmp.name)
+        settings_override = override_settings(WEATHER_MODEL_DIR=tmp.name, WEATHER_TFLITE_MODEL="")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # whatever the process had loaded comes back after the test
+        for name in ("model", "scaler_X", "scaler_Y", "feature_store", "loaded_dir"):
+            patcher = mock.patch.object(weather_model, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        rng = np.random.default_rng(11)
+        n = weather_observations.INPUT_HOURS
+        self.windows = [
+            {
+                "datetime": [(datetime(2026, 3, 1) + timedelta(hours=i)).isoformat() for i in range(n)],
+                "temperature_2m": list(27 + rng.normal(0, 1, n)),
+                "wind_speed_10m": list(rng.gamma(2.0, 2.0, n)),
+                "wind_direction_10m": list(rng.uniform(0, 360, n)),
+                "precipitation": list(rng.exponential(0.5, n)),
+                "relative_humidity_2m": list(rng.uniform(60, 100, n)),
+                "pressure_msl": list(1006 + rng.normal(0, 3, n)),
+                "cloud_cover": list(rng.uniform(0, 100, n)),
+                "location": location,
+            }
+            for location in (None, 1)
+        ]
+
+    def publish(self, version, seed):
+        import joblib
+        import tensorflow as tf
+        from sklearn.preprocessing import StandardScaler
+
+        version_dir = self.base / weather_model.VERSIONS_DIR / version
+        version_dir.mkdir(parents=True)
+        tf.keras.utils.set_random_seed(seed)
+        model = weather_model.build_model(units=4)
+        model.save(version_dir / weather_model.KERAS_MODEL_FILE)
+
+        rng = np.random.default_rng(seed)
+        features = np.concatenate([
+            weather_model.prepare_input(weather_model.window_frame(window))[0][0] for window in self.windows
+        ])
+        joblib.dump(StandardScaler().fit(features), version_dir / "scaler_X.pkl")
+        joblib.dump(
+            StandardScaler().fit(rng.normal(size=(50, len(weather_model.target_cols)))),
+            version_dir / "scaler_Y.pkl",
+        )
+        return version_dir
+
+    def test_activated_version_is_picked_up(self):
+        first, second = self.publish("v1", seed=1), self.publish("v2", seed=2)
+
+        weather_model.activate_version("v1")
+        before = weather_model.predict_batch(self.windows)
+        self.assertEqual(weather_model.loaded_dir, first)
+        store = weather_model.feature_store
+        np.testing.assert_array_equal(weather_model.predict_batch(self.windows), before)
+
+        # published while the worker runs: the next prediction serves it
+        weather_model.activate_version("v2")
+        after = weather_model.predict_batch(self.windows)
+        self.assertEqual(weather_model.loaded_dir, second)
+        self.assertIsNot(weather_model.feature_store, store)
+        self.assertEqual(after.shape, (2, weather_model.OUTPUT_HOURS, len(weather_model.target_cols)))
+        self.assertFalse(np.allclose(after, before))
+
+        with self.assertRaises(FileNotFoundError):
+            weather_model.activate_version("v3")
+        self.assertEqual(weather_model.model_dir(), second)
+
+    def test_tflite_matches_keras(self):
+        version_dir = self.publish("v1", seed=1)
+        weather_model.activate_version("v1")
+        keras_output = weather_model.predict_batch(self.windows)
+        (version_dir / "model.tflite").write_bytes(
+            weather_model.convert_to_tflite(weather_model.model, mode="float16")
+        )
+
+        with override_settings(WEATHER_TFLITE_MODEL="model.tflite"):
+            weather_model.loaded_dir = None
+            tflite_output = weather_model.predict_batch(self.windows)
+
+        self.assertIsInstance(weather_model.model, weather_model.TFLiteModel)
+        # float16 weights: agreement to a hundredth of the outputs' spread
+        np.testing.assert_allclose(tflite_output, keras_output, atol=0.01 * keras_output.std())
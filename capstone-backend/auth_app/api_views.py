@@ -28,7 +28,6 @@ from .serializers import (UserProfileSerializer,
                           MeUpdateSerializer,
                           GisLayerSerializer,
                           EvacCenterPinSerializer,
-                          HazardPinSerializer,
                           HazardReportAdminUpdateSerializer,
                           NearbyHazardAlertSerializer)
 from evac_app.serializers import EvacuationCenterSerializer
@@ -39,10 +38,12 @@ from .permissions import (
     IsOwnerOrAdmin,
     GisLayerRolePermission
 )
-from analytics_app.services.congestion import compute_congestion_risk, CongestionParams
+from .services.map_overview import build_map_overview
+from .services.nearby_hazards import find_nearby_hazards
 
 EvacuationCenter = apps.get_model("evac_app", "EvacuationCenter")
 EvacuationLog = apps.get_model("evac_app", "EvacuationLog")
+CenterOccupancy = apps.get_model("evac_app", "CenterOccupancy")
 
 class RegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
@@ -345,17 +346,26 @@ class UserViewSet(viewsets.ModelViewSet):
         else:
             queryset = CustomUser.objects.filter(municipality=user.municipality)
 
+        # one grouped query instead of a count per role
+        by_role = (
+            queryset.order_by()
+            .values('role')
+            .annotate(
+                total=models.Count('id'),
+                active=models.Count('id', filter=models.Q(is_active=True)),
+            )
+        )
+
         stats = {
-            'total_users': queryset.count(),
-            'active_users': queryset.filter(is_active=True).count(),
-            'by_role': {
-                'citizen': queryset.filter(role='CITIZEN').count(),
-                'provincial_admin': queryset.filter(role='PROVINCIAL_ADMIN').count(),
-                'municipal_admin': queryset.filter(role='MUNICIPAL_ADMIN').count(),
-                'response_team': queryset.filter(role='RESPONSE_TEAM').count(),
-                'evac_center_staff': queryset.filter(role='EVAC_CENTER_STAFF').count(),
-            },
+            'total_users': 0,
+            'active_users': 0,
+            'by_role': {role.lower(): 0 for role, _ in CustomUser.ROLE_CHOICES},
         }
+        for row in by_role:
+            stats['total_users'] += row['total']
+            stats['active_users'] += row['active']
+            if row['role'].lower() in stats['by_role']:
+                stats['by_role'][row['role'].lower()] += row['total']
         
         # Add municipality breakdown for provincial admin
         if user.role == 'PROVINCIAL_ADMIN':
@@ -441,46 +451,6 @@ class GisLayerViewSet(viewsets.ModelViewSet):
             return Response({"detail": "No GIS layers found."}, status=404)
         return Response(self.get_serializer(layer).data)
 
-def get_center_prediction(center, window=60, horizon=60):
-    result = compute_congestion_risk(
-        center=center,
-        EvacuationLogModel=EvacuationLog,
-        params=CongestionParams(
-            window_minutes=window,
-            horizon_minutes=horizon
-        ),
-    )
-
-    if "error" in result:
-        return {
-            "predicted_congestion_percent": None,
-            "predicted_status": "UNAVAILABLE",
-            "prediction_note": result.get("error"),
-        }
-
-    predicted = (
-        result.get("predicted_congestion_percent")
-        or result.get("predicted_percent")
-        or result.get("risk_percent")
-        or result.get("congestion_percent")
-        or 0
-    )
-
-    predicted = round(float(predicted), 1)
-
-    if predicted >= 90:
-        status = "LIKELY_FULL"
-    elif predicted >= 70:
-        status = "MAY_BECOME_CROWDED"
-    else:
-        status = "LIKELY_AVAILABLE"
-
-    return {
-        "predicted_congestion_percent": predicted,
-        "predicted_status": status,
-        "prediction_window_minutes": horizon,
-    }
-
 class MapOverviewView(APIView):
     """
     GET /api/map/overview/?recent_hours=48&municipality_id=3
@@ -518,30 +488,15 @@ class MapOverviewView(APIView):
             centers_qs = centers_qs.filter(municipality_id=requested_municipality_id)
             hazards_qs = hazards_qs.filter(municipality_id=requested_municipality_id)
 
-        centers_data = EvacuationCenterSerializer(centers_qs, many=True).data
-
-        center_objects = {c.id: c for c in centers_qs}
-
         window = int(request.query_params.get("prediction_window", 60))
         horizon = int(request.query_params.get("prediction_horizon", 60))
 
-        for center_data in centers_data:
-            center_obj = center_objects.get(center_data["id"])
-            if not center_obj:
-                continue
-
-            center_data.update(
-                get_center_prediction(
-                    center_obj,
-                    window=window,
-                    horizon=horizon
-                )
-            )
-
-        return Response({
-            "centers": centers_data,
-            "hazards": HazardPinSerializer(hazards_qs, many=True).data,
-        })
+        return Response(build_map_overview(
+            centers_qs=centers_qs,
+            hazards_qs=hazards_qs,
+            window=window,
+            horizon=horizon,
+        ))
     
 def circle_to_polygon(lng, lat, radius_m=150, points=24):
     """
@@ -584,12 +539,7 @@ def haversine_km(lat1, lng1, lat2, lng2):
 
 
 def get_latest_center_occupancy(center):
-    log = (
-        EvacuationLog.objects
-        .filter(center_id=center.id)
-        .order_by("-date_recorded", "-id")
-        .first()
-    )
+    log = CenterOccupancy.for_center(center)
 
     if not log:
         return {
@@ -737,21 +687,12 @@ class NearbyHazardAlertsView(APIView):
             validated_at__gte=recent_cutoff,
         )
 
-        nearby_hazards = []
-
-        for hazard in hazards:
-            distance = haversine_km(
-                user_lat,
-                user_lng,
-                hazard.latitude,
-                hazard.longitude
-            )
-
-            if distance <= radius_km:
-                hazard.distance_km = distance
-                nearby_hazards.append(hazard)
-
-        nearby_hazards.sort(key=lambda h: h.distance_km)
+        nearby_hazards = find_nearby_hazards(
+            hazards_qs=hazards,
+            lat=user_lat,
+            lng=user_lng,
+            radius_km=radius_km,
+        )
 
         serializer = NearbyHazardAlertSerializer(nearby_hazards, many=True)
         return Response(serializer.data)
@@ -780,12 +721,16 @@ class SuggestNearestAvailableCenterView(APIView):
         # --- FILTER CENTERS ---
         centers = (
             EvacuationCenter.objects
+            .select_related("occupancy")
             .exclude(latitude__isnull=True)
             .exclude(longitude__isnull=True)
             .annotate(total_capacity=F('family_capacity_max') + F('individual_capacity_max'))
             .filter(total_capacity__gt=0)  # 🔥 EXCLUDE 0/0
         )
 
+        # current load against family + individual capacity, from the
+        # occupancy snapshot; deliberately not analytics' CongestionEngine,
+        # whose forecast (individual capacity only) would suggest different centers
         candidates = []
         for c in centers:
             occ = get_latest_center_occupancy(c)
@@ -21,4 +21,103 @@ def haversine_km(lat1, lng1, lat2, lng2):
     )
 
     c = 2 * math.asin(math.sqrt(a))
-    return radius_earth_km * c
\ No newline at end of file
+    return radius_earth_km * c
+
+
+def haversine_km_many(lat, lng, lats, lngs):
+    """haversine_km from one point to arrays of points, vectorized with numpy."""
+    import numpy as np
+
+    radius_earth_km = 6371
+
+    lat1 = math.radians(float(lat))
+    lng1 = math.radians(float(lng))
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    lng2 = np.radians(np.asarray(lngs, dtype=float))
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return radius_earth_km * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    (min_lat, min_lng, max_lat, max_lng) of every point within radius_km,
+    or None where the box would cross a pole or the antimeridian.
+    """
+    angular = radius_km / 6371
+    lat = float(lat)
+    lng = float(lng)
+
+    dlat = math.degrees(angular)
+    if abs(lat) + dlat >= 90:
+        return None
+    # widest longitude reach of the circle, not at its center latitude
+    dlng = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    if abs(lng) + dlng >= 180:
+        return None
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# precision stored on HazardReport.geohash (cells of about 150 m)
+GEOHASH_PRECISION = 7
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat = float(lat)
+    lng = float(lng)
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+
+    chars = []
+    bits = 0
+    bit_count = 0
+    use_lng = True
+    while len(chars) < precision:
+        value, value_range = (lng, lng_range) if use_lng else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+
+        use_lng = not use_lng
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def geohash_cells(min_lat, min_lng, max_lat, max_lng, max_cells=16):
+    """
+    Geohash prefixes of the cells covering a box, at the finest precision
+    (up to GEOHASH_PRECISION) that needs at most max_cells of them; None if
+    even single characters would need more.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        bits = 5 * precision
+        lat_cells = 2 ** (bits // 2)
+        lng_cells = 2 ** (bits - bits // 2)
+        cell_lat = 180.0 / lat_cells
+        cell_lng = 360.0 / lng_cells
+
+        def index(value, offset, size, count):
+            return min(int((value + offset) // size), count - 1)
+
+        rows = range(index(min_lat, 90, cell_lat, lat_cells), index(max_lat, 90, cell_lat, lat_cells) + 1)
+        cols = range(index(min_lng, 180, cell_lng, lng_cells), index(max_lng, 180, cell_lng, lng_cells) + 1)
+        if len(rows) * len(cols) <= max_cells:
+            # encode each cell's center
+            return sorted(
+                geohash_encode(-90 + (row + 0.5) * cell_lat, -180 + (col + 0.5) * cell_lng, precision)
+                for row in rows
+                for col in cols
+            )
+    return None
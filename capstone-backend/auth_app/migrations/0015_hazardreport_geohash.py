@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:11
+
+from django.db import migrations, models
+
+from auth_app.hazards.utils import geohash_encode
+
+
+def backfill_geohash(apps, schema_editor):
+    HazardReport = apps.get_model('auth_app', 'HazardReport')
+
+    reports = list(HazardReport.objects.only('id', 'latitude', 'longitude'))
+    for report in reports:
+        report.geohash = geohash_encode(report.latitude, report.longitude)
+    HazardReport.objects.bulk_update(reports, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0014_merge_20260224_0546'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hazardreport',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
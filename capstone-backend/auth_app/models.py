@@ -4,6 +4,7 @@ from django.contrib.auth.models import (
 from django.db import models
 from django.utils import timezone
 from django.conf import settings
+from .hazards.utils import geohash_encode
 
 class Municipality(models.Model):
     name = models.CharField(max_length=150)
@@ -196,6 +197,8 @@ class HazardReport(models.Model):
     address = models.CharField(max_length=255, default="")
     latitude = models.DecimalField(max_digits=10, decimal_places=7)
     longitude = models.DecimalField(max_digits=10, decimal_places=7)
+    # filled on save; indexed so nearby lookups can prefix-match the cells around a point
+    geohash = models.CharField(max_length=12, blank=True, default="", db_index=True)
 
     # --- contact info ---
     contact_name = models.CharField(max_length=100, default="")
@@ -209,6 +212,14 @@ class HazardReport(models.Model):
 
     def __str__(self):
         return f"{self.hazard_type} - {self.title}"
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        return super().save(*args, **kwargs)
     
 class HazardPhoto(models.Model):
     hazard = models.ForeignKey(HazardReport, related_name='photos', on_delete=models.CASCADE)
@@ -0,0 +1,50 @@
+# auth_app/services/map_overview.py
+from django.apps import apps
+
+from evac_app.serializers import EvacuationCenterSerializer
+from analytics_app.services.congestion import CongestionParams
+from analytics_app.services.congestion_engine import CongestionEngine
+from auth_app.serializers import HazardPinSerializer
+
+
+def prediction_from_risk(risk, horizon):
+    """Map pin prediction fields derived from a congestion risk payload."""
+    predicted = round(float(risk.get("predicted_occupancy") or 0) * 100, 1)
+
+    if predicted >= 90:
+        status = "LIKELY_FULL"
+    elif predicted >= 70:
+        status = "MAY_BECOME_CROWDED"
+    else:
+        status = "LIKELY_AVAILABLE"
+
+    return {
+        "predicted_congestion_percent": predicted,
+        "predicted_status": status,
+        "prediction_window_minutes": horizon,
+    }
+
+
+def build_map_overview(*, centers_qs, hazards_qs, window=60, horizon=60):
+    """
+    Center pins (with occupancy and predictions) and hazard pins for the map.
+
+    Runs a fixed number of queries regardless of how many centers are in
+    scope: centers joined to their occupancy snapshot, one grouped window
+    sum for the predictions, and the hazards.
+    """
+    EvacuationLog = apps.get_model("evac_app", "EvacuationLog")
+
+    centers = list(centers_qs.select_related("municipality", "barangay", "occupancy"))
+    centers_data = EvacuationCenterSerializer(centers, many=True).data
+
+    engine = CongestionEngine.from_centers(centers, EvacuationLog, windows=[window])
+    risks = engine.results(CongestionParams(window_minutes=window, horizon_minutes=horizon))
+
+    for center_data, risk in zip(centers_data, risks):
+        center_data.update(prediction_from_risk(risk, horizon))
+
+    return {
+        "centers": centers_data,
+        "hazards": HazardPinSerializer(hazards_qs.select_related("municipality"), many=True).data,
+    }
@@ -0,0 +1,47 @@
+# auth_app/services/nearby_hazards.py
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from auth_app.hazards.utils import bounding_box, geohash_cells, haversine_km_many
+
+
+def find_nearby_hazards(*, hazards_qs, lat, lng, radius_km):
+    """
+    Hazards of hazards_qs within radius_km of (lat, lng), nearest first,
+    each with a distance_km attribute.
+
+    The database narrows the rows to the geohash cells around the point
+    (indexed prefix matches) and its lat/lng bounding box; only those few
+    rows get the exact distance check.
+    """
+    box = bounding_box(lat, lng, radius_km)
+    if box is not None:
+        min_lat, min_lng, max_lat, max_lng = box
+        hazards_qs = hazards_qs.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng),
+        )
+        cells = geohash_cells(min_lat, min_lng, max_lat, max_lng)
+        if cells:
+            hazards_qs = hazards_qs.filter(reduce(or_, (Q(geohash__startswith=cell) for cell in cells)))
+
+    hazards = list(hazards_qs)
+    if not hazards:
+        return []
+
+    distances = haversine_km_many(
+        lat, lng,
+        [hazard.latitude for hazard in hazards],
+        [hazard.longitude for hazard in hazards],
+    )
+
+    nearby = []
+    for hazard, distance in zip(hazards, distances.tolist()):
+        if distance <= radius_km:
+            hazard.distance_km = distance
+            nearby.append(hazard)
+
+    nearby.sort(key=lambda h: h.distance_km)
+    return nearby
@@ -1,3 +1,139 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from auth_app.hazards.utils import geohash_encode, haversine_km
+from auth_app.models import CustomUser, Municipality, Barangay, HazardReport
+from evac_app.models import EvacuationCenter, EvacuationLog, CenterOccupancy
+
+
+class MapOverviewQueryCountTests(TestCase):
+    CENTER_COUNT = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.municipality = Municipality.objects.create(name="Calapan City")
+        barangay = Barangay.objects.create(name="Lalud", municipality=cls.municipality)
+        cls.user = CustomUser.objects.create_user(
+            email="admin@example.com",
+            password="pass",
+            first_name="Prov",
+            last_name="Admin",
+            role="PROVINCIAL_ADMIN",
+        )
+
+        EvacuationCenter.objects.bulk_create([
+            EvacuationCenter(
+                name=f"Center {i}",
+                municipality=cls.municipality,
+                barangay=barangay,
+                individual_capacity_max=100,
+                family_capacity_max=20,
+                latitude=13.4 + i / 10000,
+                longitude=121.1 + i / 10000,
+            )
+            for i in range(cls.CENTER_COUNT)
+        ])
+        centers = list(EvacuationCenter.objects.order_by("id"))
+
+        now = timezone.now()
+        EvacuationLog.objects.bulk_create([
+            EvacuationLog(
+                center=center,
+                date_recorded=now - timedelta(minutes=10),
+                individuals_in=40,
+                families_in=8,
+                total_current=40,
+                total_current_families=8,
+            )
+            for center in centers
+        ])
+        logs = {log.center_id: log for log in EvacuationLog.objects.all()}
+
+        CenterOccupancy.objects.bulk_create([
+            CenterOccupancy(center=center, **CenterOccupancy.snapshot_from_log(logs[center.id]))
+            for center in centers
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_overview_query_count_is_constant(self):
+        # centers + occupancy join, grouped window sums, hazards
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/map/overview/")
+
+        self.assertEqual(response.status_code, 200)
+        centers = response.json()["centers"]
+        self.assertEqual(len(centers), self.CENTER_COUNT)
+
+        first = centers[0]
+        self.assertEqual(first["current_total"], 40)
+        self.assertEqual(first["current_families"], 8)
+        # 40 now + 40/60 per minute over the next 60 minutes = 80 of 100
+        self.assertEqual(first["predicted_congestion_percent"], 80.0)
+        self.assertEqual(first["predicted_status"], "MAY_BECOME_CROWDED")
+
+
+class NearbyHazardAlertsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        municipality = Municipality.objects.create(name="Calapan City")
+        cls.user = CustomUser.objects.create_user(
+            email="citizen@example.com",
+            password="pass",
+            first_name="Juan",
+            last_name="Cruz",
+        )
+
+        now = timezone.now()
+        cls.hazards = {}
+        # (lat, lng) of the user is 13.4100, 121.1800
+        for name, lat, lng, status, validated_at in [
+            ("near", 13.4110, 121.1810, "APPROVED", now),
+            ("closer", 13.4101, 121.1801, "APPROVED", now),
+            ("edge", 13.4350, 121.1800, "APPROVED", now),  # ~2.8 km north
+            ("far", 13.5000, 121.1800, "APPROVED", now),  # ~10 km north
+            ("pending", 13.4100, 121.1800, "PENDING", now),
+            ("stale", 13.4100, 121.1800, "APPROVED", now - timedelta(days=3)),
+        ]:
+            cls.hazards[name] = HazardReport.objects.create(
+                reporter=cls.user,
+                user=cls.user,
+                municipality=municipality,
+                hazard_type="FLOOD",
+                description=name,
+                latitude=lat,
+                longitude=lng,
+                status=status,
+                validated_at=validated_at,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_geohash_is_filled_on_save(self):
+        hazard = self.hazards["near"]
+        self.assertEqual(hazard.geohash, geohash_encode(13.4110, 121.1810))
+
+        hazard.latitude = 13.5
+        hazard.save(update_fields=["latitude"])
+        hazard.refresh_from_db()
+        self.assertEqual(hazard.geohash, geohash_encode(13.5, 121.1810))
+
+    def test_only_recent_approved_hazards_within_radius_nearest_first(self):
+        response = self.client.get(
+            "/api/user/nearby-hazard-alerts/",
+            {"lat": 13.41, "lng": 121.18, "radius_km": 3},
+        )
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([row["description"] for row in results], ["closer", "near", "edge"])
+        for row in results:
+            expected = haversine_km(13.41, 121.18, row["latitude"], row["longitude"])
+            self.assertAlmostEqual(row["distance_km"], round(expected, 2), places=2)
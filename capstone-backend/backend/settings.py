@@ -115,6 +115,47 @@ else:
     }
 
 
+# Shared by all gunicorn workers: Redis when REDIS_URL is set, otherwise a
+# table in the main database (created by `manage.py createcachetable`).
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        }
+    }
+
+# Affected-population report cache (analytics_app.services.report_cache)
+REPORT_CACHE_SECONDS = int(os.getenv("REPORT_CACHE_SECONDS", 600))
+REPORT_CACHE_LIVE_BUCKET_SECONDS = int(os.getenv("REPORT_CACHE_LIVE_BUCKET_SECONDS", 30))
+DASHBOARD_SUMMARY_CACHE_SECONDS = int(os.getenv("DASHBOARD_SUMMARY_CACHE_SECONDS", 15))
+
+# Weather model, served by manage.py run_weather_inference
+WEATHER_MODEL_DIR = os.getenv("WEATHER_MODEL_DIR", "./models_kaggle_only/")
+# converted model in WEATHER_MODEL_DIR (manage.py quantize_weather_model); empty = the Keras .h5
+WEATHER_TFLITE_MODEL = os.getenv("WEATHER_TFLITE_MODEL", "")
+# where the worker process listens and web/clock connect; with the Procfile's
+# separate process types, set it to the worker's private host:port
+WEATHER_INFERENCE_ADDRESS = os.getenv("WEATHER_INFERENCE_ADDRESS", "127.0.0.1:8765")
+WEATHER_INFERENCE_TIMEOUT = float(os.getenv("WEATHER_INFERENCE_TIMEOUT", 30))
+
+# Observation source for WeatherData: open-meteo by default, a stand-in server
+# speaking its API (WEATHER_SOURCE_URL) or a local fixture file for offline runs
+WEATHER_SOURCE_URL = os.getenv("WEATHER_SOURCE_URL", "")
+WEATHER_SOURCE_FIXTURE = os.getenv("WEATHER_SOURCE_FIXTURE", "")
+WEATHER_FORECAST_STALE_MINUTES = int(os.getenv("WEATHER_FORECAST_STALE_MINUTES", 120))
+WEATHER_FORECAST_KEEP = int(os.getenv("WEATHER_FORECAST_KEEP", 48))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -159,6 +200,9 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Archived disaster-event logs (see archive_disaster_events)
+EVENT_ARCHIVE_DIR = Path(os.getenv("EVENT_ARCHIVE_DIR", BASE_DIR / "archives" / "events"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,4 +1,5 @@
 import re
+import json
 from rest_framework import viewsets, status, permissions
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import APIView
@@ -8,8 +9,8 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from django.db.models import Sum, Max
-from .models import EvacuationCenter, EvacuationLog
+from .models import EvacuationCenter, EvacuationLog, EvacuationFlowRollup, CenterOccupancy
+from .services import rollups
 from .serializers import EvacuationCenterSerializer, EvacuationLogSerializer, EvacuationCenterListSerializer
 from .utils.csv_helpers import read_csv_rows, read_xlsx_rows, dms_to_decimal
 from django.db import transaction
@@ -51,7 +52,7 @@ class EvacuationCenterViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         qs = EvacuationCenter.objects.select_related(
-            "municipality", "barangay"
+            "municipality", "barangay", "occupancy"
         ).all().order_by("-created_at")
 
         if user.role == "MUNICIPAL_ADMIN":
@@ -318,22 +319,110 @@ class EvacUploadAPIView(APIView):
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from .models import EvacuationLog
-from .serializers import EvacuationLogSerializer
+from .serializers import EvacuationLogSerializer, EvacuationLogBulkItemSerializer
+from .services.bulk_ingest import ingest_center_logs
+from .services import log_export
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class EvacuationLogCursorPagination(CursorPagination):
+    """
+    Keyset pagination: each page seeks from the last row's date_recorded
+    instead of an OFFSET, so deep pages cost the same as the first one.
+    Responses carry next/previous links but no total count.
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("-date_recorded", "-id")
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Lets ?format=csv|ndjson|parquet through DRF's content negotiation. The
+    export action streams its own response; only errors are rendered here.
+    """
+    media_type = "application/octet-stream"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode("utf-8")
+
+
+class CSVExportRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONExportRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class ParquetExportRenderer(ExportRenderer):
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """An unknown ?format= reaches the export action (and its 400) as JSON instead of DRF's 404."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except Http404:
+            return renderers[0], renderers[0].media_type
+
+
+def _parse_day(raw, name):
+    """YYYY-MM-DD query param -> date, None if it isn't a bare date."""
+    try:
+        return parse_date(raw)
+    except ValueError:
+        # well formed but impossible, e.g. 2025-02-30
+        raise ValidationError({name: "Not a valid date."})
+
+
+def _parse_bound(raw, name, end_of_day=False):
+    """date or datetime query param -> naive datetime; a bare date_to covers the whole day."""
+    day = _parse_day(raw, name)
+    if day is not None:
+        value = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    else:
+        try:
+            value = parse_datetime(raw)
+        except ValueError:
+            raise ValidationError({name: "Not a valid datetime."})
+        if value is None:
+            raise ValidationError({name: "Use YYYY-MM-DD or an ISO datetime."})
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.get_current_timezone())
+    return value
 
 
 class EvacuationLogViewSet(viewsets.ModelViewSet):
     serializer_class = EvacuationLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EvacuationLogCursorPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ["center"]
+    filterset_fields = ["center", "event"]
     search_fields = ["remarks", "center__name"]
     ordering_fields = ["date_recorded", "id"]
     ordering = ["-date_recorded", "-id"]
 
     def get_queryset(self):
         user = self.request.user
-        qs = EvacuationLog.objects.select_related("center", "reporting_staff").all()
+        qs = EvacuationLog.objects.select_related("center", "reporting_staff", "event").all()
 
         if user.role == "EVAC_CENTER_STAFF":
             if not user.assigned_center_id:
@@ -347,10 +436,27 @@ class EvacuationLogViewSet(viewsets.ModelViewSet):
 
         return qs
 
-    def perform_create(self, serializer):
-        user = self.request.user
-        center = serializer.validated_data.get("center")
+    def filter_queryset(self, queryset):
+        """?date_from= / ?date_to= on date_recorded; date_to is inclusive."""
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
 
+        if params.get("date_from"):
+            queryset = queryset.filter(date_recorded__gte=_parse_bound(params["date_from"], "date_from"))
+
+        if params.get("date_to"):
+            raw = params["date_to"]
+            if _parse_day(raw, "date_to") is not None:
+                queryset = queryset.filter(date_recorded__lt=_parse_bound(raw, "date_to", end_of_day=True))
+            else:
+                queryset = queryset.filter(date_recorded__lte=_parse_bound(raw, "date_to"))
+
+        return queryset
+
+    BULK_MAX_ITEMS = 500
+    EXPORT_BATCH_SIZE = 2000
+
+    def _check_can_log_for(self, user, center):
         if user.role == "EVAC_CENTER_STAFF":
             if not user.assigned_center_id:
                 raise PermissionDenied("Staff has no assigned center.")
@@ -361,8 +467,133 @@ class EvacuationLogViewSet(viewsets.ModelViewSet):
             if center.municipality_id != user.municipality_id:
                 raise PermissionDenied("You can only log for centers in your municipality.")
 
+    def perform_create(self, serializer):
+        user = self.request.user
+        center = serializer.validated_data.get("center")
+
+        self._check_can_log_for(user, center)
+
         serializer.save(reporting_staff=user)
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        POST /api/evac_centers/evacuation-logs/bulk/
+        Body: {"logs": [{...log fields..., "client_key": "<uuid>"}, ...]}
+
+        Entries are validated like single logs and stored per center in one
+        transaction. Entries whose client_key was already stored come back
+        as "duplicate", so a device can safely resubmit a whole batch.
+        """
+        user = request.user
+        items = request.data.get("logs") if isinstance(request.data, dict) else request.data
+
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "logs must be a non-empty list."}, status=400)
+        if len(items) > self.BULK_MAX_ITEMS:
+            return Response({"detail": f"At most {self.BULK_MAX_ITEMS} logs per request."}, status=400)
+
+        center_ids = set()
+        for item in items:
+            try:
+                center_ids.add(int(item.get("center")))
+            except (AttributeError, TypeError, ValueError):
+                continue
+        centers = EvacuationCenter.objects.in_bulk(list(center_ids))
+
+        results = [None] * len(items)
+        by_center = defaultdict(list)
+        seen_keys = set()
+
+        for index, item in enumerate(items):
+            serializer = EvacuationLogBulkItemSerializer(data=item, context={"centers": centers})
+            if not serializer.is_valid():
+                results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+                continue
+
+            data = serializer.validated_data
+            center = data.pop("center")
+            try:
+                self._check_can_log_for(user, center)
+            except PermissionDenied as exc:
+                results[index] = {"index": index, "status": "error", "errors": {"detail": str(exc.detail)}}
+                continue
+
+            key = data.get("client_key")
+            if key:
+                if key in seen_keys:
+                    results[index] = {"index": index, "status": "error",
+                                      "errors": {"client_key": "Repeated within this batch."}}
+                    continue
+                seen_keys.add(key)
+
+            by_center[center.id].append((index, data))
+
+        for center_id in sorted(by_center):
+            entries = by_center[center_id]
+            try:
+                outcome = ingest_center_logs(
+                    center=centers[center_id],
+                    entries=entries,
+                    reporting_staff=user,
+                )
+            except IntegrityError:
+                # e.g. a client_key stored concurrently under another center
+                outcome = {
+                    index: {"status": "error", "errors": {"detail": "Could not store this center's logs."}}
+                    for index, _ in entries
+                }
+
+            for index, data in entries:
+                results[index] = {"index": index, "client_key": data.get("client_key"), **outcome[index]}
+
+        counts = defaultdict(int)
+        for result in results:
+            counts[result["status"]] += 1
+
+        return Response({
+            "created": counts["created"],
+            "duplicates": counts["duplicate"],
+            "errors": counts["error"],
+            "results": results,
+        })
+
+    @action(
+        detail=False,
+        methods=["get"],
+        renderer_classes=[JSONRenderer, CSVExportRenderer, NDJSONExportRenderer, ParquetExportRenderer],
+        content_negotiation_class=ExportContentNegotiation,
+    )
+    def export(self, request):
+        """
+        GET /evacuation-logs/export/?format=csv|ndjson|parquet
+        Streams every log in the caller's scope, with the same center / event /
+        search / date_from / date_to filters as the list, oldest first.
+        """
+        fmt = request.query_params.get("format", "csv")
+        if fmt not in log_export.FORMATS:
+            return Response({"detail": "format must be csv, ndjson or parquet."}, status=400)
+
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return Response({"detail": "Parquet export needs pyarrow installed."}, status=501)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        batches = log_export.iter_batches(queryset, batch_size=self.EXPORT_BATCH_SIZE)
+        stream = {
+            "csv": log_export.stream_csv,
+            "ndjson": log_export.stream_ndjson,
+            "parquet": log_export.stream_parquet,
+        }[fmt](batches)
+
+        content_type, extension = log_export.FORMATS[fmt]
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+        response["Content-Disposition"] = f'attachment; filename="evacuation-logs-{stamp}.{extension}"'
+        return response
+
     @action(detail=False, methods=["get"])
     def latest_by_center(self, request):
         center_id = request.query_params.get("center")
@@ -373,13 +604,9 @@ class EvacuationLogViewSet(viewsets.ModelViewSet):
         if not allowed_logs.exists():
             return Response({"detail": "Not found."}, status=404)
 
-        agg = allowed_logs.aggregate(
-            ind_in=Sum("individuals_in"),
-            ind_out=Sum("individuals_out"),
-            last=Max("date_recorded"),
-        )
+        agg = self._history_totals(center_id)
 
-        total_current = (agg["ind_in"] or 0) - (agg["ind_out"] or 0)
+        total_current = agg["individuals_in"] - agg["individuals_out"]
         if total_current < 0:
             total_current = 0
 
@@ -389,6 +616,17 @@ class EvacuationLogViewSet(viewsets.ModelViewSet):
             "date_recorded": agg["last"],
         })
 
+    def _history_totals(self, center_id):
+        """All-time flow sums of a center from its daily rollups, plus its latest log time."""
+        agg = rollups.history_totals(EvacuationFlowRollup, center_id)
+        agg["last"] = (
+            CenterOccupancy.objects
+            .filter(center_id=center_id)
+            .values_list("date_recorded", flat=True)
+            .first()
+        )
+        return agg
+
     @action(detail=False, methods=["get"])
     def staff_summary(self, request):
         user = request.user
@@ -406,18 +644,9 @@ class EvacuationLogViewSet(viewsets.ModelViewSet):
         if not allowed_logs.exists():
             return Response({"detail": "Not found."}, status=404)
 
-        agg = allowed_logs.aggregate(
-            ind_in=Sum("individuals_in"),
-            ind_out=Sum("individuals_out"),
-            children=Sum("children_count"),
-            seniors=Sum("senior_count"),
-            pwd=Sum("pwd_count"),
-            pregnant=Sum("pregnant_count"),
-            lactating=Sum("lactating_count"),
-            last=Max("date_recorded"),
-        )
+        agg = self._history_totals(center_id)
 
-        total_current = (agg["ind_in"] or 0) - (agg["ind_out"] or 0)
+        total_current = agg["individuals_in"] - agg["individuals_out"]
         if total_current < 0:
             total_current = 0
 
@@ -428,11 +657,11 @@ class EvacuationLogViewSet(viewsets.ModelViewSet):
                 "total_current": total_current,
             },
             "breakdown": {
-                "children_count": agg["children"] or 0,
-                "senior_count": agg["seniors"] or 0,
-                "pwd_count": agg["pwd"] or 0,
-                "pregnant_count": agg["pregnant"] or 0,
-                "lactating_count": agg["lactating"] or 0,
+                "children_count": agg["children_count"],
+                "senior_count": agg["senior_count"],
+                "pwd_count": agg["pwd_count"],
+                "pregnant_count": agg["pregnant_count"],
+                "lactating_count": agg["lactating_count"],
             },
             "total_current": total_current,
         })    
@@ -461,3 +690,77 @@ class EvacuationCenterListViewSet(viewsets.ReadOnlyModelViewSet):
 
         return qs
 
+
+from django.db.models import Q
+from auth_app.permissions import IsMunicipalAdminOrHigher
+from .models import DisasterEvent
+from .serializers import DisasterEventSerializer
+
+
+class DisasterEventViewSet(viewsets.ModelViewSet):
+    """
+    Disaster events that evacuation logs are recorded under.
+    Anyone signed in can read; admins manage events of their scope.
+
+    POST /disaster-events/{id}/close/ ends an active event.
+    """
+    serializer_class = DisasterEventSerializer
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ["status", "event_type", "municipality"]
+    search_fields = ["name"]
+    ordering_fields = ["started_at", "id"]
+    ordering = ["-started_at", "-id"]
+
+    def get_permissions(self):
+        if self.action in ["list", "retrieve"]:
+            return [permissions.IsAuthenticated()]
+        return [IsMunicipalAdminOrHigher()]
+
+    def get_queryset(self):
+        user = self.request.user
+        qs = DisasterEvent.objects.select_related("municipality").all()
+
+        if user.role == "PROVINCIAL_ADMIN":
+            return qs
+
+        municipality_id = user.municipality_id
+        if user.role == "EVAC_CENTER_STAFF" and user.assigned_center_id:
+            municipality_id = user.assigned_center.municipality_id
+        return qs.filter(Q(municipality__isnull=True) | Q(municipality_id=municipality_id))
+
+    def _check_can_manage(self, user, municipality_id):
+        if user.role == "MUNICIPAL_ADMIN" and (
+            not user.municipality_id or municipality_id != user.municipality_id
+        ):
+            raise PermissionDenied("You can only manage events in your municipality.")
+
+    def perform_create(self, serializer):
+        municipality = serializer.validated_data.get("municipality")
+        self._check_can_manage(self.request.user, getattr(municipality, "id", None))
+        serializer.save(created_by=self.request.user)
+
+    def perform_update(self, serializer):
+        self._check_can_manage(self.request.user, serializer.instance.municipality_id)
+        if "municipality" in serializer.validated_data:
+            municipality = serializer.validated_data["municipality"]
+            self._check_can_manage(self.request.user, getattr(municipality, "id", None))
+        if serializer.instance.status == "ARCHIVED":
+            raise PermissionDenied("Archived events are read-only.")
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        self._check_can_manage(self.request.user, instance.municipality_id)
+        instance.delete()
+
+    @action(detail=True, methods=["post"])
+    def close(self, request, pk=None):
+        event = self.get_object()
+        self._check_can_manage(request.user, event.municipality_id)
+
+        if event.status != "ACTIVE":
+            return Response({"detail": f"Event is already {event.status.lower()}."}, status=400)
+
+        event.status = "CLOSED"
+        event.ended_at = event.ended_at or timezone.now()
+        event.save(update_fields=["status", "ended_at", "updated_at"])
+        return Response(self.get_serializer(event).data)
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from evac_app.models import DisasterEvent
+from evac_app.services.event_archive import archive_event
+
+
+class Command(BaseCommand):
+    help = "Archive the logs of closed disaster events into per-event gzip files and drop them from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--event", type=int, action="append", dest="events",
+                            help="Only archive this event id (repeatable)")
+        parser.add_argument("--closed-days", type=int, default=30,
+                            help="Only archive events that ended at least this many days ago (default 30)")
+        parser.add_argument("--dir", default=None,
+                            help="Archive directory (default settings.EVENT_ARCHIVE_DIR)")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        archive_dir = options["dir"] or settings.EVENT_ARCHIVE_DIR
+
+        events = DisasterEvent.objects.filter(status="CLOSED").order_by("ended_at", "id")
+        if options.get("events"):
+            events = events.filter(id__in=options["events"])
+        else:
+            cutoff = timezone.now() - timedelta(days=max(0, options["closed_days"]))
+            events = events.filter(ended_at__lte=cutoff)
+
+        events = list(events)
+        if not events:
+            self.stdout.write("No closed events to archive.")
+            return
+
+        total = 0
+        for event in events:
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive {event} ({event.logs.count()} logs).")
+                continue
+
+            try:
+                count = archive_event(event, archive_dir)
+            except (ValueError, RuntimeError) as e:
+                raise CommandError(str(e))
+
+            total += count
+            self.stdout.write(f"Archived {event}: {count} logs -> {event.archive_file}")
+
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {len(events)} events ({total} logs) to {archive_dir}."
+            ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from evac_app.models import EvacuationCenter, EvacuationLog, CenterOccupancy
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CenterOccupancy snapshot of every evacuation center from its latest log"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+
+        latest_log_id = (
+            EvacuationLog.objects
+            .filter(center_id=OuterRef("pk"))
+            .order_by("-date_recorded", "-id")
+            .values("id")[:1]
+        )
+        pairs = list(
+            EvacuationCenter.objects
+            .annotate(latest_log_id=Subquery(latest_log_id))
+            .values_list("id", "latest_log_id")
+        )
+
+        rows = []
+        for start in range(0, len(pairs), batch_size):
+            chunk = pairs[start:start + batch_size]
+            logs = EvacuationLog.objects.in_bulk([log_id for _, log_id in chunk if log_id])
+
+            for center_id, log_id in chunk:
+                rows.append(CenterOccupancy(
+                    center_id=center_id,
+                    **CenterOccupancy.snapshot_from_log(logs.get(log_id)),
+                ))
+
+        with transaction.atomic():
+            CenterOccupancy.objects.all().delete()
+            CenterOccupancy.objects.bulk_create(rows, batch_size=batch_size)
+
+        with_logs = sum(1 for _, log_id in pairs if log_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled occupancy for {len(rows)} centers ({with_logs} with logs)."
+        ))
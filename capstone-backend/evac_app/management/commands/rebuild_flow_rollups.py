@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from evac_app.models import EvacuationCenter, EvacuationLog, EvacuationFlowRollup
+from evac_app.services import ledger, rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly/daily flow rollups of evacuation logs from the raw logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--center", type=int, action="append", dest="centers",
+                            help="Only rebuild this center id (repeatable)")
+
+    def handle(self, *args, **options):
+        center_ids = options.get("centers") or list(
+            EvacuationCenter.objects.values_list("id", flat=True)
+        )
+
+        buckets = 0
+        for center_id in center_ids:
+            with transaction.atomic():
+                ledger.lock_centers(EvacuationCenter, [center_id])
+                buckets += rollups.rebuild(
+                    EvacuationLogModel=EvacuationLog,
+                    RollupModel=EvacuationFlowRollup,
+                    center_ids=[center_id],
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt flow rollups for {len(center_ids)} centers ({buckets} buckets)."
+        ))
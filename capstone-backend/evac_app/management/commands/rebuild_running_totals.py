@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from evac_app.models import EvacuationCenter, EvacuationLog, CenterOccupancy
+from evac_app.services import ledger, data_version
+
+
+class Command(BaseCommand):
+    help = "Replay the running totals of evacuation logs, per center, and refresh occupancy snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--center", type=int, action="append", dest="centers",
+                            help="Only rebuild this center id (repeatable)")
+
+    def handle(self, *args, **options):
+        center_ids = options.get("centers") or list(
+            EvacuationLog.objects.order_by().values_list("center_id", flat=True).distinct()
+        )
+
+        rewritten = 0
+        for center_id in center_ids:
+            with transaction.atomic():
+                ledger.lock_centers(EvacuationCenter, [center_id])
+                rewritten += ledger.recompute_running_totals(
+                    EvacuationLogModel=EvacuationLog,
+                    center_id=center_id,
+                )
+                CenterOccupancy.refresh_for_center(center_id)
+                data_version.bump_centers(EvacuationCenter, [center_id])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt running totals for {len(center_ids)} centers ({rewritten} logs corrected)."
+        ))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from evac_app.models import DisasterEvent
+from evac_app.services.event_archive import restore_event
+
+
+class Command(BaseCommand):
+    help = "Reload the logs of an archived disaster event from its archive file for review"
+
+    def add_arguments(self, parser):
+        parser.add_argument("event_id", type=int)
+        parser.add_argument("--dir", default=None,
+                            help="Archive directory (default settings.EVENT_ARCHIVE_DIR)")
+
+    def handle(self, *args, **options):
+        event = DisasterEvent.objects.filter(id=options["event_id"]).first()
+        if event is None:
+            raise CommandError(f"Event {options['event_id']} does not exist.")
+
+        try:
+            count = restore_event(event, options["dir"] or settings.EVENT_ARCHIVE_DIR)
+        except (ValueError, OSError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"Restored {count} logs of {event}."))
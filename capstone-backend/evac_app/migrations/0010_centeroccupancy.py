@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SNAPSHOT_FIELDS = [
+    "date_recorded",
+    "total_current",
+    "total_current_families",
+    "children_count",
+    "senior_count",
+    "pwd_count",
+    "pregnant_count",
+    "lactating_count",
+    "vulnerable_individuals",
+]
+
+
+def backfill_occupancy(apps, schema_editor):
+    EvacuationCenter = apps.get_model("evac_app", "EvacuationCenter")
+    EvacuationLog = apps.get_model("evac_app", "EvacuationLog")
+    CenterOccupancy = apps.get_model("evac_app", "CenterOccupancy")
+
+    rows = []
+    for center_id in EvacuationCenter.objects.values_list("id", flat=True):
+        log = (
+            EvacuationLog.objects
+            .filter(center_id=center_id)
+            .order_by("-date_recorded", "-id")
+            .first()
+        )
+        snapshot = {f: getattr(log, f) for f in SNAPSHOT_FIELDS} if log else {}
+        rows.append(CenterOccupancy(center_id=center_id, latest_log=log, **snapshot))
+
+    CenterOccupancy.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evac_app', '0009_evacuationcenter_shelter_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CenterOccupancy',
+            fields=[
+                ('center', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='evac_app.evacuationcenter')),
+                ('date_recorded', models.DateTimeField(blank=True, null=True)),
+                ('total_current', models.IntegerField(default=0)),
+                ('total_current_families', models.IntegerField(default=0)),
+                ('children_count', models.IntegerField(default=0)),
+                ('senior_count', models.IntegerField(default=0)),
+                ('pwd_count', models.IntegerField(default=0)),
+                ('pregnant_count', models.IntegerField(default=0)),
+                ('lactating_count', models.IntegerField(default=0)),
+                ('vulnerable_individuals', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('latest_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='evac_app.evacuationlog')),
+            ],
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
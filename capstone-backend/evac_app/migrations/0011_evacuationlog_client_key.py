@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evac_app', '0010_centeroccupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evacuationlog',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
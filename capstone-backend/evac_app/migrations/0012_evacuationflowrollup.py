@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+
+FLOW_FIELDS = [
+    "individuals_in",
+    "individuals_out",
+    "families_in",
+    "families_out",
+    "children_count",
+    "senior_count",
+    "pwd_count",
+    "pregnant_count",
+    "lactating_count",
+]
+
+
+def backfill_rollups(apps, schema_editor):
+    EvacuationLog = apps.get_model("evac_app", "EvacuationLog")
+    EvacuationFlowRollup = apps.get_model("evac_app", "EvacuationFlowRollup")
+
+    rows = []
+    for granularity, trunc in (("HOUR", TruncHour), ("DAY", TruncDay)):
+        grouped = (
+            EvacuationLog.objects
+            .order_by()
+            .annotate(bucket=trunc("date_recorded"))
+            .values("center_id", "bucket")
+            .annotate(log_count=Count("id"), **{f"sum_{f}": Sum(f) for f in FLOW_FIELDS})
+        )
+        for row in grouped:
+            rows.append(EvacuationFlowRollup(
+                center_id=row["center_id"],
+                granularity=granularity,
+                bucket_start=row["bucket"],
+                log_count=row["log_count"],
+                **{f: row[f"sum_{f}"] or 0 for f in FLOW_FIELDS},
+            ))
+
+    EvacuationFlowRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evac_app', '0011_evacuationlog_client_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvacuationFlowRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('log_count', models.IntegerField(default=0)),
+                ('individuals_in', models.IntegerField(default=0)),
+                ('individuals_out', models.IntegerField(default=0)),
+                ('families_in', models.IntegerField(default=0)),
+                ('families_out', models.IntegerField(default=0)),
+                ('children_count', models.IntegerField(default=0)),
+                ('senior_count', models.IntegerField(default=0)),
+                ('pwd_count', models.IntegerField(default=0)),
+                ('pregnant_count', models.IntegerField(default=0)),
+                ('lactating_count', models.IntegerField(default=0)),
+                ('center', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flow_rollups', to='evac_app.evacuationcenter')),
+            ],
+            options={
+                'ordering': ['center', 'granularity', 'bucket_start'],
+                'unique_together': {('center', 'granularity', 'bucket_start')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evac_app', '0013_disasterevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evacuationlog',
+            index=models.Index(fields=['date_recorded', 'id'], name='evac_app_ev_date_re_23cc24_idx'),
+        ),
+    ]
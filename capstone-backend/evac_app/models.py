@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.conf import settings
 from django.db.models import Max
 from auth_app.models import Municipality, CustomUser, Barangay
+from .services import ledger, rollups, data_version
 
 # Create your models here.
 
@@ -49,9 +50,100 @@ class EvacuationCenter(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        municipality_ids = [self.municipality_id]
+        if self.pk:
+            # a center moved to another municipality changes both reports
+            municipality_ids += list(
+                EvacuationCenter.objects.filter(pk=self.pk).values_list("municipality_id", flat=True)
+            )
+        data_version.bump(municipality_ids)
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        data_version.bump([self.municipality_id])
+        return super().delete(*args, **kwargs)
+
+
+class DisasterEvent(models.Model):
+    """
+    An incident (typhoon, flood, ...) that evacuation logs are recorded
+    under. Reports, congestion and stats can be scoped to one event, and
+    closed events can be archived out of the hot tables.
+    """
+    EVENT_TYPE_CHOICES = [
+        ('TYPHOON', 'Typhoon'),
+        ('FLOOD', 'Flood'),
+        ('LANDSLIDE', 'Landslide'),
+        ('EARTHQUAKE', 'Earthquake'),
+        ('FIRE', 'Fire'),
+        ('OTHER', 'Other'),
+    ]
+
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Active'),
+        ('CLOSED', 'Closed'),
+        ('ARCHIVED', 'Archived'),
+    ]
+
+    name = models.CharField(max_length=150)
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES, default='TYPHOON')
+    # null = province-wide
+    municipality = models.ForeignKey(Municipality, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ACTIVE')
+
+    started_at = models.DateTimeField(default=timezone.now)
+    ended_at = models.DateTimeField(null=True, blank=True)
+
+    archive_file = models.CharField(max_length=255, blank=True, default="")
+    archived_log_count = models.IntegerField(default=0)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-started_at", "-id"]
+
+    def __str__(self):
+        return self.name
+
+    def covers(self, municipality_id, date_recorded):
+        if self.municipality_id is not None and self.municipality_id != municipality_id:
+            return False
+        if date_recorded < self.started_at:
+            return False
+        return self.ended_at is None or date_recorded <= self.ended_at
+
+    @classmethod
+    def active_events(cls, municipality_id):
+        """Active events covering a municipality, most specific and newest first."""
+        events = (
+            cls.objects
+            .filter(status="ACTIVE")
+            .filter(models.Q(municipality_id=municipality_id) | models.Q(municipality__isnull=True))
+        )
+        return sorted(events, key=lambda e: (e.municipality_id is None, -e.started_at.timestamp(), -e.id))
+
+    @staticmethod
+    def pick(events, municipality_id, date_recorded):
+        """First of `events` (from active_events()) covering the log, or None."""
+        for event in events:
+            if event.covers(municipality_id, date_recorded):
+                return event
+        return None
+
 
 class EvacuationLog(models.Model):
     center = models.ForeignKey(EvacuationCenter, on_delete=models.CASCADE)
+    event = models.ForeignKey(
+        DisasterEvent,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="logs",
+    )
     reporting_staff = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     date_recorded = models.DateTimeField(default=timezone.now)
 
@@ -73,46 +165,252 @@ class EvacuationLog(models.Model):
 
     remarks = models.TextField(null=True, blank=True)
 
+    # set by offline devices so a resubmitted batch doesn't create duplicates
+    client_key = models.CharField(max_length=64, null=True, blank=True, unique=True)
+
     class Meta:
         ordering = ["-date_recorded", "-id"]
-        indexes = [models.Index(fields=["center", "date_recorded"])]
+        indexes = [
+            models.Index(fields=["center", "date_recorded"]),
+            # keyset pagination over all logs (provincial view)
+            models.Index(fields=["date_recorded", "id"]),
+        ]
 
     def __str__(self):
         return f"Log for {self.center.name} on {self.date_recorded}"
 
+    def count_vulnerable(self):
+        return (
+            int(self.children_count or 0) +
+            int(self.senior_count or 0) +
+            int(self.pwd_count or 0) +
+            int(self.pregnant_count or 0) +
+            int(self.lactating_count or 0)
+        )
+
     @transaction.atomic
     def save(self, *args, **kwargs):
         if self.center_id is None:
             return super().save(*args, **kwargs)
 
-        previous = (
+        # new logs fall under the active event covering their center
+        if self.pk is None and self.event_id is None:
+            municipality_id = self.center.municipality_id
+            self.event = DisasterEvent.pick(
+                DisasterEvent.active_events(municipality_id), municipality_id, self.date_recorded
+            )
+
+        # position of this row before the edit, if it already exists
+        old = None
+        if self.pk:
+            old = (
+                EvacuationLog.objects
+                .filter(pk=self.pk)
+                .values("center_id", "date_recorded", *rollups.FLOW_FIELDS)
+                .first()
+            )
+        moved_from = old["center_id"] if old and old["center_id"] != self.center_id else None
+
+        # serialize writers per center; later rows depend on this one
+        ledger.lock_centers(EvacuationCenter, [self.center_id, moved_from])
+
+        previous = ledger.totals_before(EvacuationLog, self.center_id, self.date_recorded, self.pk)
+        new_ind, new_fam = ledger.apply_delta(
+            previous,
+            self.individuals_in, self.individuals_out,
+            self.families_in, self.families_out,
+        )
+
+        # ✅ compute vulnerable from breakdown
+        self.vulnerable_individuals = self.count_vulnerable()
+
+        self.total_current = new_ind
+        self.total_current_families = new_fam
+
+        result = super().save(*args, **kwargs)
+
+        if moved_from:
+            rollups.apply_log(EvacuationFlowRollup, moved_from, old["date_recorded"],
+                              rollups.flow_values(old), sign=-1)
+        deltas = rollups.new_deltas()
+        if old and not moved_from:
+            rollups.add_delta(deltas, old["date_recorded"], rollups.flow_values(old), sign=-1)
+        rollups.add_delta(deltas, self.date_recorded, rollups.flow_values(self))
+        rollups.apply_deltas(EvacuationFlowRollup, self.center_id, deltas)
+
+        # Rows after this one (backdated insert / edit) need new totals. A row
+        # moved later in time also changes everything after its old position.
+        start, inclusive = (self.date_recorded, self.pk), False
+        if old and not moved_from and (old["date_recorded"], self.pk) < start:
+            start, inclusive = (old["date_recorded"], self.pk), True
+
+        ledger.recompute_running_totals(
+            EvacuationLogModel=EvacuationLog,
+            center_id=self.center_id,
+            date_recorded=start[0],
+            log_id=start[1],
+            inclusive=inclusive,
+        )
+        if moved_from:
+            ledger.recompute_running_totals(
+                EvacuationLogModel=EvacuationLog,
+                center_id=moved_from,
+                date_recorded=old["date_recorded"],
+                log_id=self.pk,
+            )
+
+        CenterOccupancy.refresh_for_center(self.center_id)
+        if moved_from:
+            CenterOccupancy.refresh_for_center(moved_from)
+
+        data_version.bump_centers(EvacuationCenter, [self.center_id, moved_from])
+        return result
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        # work from the stored row, not unsaved edits to this instance
+        pk = self.pk
+        stored_center = EvacuationLog.objects.filter(pk=pk).values_list("center_id", flat=True).first()
+        ledger.lock_centers(EvacuationCenter, [stored_center or self.center_id])
+
+        stored = (
             EvacuationLog.objects
-            .select_for_update()
-            .filter(center_id=self.center_id)
-            .exclude(pk=self.pk)
-            .order_by("-date_recorded", "-id")
+            .filter(pk=pk)
+            .values("center_id", "date_recorded", *rollups.FLOW_FIELDS)
             .first()
         )
+        center_id, date_recorded = (
+            (stored["center_id"], stored["date_recorded"]) if stored else (self.center_id, self.date_recorded)
+        )
 
-        prev_ind = previous.total_current if previous else 0
-        prev_fam = previous.total_current_families if previous else 0
+        result = super().delete(*args, **kwargs)
 
-        ind_delta = int(self.individuals_in or 0) - int(self.individuals_out or 0)
-        fam_delta = int(self.families_in or 0) - int(self.families_out or 0)
+        if stored:
+            rollups.apply_log(EvacuationFlowRollup, center_id, date_recorded,
+                              rollups.flow_values(stored), sign=-1)
 
-        new_ind = max(0, prev_ind + ind_delta)
-        new_fam = max(0, prev_fam + fam_delta)
+        ledger.recompute_running_totals(
+            EvacuationLogModel=EvacuationLog,
+            center_id=center_id,
+            date_recorded=date_recorded,
+            log_id=pk,
+        )
+        CenterOccupancy.refresh_for_center(center_id)
+        data_version.bump_centers(EvacuationCenter, [center_id])
+        return result
 
-        # ✅ compute vulnerable from breakdown
-        self.vulnerable_individuals = (
-            int(self.children_count or 0) +
-            int(self.senior_count or 0) +
-            int(self.pwd_count or 0) +
-            int(self.pregnant_count or 0) +
-            int(self.lactating_count or 0)
+
+class CenterOccupancy(models.Model):
+    """
+    Read model holding the latest log snapshot of each center, so readers
+    don't have to look up "latest log per center" on every request.
+    Kept in sync by EvacuationLog.save()/delete().
+    """
+    center = models.OneToOneField(
+        EvacuationCenter,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="occupancy",
+    )
+    latest_log = models.ForeignKey(
+        EvacuationLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    date_recorded = models.DateTimeField(null=True, blank=True)
+
+    total_current = models.IntegerField(default=0)
+    total_current_families = models.IntegerField(default=0)
+
+    children_count = models.IntegerField(default=0)
+    senior_count = models.IntegerField(default=0)
+    pwd_count = models.IntegerField(default=0)
+    pregnant_count = models.IntegerField(default=0)
+    lactating_count = models.IntegerField(default=0)
+    vulnerable_individuals = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    SNAPSHOT_FIELDS = [
+        "date_recorded",
+        "total_current",
+        "total_current_families",
+        "children_count",
+        "senior_count",
+        "pwd_count",
+        "pregnant_count",
+        "lactating_count",
+        "vulnerable_individuals",
+    ]
+
+    def __str__(self):
+        return f"Occupancy of {self.center_id}: {self.total_current}"
+
+    @classmethod
+    def snapshot_from_log(cls, log):
+        snapshot = {"latest_log": log}
+        for field in cls.SNAPSHOT_FIELDS:
+            if log is not None:
+                snapshot[field] = getattr(log, field)
+            else:
+                snapshot[field] = None if field == "date_recorded" else 0
+        return snapshot
+
+    @classmethod
+    def refresh_for_center(cls, center_id):
+        latest = (
+            EvacuationLog.objects
+            .filter(center_id=center_id)
+            .order_by("-date_recorded", "-id")
+            .first()
         )
+        if latest is None and not EvacuationCenter.objects.filter(pk=center_id).exists():
+            # center is being deleted; its occupancy row cascades with it
+            return None
 
-        self.total_current = new_ind
-        self.total_current_families = new_fam
+        occupancy, _ = cls.objects.update_or_create(
+            center_id=center_id,
+            defaults=cls.snapshot_from_log(latest),
+        )
+        return occupancy
+
+    @staticmethod
+    def for_center(center):
+        """Snapshot of a center, or None if it was never backfilled."""
+        return getattr(center, "occupancy", None)
 
-        return super().save(*args, **kwargs)
\ No newline at end of file
+
+class EvacuationFlowRollup(models.Model):
+    """
+    Hourly/daily sums of a center's log flows, kept current by
+    EvacuationLog writes (see evac_app.services.rollups).
+    """
+    GRANULARITY_CHOICES = [
+        (rollups.HOUR, 'Hour'),
+        (rollups.DAY, 'Day'),
+    ]
+
+    center = models.ForeignKey(EvacuationCenter, on_delete=models.CASCADE, related_name="flow_rollups")
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+
+    log_count = models.IntegerField(default=0)
+    individuals_in = models.IntegerField(default=0)
+    individuals_out = models.IntegerField(default=0)
+    families_in = models.IntegerField(default=0)
+    families_out = models.IntegerField(default=0)
+
+    children_count = models.IntegerField(default=0)
+    senior_count = models.IntegerField(default=0)
+    pwd_count = models.IntegerField(default=0)
+    pregnant_count = models.IntegerField(default=0)
+    lactating_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["center", "granularity", "bucket_start"]
+        unique_together = ["center", "granularity", "bucket_start"]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start} of {self.center_id}"
@@ -1,6 +1,6 @@
 # capstone-backend/evac_app/serializers.py
 from rest_framework import serializers
-from .models import EvacuationCenter, EvacuationLog
+from .models import EvacuationCenter, EvacuationLog, CenterOccupancy, DisasterEvent
 
 class EvacuationCenterSerializer(serializers.ModelSerializer):
     municipality_name = serializers.CharField(
@@ -45,21 +45,17 @@ class EvacuationCenterSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
-    def _latest_log(self, center):
-        return (
-            EvacuationLog.objects
-            .filter(center_id=center.id)
-            .order_by('-date_recorded', '-id')
-            .first()
-        )
+    def _occupancy(self, center):
+        # reads the snapshot row; list views should select_related("occupancy")
+        return CenterOccupancy.for_center(center)
 
     def get_current_total(self, center):
-        log = self._latest_log(center)
-        return int(log.total_current) if log else 0
+        occupancy = self._occupancy(center)
+        return int(occupancy.total_current) if occupancy else 0
 
     def get_current_families(self, center):
-        log = self._latest_log(center)
-        return int(log.total_current_families) if log else 0
+        occupancy = self._occupancy(center)
+        return int(occupancy.total_current_families) if occupancy else 0
 
     def get_congestion_percent(self, center):
         cap = int(center.family_capacity_max or 0) + int(center.individual_capacity_max or 0)
@@ -72,12 +68,14 @@ class EvacuationCenterSerializer(serializers.ModelSerializer):
 class EvacuationLogSerializer(serializers.ModelSerializer):
     center_name = serializers.CharField(source="center.name", read_only=True)
     reporting_staff_name = serializers.CharField(source="reporting_staff.email", read_only=True)
+    event_name = serializers.CharField(source="event.name", read_only=True, default=None)
 
     class Meta:
         model = EvacuationLog
         fields = [
             "id",
             "center", "center_name",
+            "event", "event_name",
             "reporting_staff", "reporting_staff_name",
             "date_recorded",
             "families_in", "individuals_in",
@@ -97,6 +95,11 @@ class EvacuationLogSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["reporting_staff"]
 
+    def validate_event(self, event):
+        if event is not None and event.status == "ARCHIVED":
+            raise serializers.ValidationError("Event is archived.")
+        return event
+
     def validate(self, attrs):
         numeric_fields = [
         "families_in","individuals_in","families_out","individuals_out",
@@ -111,6 +114,43 @@ class EvacuationLogSerializer(serializers.ModelSerializer):
 
         return attrs
     
+class PrefetchedCenterField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves centers from context["centers"] ({id: center}) so validating a
+    batch doesn't run one lookup query per item.
+    """
+
+    def to_internal_value(self, data):
+        centers = self.context.get("centers")
+        if centers is None:
+            return super().to_internal_value(data)
+
+        try:
+            center = centers.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        if center is None:
+            self.fail("does_not_exist", pk_value=data)
+        return center
+
+
+class EvacuationLogBulkItemSerializer(EvacuationLogSerializer):
+    center = PrefetchedCenterField(queryset=EvacuationCenter.objects.all())
+    # uniqueness is resolved by the bulk ingest, not a per-item validator
+    client_key = serializers.CharField(max_length=64, required=False, allow_null=True)
+
+    class Meta(EvacuationLogSerializer.Meta):
+        fields = EvacuationLogSerializer.Meta.fields + ["client_key"]
+        read_only_fields = [
+            "reporting_staff",
+            "event",
+            "total_current",
+            "total_current_families",
+            "vulnerable_individuals",
+        ]
+
+    
 class EvacuationCenterListSerializer(serializers.ModelSerializer):
     municipality_name = serializers.CharField(source="municipality.name", read_only=True)
 
@@ -124,3 +164,41 @@ class EvacCenterDropdownSerializer(serializers.ModelSerializer):
     class Meta:
         model = EvacuationCenter
         fields = ["id", "name", "municipality", "municipality_name"]
+
+
+class DisasterEventSerializer(serializers.ModelSerializer):
+    municipality_name = serializers.CharField(source="municipality.name", read_only=True, default=None)
+
+    class Meta:
+        model = DisasterEvent
+        fields = [
+            "id",
+            "name",
+            "event_type",
+            "municipality", "municipality_name",
+            "status",
+            "started_at",
+            "ended_at",
+            "archive_file",
+            "archived_log_count",
+            "archived_at",
+            "created_by",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = [
+            "status",
+            "archive_file",
+            "archived_log_count",
+            "archived_at",
+            "created_by",
+            "created_at",
+            "updated_at",
+        ]
+
+    def validate(self, attrs):
+        started_at = attrs.get("started_at", getattr(self.instance, "started_at", None))
+        ended_at = attrs.get("ended_at", getattr(self.instance, "ended_at", None))
+        if started_at and ended_at and ended_at < started_at:
+            raise serializers.ValidationError({"ended_at": "Must be after started_at."})
+        return attrs
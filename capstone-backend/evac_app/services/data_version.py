@@ -0,0 +1,80 @@
+# evac_app/services/data_version.py
+"""
+A token that changes whenever evacuation logs or centers change, so caches
+built from them (e.g. the affected-population report) can key on it instead
+of being invalidated one entry at a time.
+
+Besides the global token each municipality has its own, changed only by
+writes to its centers, so per-municipality caches survive writes elsewhere.
+A bump() that doesn't name municipalities changes all of them.
+
+Writers call bump() inside their transaction; the new token is published
+only after commit, so a reader never caches pre-commit data under it.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY = "evac:data-version"
+ALL_MUNICIPALITIES_KEY = f"{KEY}:municipalities"
+
+
+def _municipality_key(municipality_id):
+    return f"{KEY}:municipality:{municipality_id}"
+
+
+def _token():
+    return str(time.time_ns())
+
+
+def current():
+    version = cache.get(KEY)
+    if version is None:
+        cache.add(KEY, _token(), None)
+        version = cache.get(KEY)
+    return version
+
+
+def municipality_versions(municipality_ids):
+    """{municipality_id: token} in one cache round trip (two the first time)."""
+    keys = {mid: _municipality_key(mid) for mid in municipality_ids}
+    wanted = [ALL_MUNICIPALITIES_KEY, *keys.values()]
+
+    found = cache.get_many(wanted)
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _token(), None)
+        found.update(cache.get_many(missing))
+
+    base = found[ALL_MUNICIPALITIES_KEY]
+    return {mid: f"{base}.{found[key]}" for mid, key in keys.items()}
+
+
+def _publish(municipality_ids):
+    keys = [KEY]
+    if municipality_ids is None:
+        keys.append(ALL_MUNICIPALITIES_KEY)
+    else:
+        keys.extend(_municipality_key(mid) for mid in municipality_ids)
+
+    token = _token()
+    cache.set_many({key: token for key in keys}, None)
+
+
+def bump(municipality_ids=None):
+    """Change the global token and those of `municipality_ids` (all when None)."""
+    if municipality_ids is not None:
+        municipality_ids = set(municipality_ids)
+    transaction.on_commit(lambda: _publish(municipality_ids))
+
+
+def bump_centers(EvacuationCenterModel, center_ids):
+    """bump() for the municipalities of the given centers."""
+    municipality_ids = set(
+        EvacuationCenterModel.objects
+        .filter(id__in=[center_id for center_id in center_ids if center_id])
+        .values_list("municipality_id", flat=True)
+    )
+    bump(municipality_ids)
@@ -0,0 +1,219 @@
+# evac_app/services/event_archive.py
+"""
+Moves the logs of closed disaster events out of the hot tables into one
+gzipped JSON-lines file per event, listed in an index.json next to them,
+and reloads them for review when needed.
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from auth_app.models import CustomUser
+from evac_app.models import (
+    EvacuationCenter,
+    EvacuationLog,
+    EvacuationFlowRollup,
+    CenterOccupancy,
+)
+from evac_app.services import ledger, rollups, data_version
+
+INDEX_NAME = "index.json"
+
+
+def _log_fields():
+    return [f for f in EvacuationLog._meta.concrete_fields]
+
+
+def archive_file_name(event):
+    return f"event-{event.id}.jsonl.gz"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_index(archive_dir):
+    path = Path(archive_dir) / INDEX_NAME
+    if not path.exists():
+        return {"events": {}}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _write_index(archive_dir, index):
+    path = Path(archive_dir) / INDEX_NAME
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(index, fh, cls=DjangoJSONEncoder, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _first_log_times(logs):
+    """{center_id: earliest date_recorded} of the given logs."""
+    return dict(
+        logs.order_by()
+        .values("center_id")
+        .annotate(first=Min("date_recorded"))
+        .values_list("center_id", "first")
+    )
+
+
+def _refresh_centers(center_ids, changed_since):
+    """
+    Rebuild the centers' rollups and occupancy after logs were removed or
+    reloaded. Running totals are replayed from each center's earliest
+    changed log (changed_since: {center_id: date_recorded}), so later logs
+    neither keep counting archived logs nor miss restored ones.
+    """
+    for center_id in center_ids:
+        if center_id in changed_since:
+            ledger.recompute_running_totals(
+                EvacuationLogModel=EvacuationLog,
+                center_id=center_id,
+                date_recorded=changed_since[center_id],
+                inclusive=True,
+            )
+    rollups.rebuild(
+        EvacuationLogModel=EvacuationLog,
+        RollupModel=EvacuationFlowRollup,
+        center_ids=center_ids,
+    )
+    for center_id in center_ids:
+        CenterOccupancy.refresh_for_center(center_id)
+    data_version.bump_centers(EvacuationCenter, center_ids)
+
+
+def archive_event(event, archive_dir):
+    """
+    Write the event's logs to <archive_dir>/event-<id>.jsonl.gz, record it in
+    the index, then delete the logs and recompute the touched centers'
+    running totals, rollups and occupancy. The file is complete on disk
+    before anything is deleted.
+
+    Returns the number of logs archived.
+    """
+    if event.status != "CLOSED":
+        raise ValueError(f"Event {event.id} is {event.status}; only closed events can be archived.")
+
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / archive_file_name(event)
+    tmp = path.with_suffix(".tmp")
+
+    fields = [f.attname for f in _log_fields()]
+    logs = EvacuationLog.objects.filter(event_id=event.id).order_by("id")
+
+    written = 0
+    with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+        for row in logs.values(*fields).iterator(chunk_size=2000):
+            fh.write(json.dumps(row, cls=DjangoJSONEncoder))
+            fh.write("\n")
+            written += 1
+    os.replace(tmp, path)
+
+    with transaction.atomic():
+        center_ids = ledger.lock_centers(
+            EvacuationCenter, logs.order_by().values_list("center_id", flat=True).distinct()
+        )
+
+        if logs.count() != written:
+            raise RuntimeError(f"Logs of event {event.id} changed while archiving; try again.")
+
+        changed_since = _first_log_times(logs)
+        logs.delete()
+        _refresh_centers(center_ids, changed_since)
+
+        event.status = "ARCHIVED"
+        event.archive_file = path.name
+        event.archived_log_count = written
+        event.archived_at = timezone.now()
+        event.save(update_fields=["status", "archive_file", "archived_log_count", "archived_at", "updated_at"])
+
+    index = load_index(archive_dir)
+    index["events"][str(event.id)] = {
+        "id": event.id,
+        "name": event.name,
+        "event_type": event.event_type,
+        "municipality": event.municipality_id,
+        "started_at": event.started_at,
+        "ended_at": event.ended_at,
+        "file": path.name,
+        "log_count": written,
+        "sha256": _sha256(path),
+        "archived_at": event.archived_at,
+    }
+    _write_index(archive_dir, index)
+
+    return written
+
+
+def restore_event(event, archive_dir):
+    """
+    Reload an archived event's logs (with their original ids) and set it
+    back to CLOSED; running totals of the touched centers are recomputed
+    from the earliest reloaded log. Rows already present are skipped.
+    Returns the number of logs inserted.
+    """
+    if event.status != "ARCHIVED" or not event.archive_file:
+        raise ValueError(f"Event {event.id} is not archived.")
+
+    path = Path(archive_dir) / event.archive_file
+    entry = load_index(archive_dir)["events"].get(str(event.id))
+    if entry and entry.get("sha256") and entry["sha256"] != _sha256(path):
+        raise ValueError(f"Archive {path.name} does not match its index checksum.")
+
+    fields = {f.attname: f for f in _log_fields()}
+    rows = []
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            data = json.loads(line)
+            rows.append(EvacuationLog(**{
+                name: fields[name].to_python(value)
+                for name, value in data.items()
+                if name in fields
+            }))
+
+    with transaction.atomic():
+        center_ids = ledger.lock_centers(EvacuationCenter, {row.center_id for row in rows})
+        # centers deleted since archiving can't take their logs back
+        rows = [row for row in rows if row.center_id in center_ids]
+
+        staff_ids = set(
+            CustomUser.objects
+            .filter(id__in={row.reporting_staff_id for row in rows if row.reporting_staff_id})
+            .values_list("id", flat=True)
+        )
+        for row in rows:
+            if row.reporting_staff_id not in staff_ids:
+                row.reporting_staff_id = None
+
+        existing = set(
+            EvacuationLog.objects
+            .filter(id__in=[row.id for row in rows])
+            .values_list("id", flat=True)
+        )
+        missing = [row for row in rows if row.id not in existing]
+        EvacuationLog.objects.bulk_create(missing, batch_size=1000)
+
+        changed_since = {}
+        for row in missing:
+            first = changed_since.get(row.center_id)
+            if first is None or row.date_recorded < first:
+                changed_since[row.center_id] = row.date_recorded
+        _refresh_centers(center_ids, changed_since)
+
+        event.status = "CLOSED"
+        event.save(update_fields=["status", "updated_at"])
+
+    return len(missing)
@@ -0,0 +1,122 @@
+# evac_app/services/ledger.py
+"""
+Running totals (total_current / total_current_families) of a center's logs.
+
+Each log's totals are the previous log's totals plus its own in/out deltas,
+floored at 0, in (date_recorded, id) order. A backdated insert, an edit or a
+delete only invalidates the logs that come after it, so only that suffix is
+recomputed and only rows whose totals actually change are written back.
+"""
+from django.db.models import Q
+
+RUNNING_TOTAL_FIELDS = ["total_current", "total_current_families"]
+
+
+def lock_centers(EvacuationCenterModel, center_ids):
+    """
+    Row-lock the centers for the rest of the transaction, in id order so
+    two writers touching the same pair of centers can't deadlock.
+    Returns the ids of the centers that exist.
+    """
+    ids = sorted({cid for cid in center_ids if cid is not None})
+    if not ids:
+        return []
+    return list(
+        EvacuationCenterModel.objects
+        .select_for_update()
+        .filter(pk__in=ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def _after(date_recorded, log_id, inclusive=False):
+    if log_id is None:
+        # no id to break ties on: position by time alone
+        return Q(date_recorded__gte=date_recorded) if inclusive else Q(date_recorded__gt=date_recorded)
+    id_lookup = "id__gte" if inclusive else "id__gt"
+    return Q(date_recorded__gt=date_recorded) | Q(date_recorded=date_recorded, **{id_lookup: log_id})
+
+
+def totals_before(EvacuationLogModel, center_id, date_recorded, log_id=None):
+    """
+    (individuals, families) of the log right before position (date_recorded, log_id).
+    An unsaved row (log_id=None) sorts after existing rows with the same time.
+    """
+    previous = (
+        EvacuationLogModel.objects
+        .filter(center_id=center_id)
+        .exclude(_after(date_recorded, log_id, inclusive=log_id is not None))
+        .order_by("-date_recorded", "-id")
+        .values_list(*RUNNING_TOTAL_FIELDS)
+        .first()
+    )
+    return previous or (0, 0)
+
+
+def apply_delta(previous, individuals_in, individuals_out, families_in, families_out):
+    prev_ind, prev_fam = previous
+    ind_delta = int(individuals_in or 0) - int(individuals_out or 0)
+    fam_delta = int(families_in or 0) - int(families_out or 0)
+    return max(0, prev_ind + ind_delta), max(0, prev_fam + fam_delta)
+
+
+def recompute_running_totals(
+    *,
+    EvacuationLogModel,
+    center_id,
+    date_recorded=None,
+    log_id=None,
+    inclusive=False,
+    batch_size=500,
+):
+    """
+    Recompute the running totals of a center's logs after a position.
+
+    With date_recorded=None the whole history is replayed. Otherwise logs
+    positioned after (date_recorded, log_id) -- or at it, when inclusive --
+    are recomputed starting from the totals of the log just before them.
+    Without a log_id the position is the time alone.
+    Returns the number of rows rewritten. Callers should hold the center
+    lock (lock_centers) for the surrounding transaction.
+    """
+    logs = EvacuationLogModel.objects.filter(center_id=center_id)
+
+    if date_recorded is None:
+        running = (0, 0)
+        suffix = logs
+    else:
+        after = _after(date_recorded, log_id, inclusive=inclusive)
+        running = (
+            logs.exclude(after)
+            .order_by("-date_recorded", "-id")
+            .values_list(*RUNNING_TOTAL_FIELDS)
+            .first()
+        ) or (0, 0)
+        suffix = logs.filter(after)
+
+    rows = (
+        suffix
+        .order_by("date_recorded", "id")
+        .values_list(
+            "id",
+            "individuals_in", "individuals_out",
+            "families_in", "families_out",
+            *RUNNING_TOTAL_FIELDS,
+        )
+    )
+
+    changed = []
+    for pk, ind_in, ind_out, fam_in, fam_out, cur_ind, cur_fam in rows.iterator(chunk_size=2000):
+        running = apply_delta(running, ind_in, ind_out, fam_in, fam_out)
+        if running != (cur_ind, cur_fam):
+            changed.append(EvacuationLogModel(
+                id=pk,
+                total_current=running[0],
+                total_current_families=running[1],
+            ))
+
+    if changed:
+        EvacuationLogModel.objects.bulk_update(changed, RUNNING_TOTAL_FIELDS, batch_size=batch_size)
+
+    return len(changed)
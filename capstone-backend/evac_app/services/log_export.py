@@ -0,0 +1,162 @@
+# evac_app/services/log_export.py
+"""
+Streaming exports of EvacuationLog rows as CSV, NDJSON or Parquet.
+
+Rows are read in keyset batches on (date_recorded, id) rather than one big
+cursor: the MySQL drivers buffer a whole result set client-side even with
+.iterator(), so a single query would hold every row in memory. Each format
+yields one chunk per batch, so memory stays at one batch whatever the size
+of the export.
+"""
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+EXPORT_FIELDS = [
+    ("id", "id"),
+    ("center_id", "center_id"),
+    ("center_name", "center__name"),
+    ("municipality_id", "center__municipality_id"),
+    ("event_id", "event_id"),
+    ("reporting_staff_id", "reporting_staff_id"),
+    ("date_recorded", "date_recorded"),
+    ("families_in", "families_in"),
+    ("individuals_in", "individuals_in"),
+    ("families_out", "families_out"),
+    ("individuals_out", "individuals_out"),
+    ("children_count", "children_count"),
+    ("senior_count", "senior_count"),
+    ("pwd_count", "pwd_count"),
+    ("pregnant_count", "pregnant_count"),
+    ("lactating_count", "lactating_count"),
+    ("vulnerable_individuals", "vulnerable_individuals"),
+    ("total_current", "total_current"),
+    ("total_current_families", "total_current_families"),
+    ("remarks", "remarks"),
+    ("client_key", "client_key"),
+]
+
+COLUMNS = [name for name, _ in EXPORT_FIELDS]
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def iter_batches(queryset, batch_size=2000):
+    """Tuples of EXPORT_FIELDS in (date_recorded, id) order, one list per batch."""
+    lookups = [lookup for _, lookup in EXPORT_FIELDS]
+    date_index, id_index = COLUMNS.index("date_recorded"), COLUMNS.index("id")
+    base = queryset.order_by("date_recorded", "id").values_list(*lookups)
+
+    last = None
+    while True:
+        qs = base
+        if last is not None:
+            qs = qs.filter(
+                Q(date_recorded__gt=last[0]) | Q(date_recorded=last[0], id__gt=last[1])
+            )
+        batch = list(qs[:batch_size])
+        if not batch:
+            return
+
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last = (batch[-1][date_index], batch[-1][id_index])
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(COLUMNS, row)), cls=DjangoJSONEncoder) + "\n"
+            for row in batch
+        )
+
+
+class _Drain:
+    """Write-only file object whose contents are handed out chunk by chunk."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        "center_name": pa.string(),
+        "date_recorded": pa.timestamp("us"),
+        "remarks": pa.string(),
+        "client_key": pa.string(),
+    }
+    return pa.schema([(name, types.get(name, pa.int64())) for name in COLUMNS])
+
+
+def stream_parquet(batches):
+    """One Parquet row group per batch; the footer goes out last."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+
+    yield sink.take()
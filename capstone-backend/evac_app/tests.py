@@ -1,3 +1,555 @@
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.db.models import Count, Sum
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from auth_app.models import CustomUser, Municipality
+from .models import EvacuationCenter, EvacuationLog, EvacuationFlowRollup, CenterOccupancy, DisasterEvent
+from .api_views import EvacuationLogViewSet
+from .services import event_archive, rollups
+
+
+class LedgerTestMixin:
+    """Centers with a few logs, and checks against a full chronological replay."""
+
+    start = datetime(2025, 7, 1, 8, 0)
+
+    def setUp(self):
+        self.municipality = Municipality.objects.create(name="Calapan City")
+        self.center = self.make_center("Center A")
+        self.other = self.make_center("Center B")
+
+        # (hours after start, individuals in/out, families in/out); the
+        # outflow at +3h drives the total below zero, so the floor matters
+        self.logs = [
+            self.add_log(self.center, hours, *flows)
+            for hours, *flows in [
+                (0, 50, 0, 10, 0),
+                (1, 20, 5, 4, 1),
+                (3, 0, 80, 0, 20),
+                (4, 30, 0, 6, 0),
+                (6, 10, 15, 2, 3),
+            ]
+        ]
+        self.add_log(self.other, 2, 40, 0, 8, 0)
+        self.add_log(self.other, 5, 0, 10, 0, 2)
+
+    def make_center(self, name):
+        return EvacuationCenter.objects.create(
+            name=name,
+            municipality=self.municipality,
+            individual_capacity_max=500,
+            family_capacity_max=100,
+        )
+
+    def add_log(self, center, hours, ind_in, ind_out, fam_in, fam_out, **extra):
+        return EvacuationLog.objects.create(
+            center=center,
+            date_recorded=self.start + timedelta(hours=hours),
+            individuals_in=ind_in,
+            individuals_out=ind_out,
+            families_in=fam_in,
+            families_out=fam_out,
+            **extra,
+        )
+
+    def assertLedgerConsistent(self, *centers):
+        centers = centers or (self.center, self.other)
+        for center in centers:
+            logs = list(EvacuationLog.objects.filter(center=center).order_by("date_recorded", "id"))
+
+            individuals = families = 0
+            for log in logs:
+                individuals = max(0, individuals + log.individuals_in - log.individuals_out)
+                families = max(0, families + log.families_in - log.families_out)
+                self.assertEqual(
+                    (log.total_current, log.total_current_families),
+                    (individuals, families),
+                    f"running totals of log {log.pk} at {log.date_recorded}",
+                )
+
+            occupancy = CenterOccupancy.objects.get(center=center)
+            latest = logs[-1] if logs else None
+            expected = CenterOccupancy.snapshot_from_log(latest)
+            self.assertEqual(occupancy.latest_log_id, latest.pk if latest else None)
+            for field in CenterOccupancy.SNAPSHOT_FIELDS:
+                self.assertEqual(getattr(occupancy, field), expected[field], f"occupancy {field} of {center}")
+
+
+class RunningTotalsTests(LedgerTestMixin, TestCase):
+    def test_initial_history(self):
+        self.assertLedgerConsistent()
+
+    def test_backdated_insert(self):
+        self.add_log(self.center, 0.5, 25, 0, 5, 0)
+        self.assertLedgerConsistent()
+
+        # at the same time as an existing log: sorts after it
+        self.add_log(self.center, 3, 0, 10, 0, 2)
+        self.assertLedgerConsistent()
+
+    def test_edit_moves_log_earlier(self):
+        log = self.logs[3]
+        log.date_recorded = self.start + timedelta(minutes=30)
+        log.save()
+        self.assertLedgerConsistent()
+
+    def test_edit_moves_log_later(self):
+        log = self.logs[0]
+        log.date_recorded = self.start + timedelta(hours=5)
+        log.save()
+        self.assertLedgerConsistent()
+
+    def test_edit_changes_flows_only(self):
+        log = self.logs[1]
+        log.individuals_in = 200
+        log.families_out = 0
+        log.save()
+        self.assertLedgerConsistent()
+
+    def test_edit_moves_log_to_other_center(self):
+        log = self.logs[1]
+        log.center = self.other
+        log.date_recorded = self.start + timedelta(hours=1, minutes=30)
+        log.save()
+        self.assertLedgerConsistent()
+
+        # the newest log of a center moves away
+        log = self.logs[4]
+        log.center = self.other
+        log.save()
+        self.assertLedgerConsistent()
+
+    def test_delete(self):
+        self.logs[0].delete()
+        self.assertLedgerConsistent()
+
+        self.logs[4].delete()
+        self.assertLedgerConsistent()
+
+    def test_delete_last_log(self):
+        for log in EvacuationLog.objects.filter(center=self.other):
+            log.delete()
+        self.assertLedgerConsistent()
+
+    def test_delete_ignores_unsaved_edits(self):
+        # edited in memory to after the next log, then deleted
+        log = self.logs[3]
+        log.date_recorded = self.start + timedelta(hours=7)
+        log.delete()
+        self.assertLedgerConsistent()
+
+        log = self.logs[0]
+        log.center = self.other
+        log.delete()
+        self.assertLedgerConsistent()
+
+
+class BulkIngestTests(LedgerTestMixin, TestCase):
+    url = "/api/evac_centers/evacuation-logs/bulk/"
+
+    # (center attr, hours after start, individuals in/out, families in/out),
+    # in submission order; A's entries land before, between and after its stored logs
+    batch = [
+        ("center", 2, 20, 0, 4, 0),
+        ("center", 0.5, 0, 30, 0, 5),
+        ("other", 1, 40, 0, 8, 0),
+        ("center", 7, 5, 0, 1, 0),
+        ("other", 0.5, 10, 0, 2, 0),
+        ("center", 2, 0, 90, 0, 20),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(
+            email="admin@example.com",
+            password="pass",
+            first_name="Prov",
+            last_name="Admin",
+            role="PROVINCIAL_ADMIN",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self):
+        return {"logs": [
+            {
+                "center": getattr(self, attr).id,
+                "date_recorded": (self.start + timedelta(hours=hours)).isoformat(),
+                "individuals_in": ind_in,
+                "individuals_out": ind_out,
+                "families_in": fam_in,
+                "families_out": fam_out,
+                "client_key": f"device-1-{i}",
+            }
+            for i, (attr, hours, ind_in, ind_out, fam_in, fam_out) in enumerate(self.batch)
+        ]}
+
+    def totals(self, center):
+        return list(
+            EvacuationLog.objects.filter(center=center)
+            .order_by("date_recorded", "id")
+            .values_list("date_recorded", "total_current", "total_current_families")
+        )
+
+    def test_resubmitted_batch_is_idempotent(self):
+        first = self.client.post(self.url, self.payload(), format="json")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((first.data["created"], first.data["duplicates"], first.data["errors"]), (6, 0, 0))
+        self.assertLedgerConsistent()
+
+        count = EvacuationLog.objects.count()
+        totals = {center.id: self.totals(center) for center in (self.center, self.other)}
+        occupancy = {o.center_id: o.total_current for o in CenterOccupancy.objects.all()}
+
+        second = self.client.post(self.url, self.payload(), format="json")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual((second.data["created"], second.data["duplicates"], second.data["errors"]), (0, 6, 0))
+        for created, repeated in zip(first.data["results"], second.data["results"]):
+            self.assertEqual(repeated["status"], "duplicate")
+            self.assertEqual(repeated["index"], created["index"])
+            self.assertEqual(repeated["client_key"], created["client_key"])
+            self.assertEqual(repeated["id"], created["id"])
+
+        self.assertEqual(EvacuationLog.objects.count(), count)
+        self.assertEqual({center.id: self.totals(center) for center in (self.center, self.other)}, totals)
+        self.assertEqual({o.center_id: o.total_current for o in CenterOccupancy.objects.all()}, occupancy)
+
+    def test_totals_match_one_by_one_inserts(self):
+        self.client.post(self.url, self.payload(), format="json")
+
+        # the same history and batch on twin centers, one save() per entry
+        twins = {"center": self.make_center("Twin A"), "other": self.make_center("Twin B")}
+        for source, twin in ((self.center, twins["center"]), (self.other, twins["other"])):
+            for log in EvacuationLog.objects.filter(center=source, client_key__isnull=True).order_by("id"):
+                self.add_log(
+                    twin, (log.date_recorded - self.start) / timedelta(hours=1),
+                    log.individuals_in, log.individuals_out, log.families_in, log.families_out,
+                )
+        for attr, hours, *flows in self.batch:
+            self.add_log(twins[attr], hours, *flows)
+
+        self.assertEqual(self.totals(self.center), self.totals(twins["center"]))
+        self.assertEqual(self.totals(self.other), self.totals(twins["other"]))
+        for attr, twin in twins.items():
+            source = getattr(self, attr)
+            self.assertEqual(
+                CenterOccupancy.objects.get(center=source).total_current,
+                CenterOccupancy.objects.get(center=twin).total_current,
+            )
+
+
+class RollupSumsTests(TestCase):
+    now = datetime(2025, 7, 1, 15, 37)
+
+    def setUp(self):
+        municipality = Municipality.objects.create(name="Calapan City")
+        self.center = EvacuationCenter.objects.create(name="Center A", municipality=municipality)
+        self.other = EvacuationCenter.objects.create(name="Center B", municipality=municipality)
+
+        # minutes relative to now, spread over the partial hour at a window's
+        # start, whole hours, the current hour and a log stamped after now
+        self.logs = [
+            self.add_log(self.center, minutes, ind_in, ind_out)
+            for minutes, ind_in, ind_out in [
+                (-1500, 7, 1),
+                (-210, 5, 0),
+                (-200, 11, 2),
+                (-185, 13, 0),
+                (-157, 17, 3),
+                (-120, 19, 5),
+                (-61, 23, 0),
+                (-37, 29, 7),
+                (-5, 31, 0),
+                (13, 37, 11),
+            ]
+        ]
+        self.add_log(self.other, -100, 41, 0)
+
+    def add_log(self, center, minutes, ind_in, ind_out):
+        return EvacuationLog.objects.create(
+            center=center,
+            date_recorded=self.now + timedelta(minutes=minutes),
+            individuals_in=ind_in,
+            individuals_out=ind_out,
+            families_in=ind_in // 4,
+            children_count=ind_in // 3,
+        )
+
+    def assertSumsMatchLogs(self):
+        # 200 min starts at 12:17 (partial hour 12:17-13:00), 37 min exactly on 15:00
+        windows = [5, 37, 90, 200, 24 * 60]
+        centers = [self.center.id, self.other.id]
+        sums = rollups.window_sums(
+            EvacuationLogModel=EvacuationLog,
+            RollupModel=EvacuationFlowRollup,
+            center_ids=centers,
+            windows=windows,
+            now=self.now,
+        )
+
+        for window in windows:
+            for center_id in centers:
+                expected = (
+                    EvacuationLog.objects
+                    .filter(center_id=center_id, date_recorded__gte=self.now - timedelta(minutes=window))
+                    .aggregate(individuals_in=Sum("individuals_in"), individuals_out=Sum("individuals_out"))
+                )
+                self.assertEqual(
+                    dict(sums[window][center_id]),
+                    {f: int(v or 0) for f, v in expected.items()},
+                    f"{window} minute window of center {center_id}",
+                )
+
+        for center_id in centers:
+            expected = EvacuationLog.objects.filter(center_id=center_id).aggregate(
+                log_count=Count("id"), **{f: Sum(f) for f in rollups.FLOW_FIELDS}
+            )
+            self.assertEqual(
+                rollups.history_totals(EvacuationFlowRollup, center_id),
+                {f: int(v or 0) for f, v in expected.items()},
+            )
+
+    def test_sums_match_raw_logs(self):
+        self.assertSumsMatchLogs()
+
+    def test_sums_follow_edits_and_deletes(self):
+        moved = self.logs[2]
+        moved.date_recorded = self.now - timedelta(minutes=20)
+        moved.individuals_in = 3
+        moved.save()
+
+        transferred = self.logs[5]
+        transferred.center = self.other
+        transferred.save()
+
+        self.logs[7].delete()
+        self.assertSumsMatchLogs()
+
+
+class EventArchiveLedgerTests(LedgerTestMixin, TestCase):
+    def test_archive_and_restore_keep_running_totals(self):
+        event = DisasterEvent.objects.create(
+            name="Typhoon Aghon",
+            municipality=self.municipality,
+            status="CLOSED",
+            started_at=self.start,
+            ended_at=self.start + timedelta(hours=5),
+        )
+        # one log of each center belongs to the event; the logs after them don't
+        other_first = EvacuationLog.objects.filter(center=self.other).order_by("date_recorded").first()
+        EvacuationLog.objects.filter(pk__in=[self.logs[3].pk, other_first.pk]).update(event=event)
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            self.assertEqual(event_archive.archive_event(event, archive_dir), 2)
+            self.assertLedgerConsistent()
+            self.assertEqual(EvacuationLog.objects.filter(event=event).count(), 0)
+
+            event.refresh_from_db()
+            self.assertEqual(event_archive.restore_event(event, archive_dir), 2)
+            self.assertLedgerConsistent()
+            self.assertEqual(EvacuationLog.objects.filter(event=event).count(), 2)
+
+
+class EvacuationLogListTests(TestCase):
+    url = "/api/evac_centers/evacuation-logs/"
+    start = datetime(2025, 7, 1, 0, 30)
+
+    @classmethod
+    def setUpTestData(cls):
+        municipality = Municipality.objects.create(name="Calapan City")
+        center = EvacuationCenter.objects.create(name="Center A", municipality=municipality)
+        cls.user = CustomUser.objects.create_user(
+            email="admin@example.com",
+            password="pass",
+            first_name="Prov",
+            last_name="Admin",
+            role="PROVINCIAL_ADMIN",
+        )
+        # every 2 hours over three days, plus two logs sharing a timestamp
+        for i in range(36):
+            EvacuationLog.objects.create(
+                center=center, date_recorded=cls.start + timedelta(hours=2 * i), individuals_in=1
+            )
+        EvacuationLog.objects.create(center=center, date_recorded=cls.start + timedelta(hours=20), individuals_in=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expected_ids(self, **filters):
+        return list(
+            EvacuationLog.objects.filter(**filters)
+            .order_by("-date_recorded", "-id")
+            .values_list("id", flat=True)
+        )
+
+    def test_cursor_links_walk_every_log_once(self):
+        pages, url = [], self.url + "?page_size=10"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            url = response.data["next"]
+
+        self.assertEqual(len(pages), 4)
+        self.assertIsNone(pages[0]["previous"])
+        self.assertNotIn("count", pages[0])
+        seen = [row["id"] for page in pages for row in page["results"]]
+        self.assertEqual(seen, self.expected_ids())
+
+        # previous from the third page comes back to the second
+        back = self.client.get(pages[2]["previous"])
+        self.assertEqual(back.status_code, 200)
+        self.assertEqual(
+            [row["id"] for row in back.data["results"]],
+            [row["id"] for row in pages[1]["results"]],
+        )
+
+    def test_date_bounds(self):
+        # bare dates: date_to covers its whole day
+        response = self.client.get(self.url, {"date_from": "2025-07-02", "date_to": "2025-07-02", "page_size": 50})
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            self.expected_ids(date_recorded__gte=datetime(2025, 7, 2), date_recorded__lt=datetime(2025, 7, 3)),
+        )
+        self.assertEqual(len(response.data["results"]), 12)
+
+        # datetimes are exact and date_to is inclusive
+        response = self.client.get(
+            self.url,
+            {"date_from": "2025-07-01T04:30:00", "date_to": "2025-07-01T10:30:00", "page_size": 50},
+        )
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            self.expected_ids(
+                date_recorded__gte=datetime(2025, 7, 1, 4, 30),
+                date_recorded__lte=datetime(2025, 7, 1, 10, 30),
+            ),
+        )
+        self.assertEqual(len(response.data["results"]), 4)
+
+    def test_invalid_bounds_are_rejected(self):
+        for name, value in [
+            ("date_from", "2025-02-30"),
+            ("date_to", "2025-02-30"),
+            ("date_from", "2025-02-30T10:00:00"),
+            ("date_to", "yesterday"),
+        ]:
+            with self.subTest(**{name: value}):
+                response = self.client.get(self.url, {name: value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(name, response.data)
+
+
+class EvacuationLogExportTests(TestCase):
+    url = "/api/evac_centers/evacuation-logs/export/"
+    start = datetime(2025, 7, 1, 8, 0)
+
+    @classmethod
+    def setUpTestData(cls):
+        calapan = Municipality.objects.create(name="Calapan City")
+        baco = Municipality.objects.create(name="Baco")
+        cls.school = EvacuationCenter.objects.create(name="Lalud School", municipality=calapan)
+        cls.hall = EvacuationCenter.objects.create(name="Lalud Hall", municipality=calapan)
+        cls.gym = EvacuationCenter.objects.create(name="Baco Gym", municipality=baco)
+        cls.event = DisasterEvent.objects.create(name="Typhoon Kristine", started_at=cls.start)
+
+        # (center, hours after start, in the event); several logs share a
+        # timestamp so batches split inside a run of equal date_recorded
+        for center, hours, in_event in [
+            (cls.school, 0, True), (cls.hall, 0, True), (cls.gym, 0, False),
+            (cls.school, 1, True), (cls.school, 1, False), (cls.hall, 1, True), (cls.gym, 1, True),
+            (cls.hall, 2, False), (cls.school, 26, True), (cls.gym, 26, False), (cls.hall, 26, True),
+        ]:
+            EvacuationLog.objects.create(
+                center=center,
+                date_recorded=cls.start + timedelta(hours=hours),
+                individuals_in=1,
+                event=cls.event if in_event else None,
+                remarks='roll call, "east wing"',
+            )
+
+        def user(email, role, **extra):
+            return CustomUser.objects.create_user(email=email, password="pass", role=role, **extra)
+
+        cls.provincial = user("province@example.com", "PROVINCIAL_ADMIN")
+        cls.municipal = user("calapan@example.com", "MUNICIPAL_ADMIN", municipality=calapan)
+        cls.unassigned = user("nowhere@example.com", "MUNICIPAL_ADMIN")
+        cls.staff = user("staff@example.com", "EVAC_CENTER_STAFF", municipality=calapan, assigned_center=cls.hall)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def export(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(self.url, params)
+
+    def exported_ids(self, user, **params):
+        response = self.export(user, **params)
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode("utf-8"))))
+        return [int(row["id"]) for row in rows]
+
+    def expected_ids(self, **filters):
+        return list(
+            EvacuationLog.objects.filter(**filters).order_by("date_recorded", "id").values_list("id", flat=True)
+        )
+
+    def test_scoped_by_role(self):
+        self.assertEqual(self.exported_ids(self.provincial), self.expected_ids())
+        self.assertEqual(
+            self.exported_ids(self.municipal), self.expected_ids(center__in=[self.school, self.hall])
+        )
+        self.assertEqual(self.exported_ids(self.staff), self.expected_ids(center=self.hall))
+        self.assertEqual(self.exported_ids(self.unassigned), [])
+
+        # filters can't widen the scope
+        self.assertEqual(self.exported_ids(self.municipal, center=self.gym.id), [])
+
+    def test_filters(self):
+        self.assertEqual(self.exported_ids(self.provincial, center=self.school.id), self.expected_ids(center=self.school))
+        self.assertEqual(self.exported_ids(self.provincial, event=self.event.id), self.expected_ids(event=self.event))
+        self.assertEqual(
+            self.exported_ids(self.provincial, date_from="2025-07-01T09:00:00", date_to="2025-07-01"),
+            self.expected_ids(date_recorded__gte=self.start + timedelta(hours=1), date_recorded__lt=datetime(2025, 7, 2)),
+        )
+        self.assertEqual(
+            self.exported_ids(self.municipal, event=self.event.id, date_to="2025-07-01T09:00:00"),
+            self.expected_ids(
+                center__in=[self.school, self.hall],
+                event=self.event,
+                date_recorded__lte=self.start + timedelta(hours=1),
+            ),
+        )
+
+    def test_batches_split_inside_equal_timestamps(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        expected = self.expected_ids()
+        for batch_size in (1, 2, 3, len(expected), len(expected) + 1):
+            with self.subTest(batch_size=batch_size), \
+                    mock.patch.object(EvacuationLogViewSet, "EXPORT_BATCH_SIZE", batch_size):
+                self.assertEqual(self.exported_ids(self.provincial), expected)
+
+                response = self.export(self.provincial, format="ndjson")
+                lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+                self.assertEqual([json.loads(line)["id"] for line in lines], expected)
+
+                response = self.export(self.provincial, format="parquet")
+                parquet = pq.ParquetFile(pa.BufferReader(b"".join(response.streaming_content)))
+                self.assertEqual(parquet.read().column("id").to_pylist(), expected)
+                self.assertEqual(parquet.num_row_groups, -(-len(expected) // batch_size))
 
-# Create your tests here.
+    def test_unknown_format(self):
+        response = self.export(self.provincial, format="xlsx")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("csv, ndjson or parquet", response.json()["detail"])
@@ -81,7 +81,7 @@ const routes = [
         path: 'reports/affected-population',
         name: 'AffectedPopulationReport',
         component: AffectedPopulationReport,
-        meta: { requiresAuth: true, role: ['admin'], provincialOnly: true }
+        meta: { requiresAuth: true, role: ['admin'] }
       },
       { path: 'profile', name: 'AdminProfile', component: UserProfile },
     ]